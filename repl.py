@@ -2,8 +2,16 @@
 """Command line runtime for Tea."""
 
 import runtime.lib
+import runtime.collection
+import os
 import sys
-from runtime import lexer, parser, env, flags
+from runtime import lexer, parser, env, flags, profile
+
+try:
+    from runtime import ndarray
+except ImportError:
+    # NumPy is optional, arrays are not available without it
+    ndarray = None
 
 TEA_VERSION = "0.0.5-dev"
 TEA_TITLE = "Tea @" + TEA_VERSION
@@ -39,7 +47,12 @@ def run_script(name, context):
 
     tokens = lexer.run(script)
     tree = parser.generate(tokens)
-    return tree.eval(context)
+    feedback = profile.load(tree, script)
+    try:
+        return tree.eval(context)
+    finally:
+        if feedback is not None:
+            feedback.write()
 
 
 def interpret(expression, context):
@@ -67,9 +80,13 @@ def main():
     # run REPL
     context = env.empty_context()
     context.load(runtime.lib)
+    context.load(runtime.collection)
+    if ndarray is not None:
+        context.load(ndarray)
     context.load(CLISupportLib)
 
     if len(sys.argv) > 1:
+        flags.profile_dir = os.environ.get("TEA_PROFILE_DIR")
         run_script(sys.argv[1], context)
         return
 
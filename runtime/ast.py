@@ -1,17 +1,26 @@
 """Eval an abstract syntax tree."""
-from runtime import env
+from runtime import env, flags, lib
 
 DEFAULT_BEHAVIOUR = "default"
 RETURN_BEHAVIOUR = "return"
 BREAK_BEHAVIOUR = "break"
 CONTINUE_BEHAVIOUR = "continue"
 
-def run_in_substitution(node, context):
-    """Run the node in a subtituted namespace."""
-    parent = context.substitute()
-    result = node.eval(context)
-    context.namespace = parent
-    return result
+def check_condition(node, context):
+    """Evaluate a condition node and return its truth value."""
+    correct = node.eval(context)
+    if correct.data not in (True, False):
+        raise Exception("Bad conditional")
+    return correct.data
+
+
+def contains_yield(node):
+    """Checks if the node contains a yield statement outside of nested definitions."""
+    if type(node) is Yield:
+        return True
+    if type(node) is Definition:
+        return False
+    return any(contains_yield(child) for child in node.children)
 
 
 class Node:
@@ -34,6 +43,14 @@ class Node:
     def add_front(self, node):
         self.children = [node] + self.children
 
+    def execute(self, context):
+        """Evaluate the node as a generator suspending at yield statements.
+
+        Nodes that can not contain a yield statement are evaluated at once.
+        """
+        return self.eval(context)
+        yield
+
     def describe(self):
         return type(self).name
 
@@ -66,18 +83,30 @@ class Sequence(Node):
     def __init__(self, substitute=False):
         super().__init__()
         self.substitute = substitute
+        # cells of the shared expressions of this block
+        self.cells = []
 
     def __eq__(self, other):
         return super().__eq__(other)
 
+    def enter_cells(self):
+        """Clears the shared values for a new activation and returns the old ones."""
+        saved = [cell[0] for cell in self.cells]
+        for cell in self.cells:
+            cell[0] = None
+        return saved
+
+    def leave_cells(self, saved):
+        """Restores the shared values of the enclosing activation."""
+        for cell, value in zip(self.cells, saved):
+            cell[0] = value
+
     def eval(self, context):
         """Evaluate a sequence of statements."""
         parent = None
-        try:
-            if self.substitute:
-                parent = context.substitute()
-        except:
-            pass
+        if self.substitute:
+            parent = context.substitute()
+        saved = self.enter_cells() if self.cells else None
 
         context.behaviour = DEFAULT_BEHAVIOUR
         value = env.Value(env.NULL)
@@ -87,6 +116,30 @@ class Sequence(Node):
             if context.behaviour is not DEFAULT_BEHAVIOUR:
                 break
 
+        if saved is not None:
+            self.leave_cells(saved)
+        if parent is not None:
+            context.namespace = parent
+
+        return value
+
+    def execute(self, context):
+        """Evaluate a sequence of statements as a generator."""
+        parent = None
+        if self.substitute:
+            parent = context.substitute()
+        saved = self.enter_cells() if self.cells else None
+
+        context.behaviour = DEFAULT_BEHAVIOUR
+        value = env.Value(env.NULL)
+
+        for item in self.children:
+            value = yield from item.execute(context)
+            if context.behaviour is not DEFAULT_BEHAVIOUR:
+                break
+
+        if saved is not None:
+            self.leave_cells(saved)
         if parent is not None:
             context.namespace = parent
 
@@ -99,18 +152,32 @@ class Branch(Node):
 
     def __init__(self):
         super().__init__()
+        # jump table of an else-if chain comparing one identifier to constants
+        self.subject = None
+        self.case_type = None
+        self.table = None
+        self.fallback = None
 
     def __eq__(self, other):
         return super().__eq__(other)
 
     def eval(self, context):
         """Evaluate a n-component branch (if, else-if ..., else)."""
+        if self.table is not None:
+            value = context.find("id", self.subject)
+            if value.datatype is self.case_type:
+                conditional = self.table.get(value.data)
+                if conditional is not None:
+                    return conditional.children[1].eval(context)
+                if self.fallback is not None:
+                    return self.fallback.eval(context)
+                return env.Value(env.NULL)
         if len(self.children) > 1:
             for conditional in self.children[:-1]:  # all if / else if branches
                 result = conditional.eval(context)
                 if result != False:
                     return result
-            return run_in_substitution(self.children[-1], context)
+            return self.children[-1].eval(context)
         else:
             result = self.children[0].eval(context)
             if result != False:
@@ -118,6 +185,17 @@ class Branch(Node):
             else:
                 return env.Value(env.NULL)
 
+    def execute(self, context):
+        """Evaluate a n-component branch as a generator."""
+        for conditional in self.children[:-1]:
+            result = yield from conditional.execute(context)
+            if result != False:
+                return result
+        result = yield from self.children[-1].execute(context)
+        if len(self.children) == 1 and result == False:
+            return env.Value(env.NULL)
+        return result
+
 
 
 class Conditional(Node):
@@ -132,39 +210,338 @@ class Conditional(Node):
 
     def eval(self, context):
         """Evaluate a conditional (if [0] then [1])."""
-        correct = self.children[0].eval(context)
-        if correct.data not in (True, False):
-            raise Exception("Bad conditional")
-        else:
-            if correct.data:
-                return run_in_substitution(self.children[1], context)
-            else:
-                return False
+        if check_condition(self.children[0], context):
+            return self.children[1].eval(context)
+        return False
+
+    def execute(self, context):
+        """Evaluate a conditional as a generator."""
+        if check_condition(self.children[0], context):
+            return (yield from self.children[1].execute(context))
+        return False
 
 
 class Loop(Node):
     """A loop node."""
     name = "loop"
 
-    def __init__(self):
+    def __init__(self, substitute=True):
         super().__init__()
+        self.substitute = substitute
+        # invariant expressions evaluated once per loop activation
+        self.invariants = []
+        # the increment of a counted loop taken out of the body
+        self.increment = None
+        # the induction variable, its step per iteration and the bound it runs to
+        self.counter = None
+        self.step = 0
+        self.bound = None
+        self.inclusive = False
+        # compiles the loop once it is hot, see optimizer.tier_nodes
+        self.compiler = None
+        self.iterations = 0
+        self.compiled = None
+        # records the hot loop into a guarded Python function, see runtime.trace
+        self.tracer = None
+        self.trace = None
 
     def __eq__(self, other):
         return super().__eq__(other)
 
+    def count(self, context, variable, stop):
+        """Evaluate a counted loop by iterating a Python range.
+
+        Only the data of the induction variable is updated, the condition
+        and the increment are not evaluated.
+        """
+        if self.trace is not None and self.trace.run(context, stop):
+            return env.Value(env.NULL)
+        run = self.children[1].eval if self.compiled is None else self.compiled[1]
+        parent = context.namespace
+        frame = env.Namespace.acquire(parent) if self.substitute else parent
+        value = env.Value(env.NULL)
+        for index in range(variable.data, stop, self.step):
+            variable.data = index
+            context.namespace = frame
+            result = run(context)
+            context.namespace = parent
+            if frame is not parent:
+                if frame.captured:
+                    frame = env.Namespace.acquire(parent)
+                else:
+                    frame.clear()
+            bhv = context.behaviour
+            if bhv is RETURN_BEHAVIOUR:
+                value = result
+                break
+            else:
+                context.behaviour = DEFAULT_BEHAVIOUR
+                if bhv is BREAK_BEHAVIOUR:
+                    break
+            variable.data = index + self.step
+            if self.compiled is None and self.compiler is not None and self.promote(context, True):
+                run = self.compiled[1]
+                if self.trace is not None and self.trace.run(context, stop):
+                    break
+        if frame is not parent:
+            frame.release()
+        return value
+
+    def promote(self, context, counted=False):
+        """Counts an iteration and compiles and traces the loop once it is hot."""
+        self.iterations += 1
+        if self.iterations < flags.loop_threshold:
+            return False
+        self.compiled = self.compiler(self)
+        if self.tracer is not None and flags.trace_loops:
+            self.trace = self.tracer(self, context, counted)
+        return True
+
     def eval(self, context):
-        """Evaluate a 2-component loop. for [0] { ... }"""
-        cond = Conditional.eval(self, context)
-        while cond != False:
+        """Evaluate a 2-component loop. for [0] { ... }
+
+        The body runs in a single frame which is cleared between iterations
+        instead of allocating a new namespace per iteration. Bodies without
+        declarations run in the enclosing namespace. Hot loops switch to
+        their compiled condition and body between two iterations and run
+        their trace while the guards of the trace hold.
+        """
+        for invariant in self.invariants:
+            invariant.value = None
+        if self.counter is not None:
+            variable = context.find("id", self.counter)
+            bound = self.bound.eval(context)
+            if (variable.datatype is lib.INTEGER and bound.datatype is lib.INTEGER
+                    and type(variable.data) is int and type(bound.data) is int):
+                stop = bound.data
+                if self.inclusive:
+                    stop += 1 if self.step > 0 else -1
+                return self.count(context, variable, stop)
+        if self.trace is not None and self.trace.run(context):
+            return env.Value(env.NULL)
+        if self.compiled is None:
+            test, run = self.children[0].eval, self.children[1].eval
+        else:
+            test, run = self.compiled
+        parent = context.namespace
+        frame = env.Namespace.acquire(parent) if self.substitute else parent
+        value = env.Value(env.NULL)
+        while True:
+            correct = test(context)
+            if correct.data not in (True, False):
+                raise Exception("Bad conditional")
+            if not correct.data:
+                break
+            context.namespace = frame
+            result = run(context)
+            if self.increment is not None and context.behaviour is DEFAULT_BEHAVIOUR:
+                self.increment.eval(context)
+            context.namespace = parent
+            if frame is not parent:
+                if frame.captured:
+                    frame = env.Namespace.acquire(parent)
+                else:
+                    frame.clear()
             bhv = context.behaviour
             if bhv is RETURN_BEHAVIOUR:
-                return cond
+                value = result
+                break
             else:
                 context.behaviour = DEFAULT_BEHAVIOUR
                 if bhv is BREAK_BEHAVIOUR:
-                    return env.Value(env.NULL)
-            cond = Conditional.eval(self, context)
-        return env.Value(env.NULL)
+                    break
+            if self.compiled is None and self.compiler is not None and self.promote(context):
+                test, run = self.compiled
+                if self.trace is not None and self.trace.run(context):
+                    break
+        if frame is not parent:
+            frame.release()
+        return value
+
+    def execute(self, context):
+        """Evaluate a 2-component loop as a generator."""
+        condition, body = self.children[0], self.children[1]
+        for invariant in self.invariants:
+            invariant.value = None
+        parent = context.namespace
+        frame = env.Namespace.acquire(parent) if self.substitute else parent
+        value = env.Value(env.NULL)
+        while check_condition(condition, context):
+            context.namespace = frame
+            result = yield from body.execute(context)
+            if self.increment is not None and context.behaviour is DEFAULT_BEHAVIOUR:
+                self.increment.eval(context)
+            context.namespace = parent
+            if frame is not parent:
+                if frame.captured:
+                    frame = env.Namespace.acquire(parent)
+                else:
+                    frame.clear()
+            bhv = context.behaviour
+            if bhv is RETURN_BEHAVIOUR:
+                value = result
+                break
+            else:
+                context.behaviour = DEFAULT_BEHAVIOUR
+                if bhv is BREAK_BEHAVIOUR:
+                    break
+        if frame is not parent:
+            frame.release()
+        return value
+
+
+class Iteration(Node):
+    """A loop node iterating the elements of a value."""
+    name = "iteration"
+
+    def describe(self):
+        return "iteration %s" % self.variable
+
+    def __init__(self, variable, substitute=True):
+        super().__init__()
+        self.variable = variable
+        self.substitute = substitute
+        # invariant expressions evaluated once per loop activation
+        self.invariants = []
+        # compiles the body once it is hot, see optimizer.tier_nodes
+        self.compiler = None
+        self.iterations = 0
+        self.compiled = None
+
+    def __eq__(self, other):
+        return super().__eq__(other) and self.variable == other.variable
+
+    def promote(self):
+        """Counts an iteration and compiles the body once it is hot."""
+        self.iterations += 1
+        if self.iterations < flags.loop_threshold:
+            return False
+        self.compiled = self.compiler(self)
+        return True
+
+    def eval(self, context):
+        """Evaluate a 2-component iteration. for (variable in [0]) { [1] }
+
+        The elements are drawn lazily from the iterator of the value. The
+        frame and the loop variable are reused across iterations, ranges
+        are iterated as native Python ranges.
+        """
+        iterable = self.children[0].eval(context)
+        run = self.children[1].eval if self.compiled is None else self.compiled
+        for invariant in self.invariants:
+            invariant.value = None
+        if iterable.datatype is lib.RANGE:
+            items, datatype = iterable.data, lib.INTEGER
+        else:
+            items, datatype = env.iterate(iterable), None
+        # drawing from an iterator runs its generator, which may assign any variable
+        invariants = self.invariants if iterable.datatype is lib.ITERATOR else ()
+        parent = context.namespace
+        frame = env.Namespace.acquire(parent)
+        variable = env.Value(env.NULL, None, self.variable)
+        frame.store(variable)
+        value = env.Value(env.NULL)
+        for item in items:
+            for invariant in invariants:
+                invariant.value = None
+            if datatype is None:
+                variable.datatype, variable.data = item.datatype, item.data
+            else:
+                variable.datatype, variable.data = datatype, item
+            context.namespace = frame
+            result = run(context)
+            context.namespace = parent
+            if frame.captured:
+                frame = env.Namespace.acquire(parent)
+                variable = env.Value(env.NULL, None, self.variable)
+                frame.store(variable)
+            elif self.substitute:
+                frame.clear()
+                frame.store(variable)
+            bhv = context.behaviour
+            if bhv is RETURN_BEHAVIOUR:
+                value = result
+                break
+            else:
+                context.behaviour = DEFAULT_BEHAVIOUR
+                if bhv is BREAK_BEHAVIOUR:
+                    break
+            if self.compiled is None and self.compiler is not None and self.promote():
+                run = self.compiled
+        frame.release()
+        return value
+
+    def execute(self, context):
+        """Evaluate a 2-component iteration as a generator."""
+        iterable, body = self.children[0].eval(context), self.children[1]
+        for invariant in self.invariants:
+            invariant.value = None
+        parent = context.namespace
+        frame = env.Namespace.acquire(parent)
+        variable = env.Value(env.NULL, None, self.variable)
+        frame.store(variable)
+        value = env.Value(env.NULL)
+        for item in env.iterate(iterable):
+            variable.datatype, variable.data = item.datatype, item.data
+            context.namespace = frame
+            result = yield from body.execute(context)
+            context.namespace = parent
+            if frame.captured:
+                frame = env.Namespace.acquire(parent)
+                variable = env.Value(env.NULL, None, self.variable)
+                frame.store(variable)
+            elif self.substitute:
+                frame.clear()
+                frame.store(variable)
+            bhv = context.behaviour
+            if bhv is RETURN_BEHAVIOUR:
+                value = result
+                break
+            else:
+                context.behaviour = DEFAULT_BEHAVIOUR
+                if bhv is BREAK_BEHAVIOUR:
+                    break
+        frame.release()
+        return value
+
+
+class Invariant(Node):
+    """A loop-invariant expression evaluated once per loop activation."""
+    name = "invariant"
+
+    def __init__(self):
+        super().__init__()
+        # the value of the current loop activation, reset by the loop
+        self.value = None
+
+    def __eq__(self, other):
+        return super().__eq__(other)
+
+    def eval(self, context):
+        """Evaluate the expression on first use and return the memoized value."""
+        if self.value is None:
+            self.value = self.children[0].eval(context)
+        return self.value
+
+
+class Shared(Node):
+    """A common subexpression whose value is shared through a cell."""
+    name = "shared"
+
+    def __init__(self, cell):
+        super().__init__()
+        # one-element list holding the value of the current block activation
+        self.cell = cell
+
+    def __eq__(self, other):
+        return super().__eq__(other)
+
+    def eval(self, context):
+        """Evaluate the expression unless a node of the cell already did."""
+        cell = self.cell
+        if cell[0] is None:
+            cell[0] = self.children[0].eval(context)
+        return cell[0]
 
 
 class Operation(Node):
@@ -177,15 +554,32 @@ class Operation(Node):
     def __init__(self, symbol):
         super().__init__()
         self.symbol = symbol
+        # the kernel selected for the proven operand types, see optimizer.infer_types
+        self.kernel = None
 
     def __eq__(self, other):
         return super().__eq__(other) and self.symbol == other.symbol
 
     def eval(self, context):
         """Evaluate an operator and return the result."""
+        if self.kernel is not None:
+            function, datatype = self.kernel
+            return env.Value(datatype, function(self.children[0].eval(context).data,
+                                                self.children[1].eval(context).data))
         operator = context.find("op", self.symbol)
         if operator is not None:
-            args = [child.eval(context) for child in self.children]
+            if operator.short_circuit is not None and len(self.children) == 2:
+                first = self.children[0].eval(context)
+                result = operator.short_circuit(first)
+                if result is not None:
+                    return result
+                args = [first, self.children[1].eval(context)]
+            else:
+                args = [child.eval(context) for child in self.children]
+            if len(args) == 2:
+                kernel = operator.kernels.get((args[0].datatype, args[1].datatype))
+                if kernel is not None:
+                    return env.Value(kernel[1], kernel[0](args[0].data, args[1].data))
             return operator.eval(args, context)
         raise Exception("Operator not found")
 
@@ -200,21 +594,82 @@ class Call(Node):
     def __init__(self, identity):
         super().__init__()
         self.identity = identity
+        # the body of the inlined function and its expression reading the arguments
+        self.inline_body = None
+        self.inline_expression = None
+        self.inline_values = []
+        # the function, argument types, signature and body of the last call
+        self.cache = None
 
     def __eq__(self, other):
         return super().__eq__(other) and self.identity == other.identity
 
+    def invoke(self, function, args, context):
+        """Calls the function, reusing the signature and body of the last call.
+
+        Every call site caches the body it selected for the types of its
+        arguments, so a site keeps calling its own specialized body without
+        searching the signatures and clones again while the types repeat.
+        """
+        if type(function) is not env.Function:
+            return function.eval(args, context)
+        types = tuple(arg.datatype for arg in args)
+        cache = self.cache
+        if cache is not None and cache[0] is function and cache[1] == types:
+            signature, body = cache[2], cache[3]
+            values = signature.match(args)[0]
+        else:
+            signature, values, body = function.select(args)
+            self.cache = (function, types, signature, body)
+        return function.run(signature, values, body, context)
+
+    def can_inline(self, function, args):
+        """Checks if the function is the inlined one and accepts the arguments."""
+        if type(function) is not env.Function or len(function.signatures) != 1:
+            return False
+        signature = function.signatures[0]
+        if signature.function is not self.inline_body or len(args) != len(signature.expected):
+            return False
+        for arg, expected in zip(args, signature.expected):
+            if not arg.datatype.kind_of(expected.datatype):
+                return False
+        return True
+
     def eval(self, context):
         """Evaluate a function call and return the result."""
         function = context.find("id", self.identity)
         if function is not None:
             args = [child.eval(context) for child in self.children]
-            result = function.eval(args, context)
+            if self.inline_body is not None and self.can_inline(function, args):
+                self.inline_values[:] = args
+                return self.inline_expression.eval(context)
+            result = self.invoke(function, args, context)
             context.behaviour = DEFAULT_BEHAVIOUR
             return result
         raise Exception("Function not found")
 
 
+class Argument(Node):
+    """A parameter of an inlined function."""
+    name = "argument"
+
+    def describe(self):
+        return "argument %d" % self.index
+
+    def __init__(self, values, index):
+        super().__init__()
+        # the argument values of the current call, shared by all parameters
+        self.values = values
+        self.index = index
+
+    def __eq__(self, other):
+        return super().__eq__(other) and self.index == other.index
+
+    def eval(self, context):
+        """Returns the argument value of the current call."""
+        return self.values[self.index]
+
+
 class Identifier(Node):
     """A node representing an identifier."""
     name = "identifier"
@@ -279,6 +734,37 @@ class Cast(Node):
         raise Exception("Type not found")
 
 
+class Member(Node):
+    """A field access node."""
+    name = "member"
+
+    def describe(self):
+        return "member %s" % self.field
+
+    def __init__(self, field):
+        super().__init__()
+        self.field = field
+        # the last record type seen and the slot of the field in it
+        self.cached_type = None
+        self.cached_slot = None
+
+    def __eq__(self, other):
+        return super().__eq__(other) and self.field == other.field
+
+    def eval(self, context):
+        """Evaluate a field access and return the field value."""
+        value = self.children[0].eval(context)
+        datatype = value.datatype
+        if datatype is not self.cached_type:
+            slots = getattr(datatype, "slots", None)
+            if slots is None or self.field not in slots:
+                raise env.RuntimeException("%s has no field %s" % (datatype, self.field))
+            self.cached_type = datatype
+            self.cached_slot = slots[self.field]
+        slot = self.cached_slot
+        return env.Value(datatype.field_types[slot], value.data[slot])
+
+
 class Return(Node):
     """A return node."""
     name = "return"
@@ -294,10 +780,70 @@ class Return(Node):
 
         Changes the behaviour context to 'RETURN'.
         """
-        value = Sequence.eval(self, context)
+        value = env.Value(env.NULL)
+        if self.children:
+            value = self.children[0].eval(context)
         context.behaviour = RETURN_BEHAVIOUR
         return value
 
+class Yield(Node):
+    """A yield node."""
+    name = "yield"
+
+    def __init__(self):
+        super().__init__()
+
+    def __eq__(self, other):
+        return super().__eq__(other)
+
+    def eval(self, context):
+        """Yield statements are only evaluated by generators."""
+        raise env.RuntimeException("yield outside of a generator function")
+
+    def execute(self, context):
+        """Suspends the generator with the value of the expression."""
+        value = self.children[0].eval(context)
+        yield env.Value(value.datatype, value.data)
+        return env.Value(env.NULL)
+
+
+class Generator(Node):
+    """A generator function body."""
+    name = "generator"
+
+    def __init__(self):
+        super().__init__()
+
+    def __eq__(self, other):
+        return super().__eq__(other)
+
+    def eval(self, context):
+        """Returns an iterator running the body lazily in the call frame.
+
+        Every resume swaps in the namespace and behaviour the body was
+        suspended with and restores the ones of the consumer afterwards.
+        """
+        frame = context.namespace
+        # the frame and the frames it is nested in outlive the call
+        frame.capture()
+        body = self.children[0].execute(context)
+
+        def stream():
+            namespace, behaviour = frame, DEFAULT_BEHAVIOUR
+            while True:
+                caller = context.namespace, context.behaviour
+                context.namespace, context.behaviour = namespace, behaviour
+                try:
+                    item = next(body)
+                except StopIteration:
+                    return
+                finally:
+                    namespace, behaviour = context.namespace, context.behaviour
+                    context.namespace, context.behaviour = caller
+                yield item
+
+        return env.Value(lib.ITERATOR, stream())
+
 class Break(Node):
     """A break node."""
     name = "break"
@@ -338,6 +884,12 @@ class Definition(Node):
         super().__init__()
         self.name = name
         self.args = args
+        # specializes the body for argument types, see optimizer.specialize_functions
+        self.specializer = None
+        # compiles the body once it is hot, see optimizer.tier_nodes
+        self.compiler = None
+        # applies and collects the feedback of earlier runs, see runtime.profile
+        self.profile = None
 
     def __eq__(self, other):
         return super().__eq__(other) and self.name == other.name and self.args == other.args
@@ -354,13 +906,53 @@ class Definition(Node):
             # convert types from text to type
             for arg in self.args:
                 arg.datatype = context.find("ty", arg.datatype)
-            signature = env.Signature(self.args, self.children[0])
-
+            body = self.children[0]
+            if contains_yield(body):
+                body = Generator()
+                body.add(self.children[0])
+            signature = env.Signature(self.args, body)
+            signature.specializer = self.specializer
+            signature.compiler, signature.threshold = self.compiler, flags.call_threshold
+            if self.profile is not None:
+                self.profile(signature, context)
+
+            # the function keeps its source namespace and its parents alive
+            context.namespace.capture()
             fnc = env.Function([signature], self.name, context.namespace)
             context.store(fnc)
 
             return fnc
 
+class Record(Node):
+    """A record definition node."""
+    name = "record"
+
+    def __init__(self, name, fields):
+        super().__init__()
+        self.name = name
+        self.fields = fields
+
+    def __eq__(self, other):
+        return super().__eq__(other) and self.name == other.name and self.fields == other.fields
+
+    def describe(self):
+        return "record %s: (%s)" % (self.name, ', '.join("%s: %s" % field for field in self.fields))
+
+    def eval(self, context):
+        """Stores the record type and its constructor in the local namespace."""
+        if self.name in context.namespace.search_spaces["ty"]:
+            raise env.RuntimeException("The type %s is already defined" % self.name)
+        fields = []
+        for field, type_name in self.fields:
+            field_type = context.find("ty", type_name)
+            if field_type.cast is None:
+                raise env.RuntimeException("Field %s needs a concrete type, got %s" % (field, field_type))
+            fields.append((field, field_type))
+        datatype, constructor = lib.record(self.name, fields)
+        context.store(datatype)
+        context.store(constructor)
+        return constructor
+
 class Declaration(Node):
     """A declaration node."""
     name = "declaration"
@@ -383,6 +975,8 @@ class Declaration(Node):
             raise env.RuntimeException("The name %s is already in use" % self.name)
         # Search for type
         datatype = context.find("ty", self.datatype)
+        if datatype.cast is None:
+            raise env.RuntimeException("A value of type %s can not be declared" % self.datatype)
         casted_value = datatype.cast(env.Value(env.NULL))
         casted_value.name = self.name
         context.store(casted_value)
@@ -419,6 +1013,92 @@ class Assignment(Node):
 
         return value
 
+def assign_operation(context, variable, symbol, operand):
+    """Applies an operator to a variable and an operand and stores the result in the variable."""
+    operator = context.find("op", symbol)
+    kernel = operator.kernels.get((variable.datatype, operand.datatype))
+    if kernel is not None and kernel[1] is variable.datatype:
+        # the result has the type of the variable, so it can be updated in place
+        variable.data = kernel[0](variable.data, operand.data)
+        return variable
+    value = operator.eval([variable, operand], context)
+    if variable.datatype != value.datatype:
+        raise env.AssignmentException(value.datatype, variable.datatype)
+    variable.data = value.data
+    return value
+
+
+class BinaryAssignment(Node):
+    """A assignment node storing the result of an operation on the variable itself."""
+    name = "binary_assignment"
+
+    def describe(self):
+        return "binary_assignment %s %s" % (self.name, self.symbol)
+
+    def __init__(self, name, symbol):
+        super().__init__()
+        self.name = name
+        self.symbol = symbol
+
+    def __eq__(self, other):
+        return super().__eq__(other) and self.name == other.name and self.symbol == other.symbol
+
+    def eval(self, context):
+        """Resolves the variable once and updates it with the operand."""
+        variable = context.find("id", self.name)
+        return assign_operation(context, variable, self.symbol, self.children[0].eval(context))
+
+
+class Increment(Node):
+    """A assignment node adding or subtracting a constant from the variable itself."""
+    name = "increment"
+
+    def describe(self):
+        return "increment %s %s %s" % (self.name, self.symbol, self.value.data)
+
+    def __init__(self, name, symbol, value):
+        super().__init__()
+        self.name = name
+        self.symbol = symbol
+        self.value = value
+
+    def __eq__(self, other):
+        return (super().__eq__(other) and self.name == other.name
+                and self.symbol == other.symbol and self.value == other.value)
+
+    def eval(self, context):
+        """Resolves the variable once and updates it with the constant."""
+        variable = context.find("id", self.name)
+        return assign_operation(context, variable, self.symbol, self.value)
+
+
+class Compare(Node):
+    """A operation node comparing a variable with a constant."""
+    name = "compare"
+
+    def describe(self):
+        return "compare %s %s %s" % (self.name, self.symbol, self.value.data)
+
+    def __init__(self, name, symbol, value):
+        super().__init__()
+        self.name = name
+        self.symbol = symbol
+        self.value = value
+
+    def __eq__(self, other):
+        return (super().__eq__(other) and self.name == other.name
+                and self.symbol == other.symbol and self.value == other.value)
+
+    def eval(self, context):
+        """Compares the variable with the constant."""
+        operator = context.find("op", self.symbol)
+        variable = context.find("id", self.name)
+        kernel = operator.kernels.get((variable.datatype, self.value.datatype))
+        if kernel is not None:
+            return env.Value(kernel[1], kernel[0](variable.data, self.value.data))
+        return operator.eval([variable, self.value], context)
+
+
 def syntax_tree():
     """Initialize a default syntax tree."""
     return Sequence()
@@ -0,0 +1,363 @@
+"""The collection library for LIST, MAP and SET values."""
+from runtime.env import (Datatype, Value, Function, Signature, FunctionBinding,
+                         RuntimeException, CastException, ANY, NULL)
+from runtime.lib import (NUMBER, INTEGER, FLOAT, BOOLEAN, STRING, LIST, MAP, SET,
+                         box)
+from runtime.persistent import PersistentArray, PersistentVector
+
+
+def _typed_list(name, typecode, element_type):
+    """Creates a list type storing its elements unboxed in a persistent array."""
+    def cast_typed_list(value):
+        """Casts a value to a typed list."""
+        if isinstance(value, Value):
+            if value.datatype is datatype:
+                return Value(datatype, value.data)
+            if value.datatype.kind_of(LIST):
+                items = [element_type.cast(element(value, item)).data for item in value.data]
+                return Value(datatype, PersistentArray(typecode, items))
+            if value.datatype is NULL:
+                return Value(datatype, PersistentArray(typecode))
+        raise CastException(value, datatype)
+
+    def iterate_typed_list(data):
+        """Iterates the elements of a typed list as values."""
+        if element_type is BOOLEAN:
+            return (Value(BOOLEAN, bool(item)) for item in data)
+        return (Value(element_type, item) for item in data)
+
+    datatype = Datatype(name, cast_typed_list, LIST, lambda x: name, iterate_typed_list)
+    return datatype
+
+INT_LIST = _typed_list("intlist", "q", INTEGER)
+FLOAT_LIST = _typed_list("floatlist", "d", FLOAT)
+BOOL_LIST = _typed_list("boollist", "b", BOOLEAN)
+
+# element types of the typed lists
+ELEMENT_TYPES = {
+    INT_LIST: INTEGER,
+    FLOAT_LIST: FLOAT,
+    BOOL_LIST: BOOLEAN,
+}
+
+
+def element(value, item):
+    """Boxes an element of a list value."""
+    datatype = ELEMENT_TYPES.get(value.datatype)
+    if datatype is None:
+        return box(item)
+    if datatype is BOOLEAN:
+        return Value(BOOLEAN, bool(item))
+    return Value(datatype, item)
+
+
+def build(value, items):
+    """Creates a list of the same kind as the value from host data."""
+    if value.datatype in ELEMENT_TYPES:
+        return Value(value.datatype, PersistentArray(value.data.typecode, items))
+    return Value(LIST, PersistentVector(items))
+
+
+def _length_function():
+    def length(context):
+        """Returns the number of elements."""
+        var_a = context.find("id", "a")
+        return Value(INTEGER, len(var_a.data))
+
+    length_node = FunctionBinding(length)
+    signatures = [
+        Signature([
+            Value(datatype, None, "a"),
+        ], length_node) for datatype in (LIST, MAP, SET, STRING)
+    ]
+    return Function(signatures, "length")
+
+LENGTH_FUNCTION = _length_function()
+
+
+def _get_function():
+    def get_index(context):
+        """Returns the element at an index."""
+        var_a = context.find("id", "a")
+        var_b = context.find("id", "b")
+        try:
+            return element(var_a, var_a.data[int(var_b.data)])
+        except IndexError:
+            raise RuntimeException("Index %d is out of range" % var_b.data)
+
+    def get_key(context):
+        """Returns the value stored at a key."""
+        var_a = context.find("id", "a")
+        var_b = context.find("id", "b")
+        try:
+            return box(var_a.data[var_b.data])
+        except KeyError:
+            raise RuntimeException("Key %s does not exist" % var_b.format())
+
+    signatures = [
+        Signature([
+            Value(LIST, None, "a"),
+            Value(INTEGER, None, "b"),
+        ], FunctionBinding(get_index)),
+        Signature([
+            Value(MAP, None, "a"),
+            Value(ANY, None, "b"),
+        ], FunctionBinding(get_key)),
+    ]
+    return Function(signatures, "get")
+
+GET_FUNCTION = _get_function()
+
+
+def _append_function():
+    def append(context):
+        """Returns a new list with the element appended."""
+        var_a = context.find("id", "a")
+        var_b = context.find("id", "b")
+        if var_a.datatype in ELEMENT_TYPES:
+            if not var_b.datatype.kind_of(ELEMENT_TYPES[var_a.datatype]):
+                raise RuntimeException("%s can not be appended to %s" % (var_b.datatype, var_a.datatype))
+        return Value(var_a.datatype, var_a.data.append(var_b.data))
+
+    append_node = FunctionBinding(append)
+    signatures = [
+        Signature([
+            Value(LIST, None, "a"),
+            Value(ANY, None, "b"),
+        ], append_node),
+    ]
+    return Function(signatures, "append")
+
+APPEND_FUNCTION = _append_function()
+
+
+def _slice_function():
+    def slice_list(context):
+        """Returns the elements between two indices."""
+        var_a = context.find("id", "a")
+        var_b = context.find("id", "b")
+        var_c = context.find("id", "c")
+        return build(var_a, var_a.data[int(var_b.data):int(var_c.data)])
+
+    slice_node = FunctionBinding(slice_list)
+    signatures = [
+        Signature([
+            Value(LIST, None, "a"),
+            Value(INTEGER, None, "b"),
+            Value(INTEGER, None, "c"),
+        ], slice_node),
+    ]
+    return Function(signatures, "slice")
+
+SLICE_FUNCTION = _slice_function()
+
+
+def _contains_function():
+    def contains(context):
+        """Returns true if the element or key is part of the collection."""
+        var_a = context.find("id", "a")
+        var_b = context.find("id", "b")
+        return Value(BOOLEAN, var_b.data in var_a.data)
+
+    contains_node = FunctionBinding(contains)
+    signatures = [
+        Signature([
+            Value(datatype, None, "a"),
+            Value(ANY, None, "b"),
+        ], contains_node) for datatype in (LIST, SET, MAP)
+    ]
+    return Function(signatures, "contains")
+
+CONTAINS_FUNCTION = _contains_function()
+
+
+def _keys_function():
+    def keys(context):
+        """Returns the keys of a map as list."""
+        var_a = context.find("id", "a")
+        return Value(LIST, PersistentVector(var_a.data))
+
+    keys_node = FunctionBinding(keys)
+    signatures = [
+        Signature([
+            Value(MAP, None, "a"),
+        ], keys_node),
+    ]
+    return Function(signatures, "keys")
+
+KEYS_FUNCTION = _keys_function()
+
+
+def _put_function():
+    def put(context):
+        """Returns a new map with the key set to the value."""
+        var_a = context.find("id", "a")
+        var_b = context.find("id", "b")
+        var_c = context.find("id", "c")
+        return Value(MAP, var_a.data.set(var_b.data, var_c.data))
+
+    put_node = FunctionBinding(put)
+    signatures = [
+        Signature([
+            Value(MAP, None, "a"),
+            Value(ANY, None, "b"),
+            Value(ANY, None, "c"),
+        ], put_node),
+    ]
+    return Function(signatures, "put")
+
+PUT_FUNCTION = _put_function()
+
+
+def _remove_function():
+    def remove(context):
+        """Returns a new collection without the key or element."""
+        var_a = context.find("id", "a")
+        var_b = context.find("id", "b")
+        return Value(var_a.datatype, var_a.data.remove(var_b.data))
+
+    remove_node = FunctionBinding(remove)
+    signatures = [
+        Signature([
+            Value(datatype, None, "a"),
+            Value(ANY, None, "b"),
+        ], remove_node) for datatype in (MAP, SET)
+    ]
+    return Function(signatures, "remove")
+
+REMOVE_FUNCTION = _remove_function()
+
+
+def _union_function():
+    def union(context):
+        """Returns all elements of both sets."""
+        var_a = context.find("id", "a")
+        var_b = context.find("id", "b")
+        return Value(SET, var_a.data | var_b.data)
+
+    union_node = FunctionBinding(union)
+    signatures = [
+        Signature([
+            Value(SET, None, "a"),
+            Value(SET, None, "b"),
+        ], union_node),
+    ]
+    return Function(signatures, "union")
+
+UNION_FUNCTION = _union_function()
+
+
+def _intersection_function():
+    def intersection(context):
+        """Returns the elements contained in both sets."""
+        var_a = context.find("id", "a")
+        var_b = context.find("id", "b")
+        return Value(SET, var_a.data & var_b.data)
+
+    intersection_node = FunctionBinding(intersection)
+    signatures = [
+        Signature([
+            Value(SET, None, "a"),
+            Value(SET, None, "b"),
+        ], intersection_node),
+    ]
+    return Function(signatures, "intersection")
+
+INTERSECTION_FUNCTION = _intersection_function()
+
+
+def _sort_function():
+    def sort(context):
+        """Returns a sorted list."""
+        var_a = context.find("id", "a")
+        try:
+            return build(var_a, sorted(var_a.data))
+        except TypeError:
+            raise RuntimeException("Elements of different types may not be sorted.")
+
+    sort_node = FunctionBinding(sort)
+    signatures = [
+        Signature([
+            Value(LIST, None, "a"),
+        ], sort_node),
+    ]
+    return Function(signatures, "sort")
+
+SORT_FUNCTION = _sort_function()
+
+
+def _join_function():
+    def join(context):
+        """Joins the elements of a list with a separator."""
+        var_a = context.find("id", "a")
+        var_b = context.find("id", "b")
+        parts = [str(STRING.cast(element(var_a, item)).data) for item in var_a.data]
+        return Value(STRING, str(var_b.data).join(parts))
+
+    join_node = FunctionBinding(join)
+    signatures = [
+        Signature([
+            Value(LIST, None, "a"),
+            Value(STRING, None, "b"),
+        ], join_node),
+    ]
+    return Function(signatures, "join")
+
+JOIN_FUNCTION = _join_function()
+
+def _push_function():
+    def push(context):
+        """Returns a new typed list with the element appended."""
+        var_a = context.find("id", "a")
+        var_b = context.find("id", "b")
+        return Value(var_a.datatype, var_a.data.append(var_b.data))
+
+    push_node = FunctionBinding(push)
+    signatures = [
+        Signature([
+            Value(INT_LIST, None, "a"),
+            Value(INTEGER, None, "b"),
+        ], push_node),
+        Signature([
+            Value(FLOAT_LIST, None, "a"),
+            Value(NUMBER, None, "b"),
+        ], push_node),
+        Signature([
+            Value(BOOL_LIST, None, "a"),
+            Value(BOOLEAN, None, "b"),
+        ], push_node),
+    ]
+    return Function(signatures, "push")
+
+PUSH_FUNCTION = _push_function()
+
+
+def _extend_function():
+    def extend(context):
+        """Returns a new typed list with all elements of a list appended."""
+        var_a = context.find("id", "a")
+        var_b = context.find("id", "b")
+        if var_b.datatype is not var_a.datatype:
+            var_b = var_a.datatype.cast(var_b)
+        return Value(var_a.datatype, var_a.data.extend(var_b.data))
+
+    extend_node = FunctionBinding(extend)
+    signatures = [
+        Signature([
+            Value(datatype, None, "a"),
+            Value(LIST, None, "b"),
+        ], extend_node) for datatype in (INT_LIST, FLOAT_LIST, BOOL_LIST)
+    ]
+    return Function(signatures, "extend")
+
+EXTEND_FUNCTION = _extend_function()
+
+EXPORTS = [
+    # Datatypes
+    INT_LIST, FLOAT_LIST, BOOL_LIST,
+    # Functions
+    LENGTH_FUNCTION, GET_FUNCTION, APPEND_FUNCTION, SLICE_FUNCTION,
+    CONTAINS_FUNCTION, KEYS_FUNCTION, PUT_FUNCTION, REMOVE_FUNCTION,
+    UNION_FUNCTION, INTERSECTION_FUNCTION, SORT_FUNCTION, JOIN_FUNCTION,
+    PUSH_FUNCTION, EXTEND_FUNCTION,
+]
@@ -0,0 +1,313 @@
+"""Compile hot parts of an abstract syntax tree into Python closures.
+
+A compiled node is a function taking the context and returning the same
+value as the eval method of the node. The closures resolve the children,
+attributes and kernels of the nodes once instead of on every evaluation.
+Nodes without a compiler keep running through their eval method.
+"""
+from runtime import ast, env
+
+DEFAULT_BEHAVIOUR = ast.DEFAULT_BEHAVIOUR
+RETURN_BEHAVIOUR = ast.RETURN_BEHAVIOUR
+Value = env.Value
+
+
+def compile_node(node):
+    """Returns a function evaluating the node."""
+    compiler = COMPILERS.get(type(node))
+    if compiler is None:
+        return node.eval
+    return compiler(node)
+
+
+def compile_body(body):
+    """Compiles the body of a function."""
+    return env.FunctionBinding(compile_node(body))
+
+
+def compile_loop(loop):
+    """Compiles the condition and the body of a loop."""
+    return compile_node(loop.children[0]), compile_node(loop.children[1])
+
+
+def compile_iteration(iteration):
+    """Compiles the body of an iteration."""
+    return compile_node(iteration.children[1])
+
+
+def compile_sequence(node):
+    """Compiles a sequence node."""
+    statements = [compile_node(child) for child in node.children]
+    substitute = node.substitute
+
+    def sequence(context):
+        parent = context.substitute() if substitute else None
+        saved = node.enter_cells() if node.cells else None
+        context.behaviour = DEFAULT_BEHAVIOUR
+        value = Value(env.NULL)
+        for statement in statements:
+            value = statement(context)
+            if context.behaviour is not DEFAULT_BEHAVIOUR:
+                break
+        if saved is not None:
+            node.leave_cells(saved)
+        if parent is not None:
+            context.namespace = parent
+        return value
+    return sequence
+
+
+def compile_condition(node):
+    """Compiles a condition into a function returning its truth value."""
+    evaluate = compile_node(node)
+
+    def condition(context):
+        correct = evaluate(context)
+        if correct.data not in (True, False):
+            raise Exception("Bad conditional")
+        return correct.data
+    return condition
+
+
+def compile_conditional(node):
+    """Compiles a conditional node."""
+    condition = compile_condition(node.children[0])
+    body = compile_node(node.children[1])
+
+    def conditional(context):
+        if condition(context):
+            return body(context)
+        return False
+    return conditional
+
+
+def compile_branch(node):
+    """Compiles a branch node."""
+    conditionals = [compile_node(child) for child in node.children]
+    last = conditionals.pop()
+    single = len(node.children) == 1
+    table = None
+    if node.table is not None:
+        subject, case_type = node.subject, node.case_type
+        table = {key: compile_node(conditional.children[1]) for key, conditional in node.table.items()}
+        fallback = compile_node(node.fallback) if node.fallback is not None else None
+
+    def branch(context):
+        if table is not None:
+            value = context.find("id", subject)
+            if value.datatype is case_type:
+                body = table.get(value.data)
+                if body is not None:
+                    return body(context)
+                if fallback is not None:
+                    return fallback(context)
+                return Value(env.NULL)
+        for conditional in conditionals:
+            result = conditional(context)
+            if result is not False:
+                return result
+        result = last(context)
+        if single and result is False:
+            return Value(env.NULL)
+        return result
+    return branch
+
+
+def compile_literal(node):
+    """Compiles a literal node."""
+    value = node.value
+
+    def literal(context):
+        return value
+    return literal
+
+
+def compile_identifier(node):
+    """Compiles a identifier node."""
+    identity = node.identity
+
+    def identifier(context):
+        return context.namespace.find("id", identity)
+    return identifier
+
+
+def compile_argument(node):
+    """Compiles a argument node."""
+    values, index = node.values, node.index
+
+    def argument(context):
+        return values[index]
+    return argument
+
+
+def compile_operation(node):
+    """Compiles a operation node."""
+    operands = [compile_node(child) for child in node.children]
+    if node.kernel is not None:
+        function, datatype = node.kernel
+        left, right = operands
+
+        def kernel(context):
+            return Value(datatype, function(left(context).data, right(context).data))
+        return kernel
+    symbol = node.symbol
+    binary = len(operands) == 2
+
+    def operation(context):
+        operator = context.find("op", symbol)
+        if binary:
+            first = operands[0](context)
+            if operator.short_circuit is not None:
+                result = operator.short_circuit(first)
+                if result is not None:
+                    return result
+            second = operands[1](context)
+            kernel = operator.kernels.get((first.datatype, second.datatype))
+            if kernel is not None:
+                return Value(kernel[1], kernel[0](first.data, second.data))
+            return operator.eval([first, second], context)
+        return operator.eval([operand(context) for operand in operands], context)
+    return operation
+
+
+def compile_compare(node):
+    """Compiles a compare node."""
+    name, symbol, constant = node.name, node.symbol, node.value
+
+    def compare(context):
+        operator = context.find("op", symbol)
+        variable = context.namespace.find("id", name)
+        kernel = operator.kernels.get((variable.datatype, constant.datatype))
+        if kernel is not None:
+            return Value(kernel[1], kernel[0](variable.data, constant.data))
+        return operator.eval([variable, constant], context)
+    return compare
+
+
+def compile_increment(node):
+    """Compiles a increment node."""
+    name, symbol, constant = node.name, node.symbol, node.value
+    assign = ast.assign_operation
+
+    def increment(context):
+        return assign(context, context.namespace.find("id", name), symbol, constant)
+    return increment
+
+
+def compile_binary_assignment(node):
+    """Compiles a binary assignment node."""
+    name, symbol = node.name, node.symbol
+    operand = compile_node(node.children[0])
+    assign = ast.assign_operation
+
+    def binary_assignment(context):
+        variable = context.namespace.find("id", name)
+        return assign(context, variable, symbol, operand(context))
+    return binary_assignment
+
+
+def compile_assignment(node):
+    """Compiles a assignment node."""
+    name = node.name
+    evaluate = compile_node(node.children[0])
+
+    if node.ignore_type:
+        def declaring_assignment(context):
+            variable = context.namespace.find("id", name)
+            value = evaluate(context)
+            variable.datatype = value.datatype
+            variable.data = value.data
+            return value
+        return declaring_assignment
+
+    def assignment(context):
+        variable = context.namespace.find("id", name)
+        value = evaluate(context)
+        if variable.datatype != value.datatype:
+            raise env.AssignmentException(value.datatype, variable.datatype)
+        variable.data = value.data
+        return value
+    return assignment
+
+
+def compile_return(node):
+    """Compiles a return node."""
+    evaluate = compile_node(node.children[0]) if node.children else None
+
+    def return_statement(context):
+        value = evaluate(context) if evaluate is not None else Value(env.NULL)
+        context.behaviour = RETURN_BEHAVIOUR
+        return value
+    return return_statement
+
+
+def compile_invariant(node):
+    """Compiles a invariant node."""
+    evaluate = compile_node(node.children[0])
+
+    def invariant(context):
+        if node.value is None:
+            node.value = evaluate(context)
+        return node.value
+    return invariant
+
+
+def compile_shared(node):
+    """Compiles a shared node."""
+    evaluate = compile_node(node.children[0])
+    cell = node.cell
+
+    def shared(context):
+        if cell[0] is None:
+            cell[0] = evaluate(context)
+        return cell[0]
+    return shared
+
+
+def compile_cast(node):
+    """Compiles a cast node."""
+    target = node.target
+    evaluate = compile_node(node.children[0])
+
+    def cast(context):
+        target_type = context.find("ty", target)
+        return target_type.cast(evaluate(context))
+    return cast
+
+
+def compile_call(node):
+    """Compiles a call node."""
+    identity = node.identity
+    arguments = [compile_node(child) for child in node.children]
+    inline = compile_node(node.inline_expression) if node.inline_expression is not None else None
+
+    def call(context):
+        function = context.find("id", identity)
+        args = [argument(context) for argument in arguments]
+        if inline is not None and node.can_inline(function, args):
+            node.inline_values[:] = args
+            return inline(context)
+        result = node.invoke(function, args, context)
+        context.behaviour = DEFAULT_BEHAVIOUR
+        return result
+    return call
+
+
+COMPILERS = {
+    ast.Sequence: compile_sequence,
+    ast.Conditional: compile_conditional,
+    ast.Branch: compile_branch,
+    ast.Literal: compile_literal,
+    ast.Identifier: compile_identifier,
+    ast.Argument: compile_argument,
+    ast.Operation: compile_operation,
+    ast.Compare: compile_compare,
+    ast.Increment: compile_increment,
+    ast.BinaryAssignment: compile_binary_assignment,
+    ast.Assignment: compile_assignment,
+    ast.Return: compile_return,
+    ast.Invariant: compile_invariant,
+    ast.Shared: compile_shared,
+    ast.Cast: compile_cast,
+    ast.Call: compile_call,
+}
@@ -15,10 +15,16 @@ class NamespaceException(RuntimeException):
 class Namespace:
     """A variable and operator namespace."""
 
+    # released namespaces waiting to be reused as frames
+    free_list = []
+    free_list_limit = 256
+
     def __init__(self, parent):
         """Initialize a new namespace."""
         # parent namespace
         self.parent = parent
+        # captured namespaces are referenced by functions and never reused
+        self.captured = False
         self.search_spaces = {
             "id": {},  # identifier search space
             "op": {},  # operator search space
@@ -57,6 +63,35 @@ class Namespace:
         """Returns a new namespace with this namespace as its parent."""
         return Namespace(self)
 
+    def clear(self):
+        """Removes all items from the local search spaces."""
+        for space in self.search_spaces.values():
+            space.clear()
+
+    def capture(self):
+        """Keeps this namespace and all enclosing ones from being reused."""
+        namespace = self
+        while namespace is not None and not namespace.captured:
+            namespace.captured = True
+            namespace = namespace.parent
+
+    @classmethod
+    def acquire(cls, parent):
+        """Returns a released namespace with a new parent or creates one."""
+        if cls.free_list:
+            namespace = cls.free_list.pop()
+            namespace.parent = parent
+            return namespace
+        return cls(parent)
+
+    def release(self):
+        """Clears the namespace and hands it back for reuse."""
+        if self.captured or len(Namespace.free_list) >= Namespace.free_list_limit:
+            return
+        self.clear()
+        self.parent = None
+        Namespace.free_list.append(self)
+
     def __str__(self):
         return "<Namespace>"
 
@@ -133,9 +168,31 @@ class ArgumentCastException(Exception):
 class Signature(object):
     """A signature matching a function call."""
 
+    # maximum number of specialized bodies per signature
+    clone_limit = 8
+
     def __init__(self, expected, function):
         self.expected = expected
         self.function = function
+        # returns a body specialized for the argument types or None
+        self.specializer = None
+        self.clones = {}
+        # compiles a body once it has been called threshold times
+        self.compiler = None
+        self.threshold = 0
+        self.calls = {}
+        self.compiled = {}
+
+    def specialized(self, values):
+        """Returns the body specialized for the types of the matched arguments."""
+        types = tuple(value.datatype for value in values)
+        body = self.clones.get(types)
+        if body is None:
+            if len(self.clones) >= Signature.clone_limit:
+                return self.function
+            body = self.specializer(self.function, self.expected, types) or self.function
+            self.clones[types] = body
+        return body
 
     def match(self, args):
         """Checks if the arguments match the function signature.
@@ -161,7 +218,8 @@ class Signature(object):
                 if not arg_type.kind_of(expected_type):
                     raise ArgumentCastException(
                         expected_type, arg_type)
-                var = arg_type.cast(arg)
+                # the value keeps its own type, so there is nothing to cast
+                var = Value(arg_type, arg.data)
             # Not enough arguments given, looking for default values
             elif expected.data != None:
                 var = expected_type.cast(expected)
@@ -172,6 +230,19 @@ class Signature(object):
             matched_args.append(var)
         return matched_args, self.function
 
+    def tier(self, body):
+        """Counts a call of the body and returns its compiled version once it is hot."""
+        key = id(body)
+        compiled = self.compiled.get(key)
+        if compiled is not None:
+            return compiled
+        calls = self.calls.get(key, 0) + 1
+        self.calls[key] = calls
+        if calls < self.threshold:
+            return body
+        compiled = self.compiled[key] = self.compiler(body)
+        return compiled
+
     def __str__(self):
         return "<Signature (%s)>" % ",".join(self.expected.name)
 
@@ -194,21 +265,41 @@ class Function(object):
     def format(self):
         return self.__str__()
 
-    def eval(self, args, context):
-        """Searches for a matching signature and evaluates the function node."""
+    def select(self, args):
+        """Searches for a matching signature.
+
+        Returns the signature, the matched arguments and the body for their
+        types. The choice only depends on the types of the arguments.
+        """
         for sgn in self.signatures:
             try:
                 values, fnc = sgn.match(args)
-                original, context.namespace = context.namespace, Namespace(self.source_ns)
-                # place args in namespace
-                context.namespace.store_all(values)
-                result = fnc.eval(context)
-                context.namespace = original
-                return result
             except (ArgumentException, ArgumentCastException):
-                pass
+                continue
+            if sgn.specializer is not None:
+                fnc = sgn.specialized(values)
+            return sgn, values, fnc
         raise FunctionException(self)
 
+    def run(self, sgn, values, fnc, context):
+        """Evaluates the body of a signature with the matched arguments."""
+        if sgn.compiler is not None:
+            fnc = sgn.tier(fnc)
+        frame = Namespace.acquire(self.source_ns)
+        original, context.namespace = context.namespace, frame
+        try:
+            # place args in namespace
+            frame.store_all(values)
+            return fnc.eval(context)
+        finally:
+            context.namespace = original
+            frame.release()
+
+    def eval(self, args, context):
+        """Searches for a matching signature and evaluates the function node."""
+        sgn, values, fnc = self.select(args)
+        return self.run(sgn, values, fnc, context)
+
     def __str__(self):
         return "<Function *(%s)>" % self.name
 
@@ -232,9 +323,13 @@ class OperatorException(RuntimeException):
 class Operator(object):
     """A operator with a collection of signatures and functions."""
 
-    def __init__(self, base_function, symbol):
+    def __init__(self, base_function, symbol, short_circuit=None):
         self.functions = [base_function]
         self.symbol = symbol
+        # decides the result from the first operand alone or returns None
+        self.short_circuit = short_circuit
+        # (datatype, datatype) -> (function on the data, result datatype)
+        self.kernels = {}
 
     def add_function(self, fnc):
         self.functions.append(fnc)
@@ -255,22 +350,58 @@ class Operator(object):
 class Datatype(object):
     """A type representing a basic type."""
 
-    def __init__(self, name, cast=None, parent=None, format=None):
+    # bumped whenever an existing type is moved in the hierarchy
+    generation = 0
+
+    def __init__(self, name, cast=None, parent=None, format=None, iterate=None):
         self.name = name
         self.cast = cast
-        self.parent = parent
+        self._parent = parent
         self.format = format
+        # returns an iterator over the elements of the data as values
+        self.iterate = iterate
+        self.ancestors = frozenset()
+        self.ancestors_generation = -1
 
     def format(self, value):
         return self.format(value)
 
+    def __deepcopy__(self, memo):
+        # types are shared by all copies of a tree
+        return self
+
+    @property
+    def parent(self):
+        """The type this type is a kind of."""
+        return self._parent
+
+    @parent.setter
+    def parent(self, parent):
+        # new types compute their own ancestors, only moving a type changes
+        # the ancestors of the types below it, which are not tracked
+        self._parent = parent
+        Datatype.invalidate()
+
+    @classmethod
+    def invalidate(cls):
+        """Invalidates the precomputed ancestors of all types."""
+        cls.generation += 1
+
+    def freeze(self):
+        """Precomputes the set of types this type is a kind of."""
+        ancestors = set()
+        datatype = self
+        while datatype is not None:
+            ancestors.add(datatype)
+            datatype = datatype.parent
+        self.ancestors = frozenset(ancestors)
+        self.ancestors_generation = Datatype.generation
+
     def kind_of(self, itemtype):
         """Checks if the type is related to the specified type."""
-        if self is itemtype:
-            return True
-        if self.parent is not None:
-            return self.parent.kind_of(itemtype)
-        return False
+        if self.ancestors_generation != Datatype.generation:
+            self.freeze()
+        return itemtype in self.ancestors
 
     def __str__(self):
         return "<T %s>" % self.name
@@ -287,6 +418,16 @@ class CastException(RuntimeException):
         super().__init__("%s not parseable to %s" % (value, datatype))
 
 
+def iterate(value):
+    """Returns an iterator over the elements of an iterable value."""
+    datatype = value.datatype
+    while datatype is not None:
+        if datatype.iterate is not None:
+            return datatype.iterate(value.data)
+        datatype = datatype.parent
+    raise RuntimeException("%s is not iterable" % value.datatype)
+
+
 def empty_context():
     """empty_context generates an empty context with a clean namespace."""
     return Context(Namespace(None))
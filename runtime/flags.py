@@ -1 +1,16 @@
 debug = False
+
+# maximum number of nodes of a function body that is inlined at call sites
+inline_threshold = 16
+
+# number of calls of a function body before it is compiled
+call_threshold = 50
+
+# number of iterations of a loop before its body is compiled
+loop_threshold = 500
+
+# record hot loops into guarded Python functions, see runtime.trace
+trace_loops = True
+
+# directory storing the profiles of scripts, profiles are disabled if None
+profile_dir = None
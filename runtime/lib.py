@@ -1,9 +1,13 @@
 """The standard runtime library."""
+import operator
+from collections.abc import Iterator
+
 from runtime.env import (Datatype, Value, Function, Operator,
                          Signature, FunctionBinding, CastException, ANY, NULL,
-                         RuntimeException)
+                         RuntimeException, iterate)
+from runtime.persistent import PersistentVector, PersistentMap, PersistentSet, Rope, concat
 
-NUMBER = Datatype("*number", None, ANY)
+NUMBER = Datatype("number", None, ANY)
 
 
 def cast_integer(value):
@@ -37,15 +41,17 @@ def cast_string(value):
     if isinstance(value, Value):
         if value.datatype is INTEGER:
             return Value(STRING, "%d" % value.data)
-        if value.datatype in (FLOAT, STRING):
+        if value.datatype is FLOAT:
             return Value(STRING, str(value.data))
+        if value.datatype is STRING:
+            return Value(STRING, value.data)
         if value.datatype is BOOLEAN:
             return Value(STRING, "true" if value.data else "false")
         if value.datatype is NULL:
             return Value(STRING, "")
     raise CastException(value, STRING)
 
-STRING = Datatype("string", cast_string, ANY, lambda x: "\"" + x + "\"")
+STRING = Datatype("string", cast_string, ANY, lambda x: "\"%s\"" % x)
 
 def cast_boolean(value):
     """Casts a value to a BOOLEAN."""
@@ -76,37 +82,84 @@ FUNCTION = Datatype("func", cast_function, ANY, lambda x: "function")
 def cast_list(value):
     """Casts a value to a LIST."""
     if isinstance(value, Value):
-        if value.datatype in (LIST, STRING):
-            return Value(LIST, list(value.data))
+        if value.datatype is LIST:
+            if isinstance(value.data, PersistentVector):
+                return Value(LIST, value.data)
+            return Value(LIST, PersistentVector(value.data))
+        if value.datatype is STRING:
+            return Value(LIST, PersistentVector(value.data))
+        if value.datatype in (RANGE, ITERATOR):
+            return Value(LIST, PersistentVector(item.data for item in iterate(value)))
         if value.datatype is NULL:
-            return Value(LIST, [])
+            return Value(LIST, PersistentVector())
     raise CastException(value, LIST)
 
-LIST = Datatype("LIST", cast_list, ANY, lambda x: "list")
+LIST = Datatype("LIST", cast_list, ANY, lambda x: "list",
+                lambda data: (box(item) for item in data))
 
 
 def cast_map(value):
     """Casts a value to a MAP."""
     if isinstance(value, Value):
         if value.datatype is MAP:
-            return Value(MAP, dict(value.data))
+            if isinstance(value.data, PersistentMap):
+                return Value(MAP, value.data)
+            return Value(MAP, PersistentMap(value.data))
         if value.datatype is NULL:
-            return Value(MAP, dict())
+            return Value(MAP, PersistentMap())
     raise CastException(value, MAP)
 
-MAP = Datatype("map", cast_map, ANY, lambda x: "map")
+MAP = Datatype("map", cast_map, ANY, lambda x: "map",
+               lambda data: (box(key) for key in data))
 
 
 def cast_set(value):
     """Casts a value to a SET."""
     if isinstance(value, Value):
-        if value.datatype in (SET, LIST):
-            return Value(SET, set(value.data))
+        if value.datatype is SET:
+            if isinstance(value.data, PersistentSet):
+                return Value(SET, value.data)
+            return Value(SET, PersistentSet(value.data))
+        if value.datatype is LIST:
+            return Value(SET, PersistentSet(value.data))
         if value.datatype is NULL:
-            return Value(SET, set())
+            return Value(SET, PersistentSet())
     raise CastException(value, SET)
 
-SET = Datatype("set", cast_set, ANY, lambda x: "set")
+SET = Datatype("set", cast_set, ANY, lambda x: "set",
+               lambda data: (box(item) for item in data))
+
+
+def cast_range(value):
+    """Casts a value to a RANGE."""
+    if isinstance(value, Value):
+        if value.datatype is RANGE:
+            return Value(RANGE, value.data)
+        if value.datatype is NULL:
+            return Value(RANGE, range(0))
+    raise CastException(value, RANGE)
+
+def format_range(data):
+    """Formats the bounds of a range."""
+    return "range(%d, %d, %d)" % (data.start, data.stop, data.step)
+
+RANGE = Datatype("range", cast_range, ANY, format_range,
+                 lambda data: (Value(INTEGER, item) for item in data))
+
+
+def cast_iterator(value):
+    """Casts a value to an ITERATOR."""
+    if isinstance(value, Value):
+        if value.datatype is ITERATOR:
+            return Value(ITERATOR, value.data)
+        if value.datatype is NULL:
+            return Value(ITERATOR, iter(()))
+        return Value(ITERATOR, iterate(value))
+    raise CastException(value, ITERATOR)
+
+# iterators are consumed by iterating them, the items may be host data or values
+ITERATOR = Datatype("iterator", cast_iterator, ANY, lambda x: "iterator",
+                    lambda data: (box(item) for item in data))
 
 
 def cast_object(value):
@@ -118,6 +171,88 @@ def cast_object(value):
 OBJECT = Datatype("object", cast_object, ANY, lambda x: "object")
 
 
+class Record(tuple):
+    """The field data of a record value stored in slot order."""
+    __slots__ = ()
+
+    # the record type, set by the subclass of each record
+    datatype = None
+
+
+def record(name, fields):
+    """Creates a record type and its constructor function.
+
+    The fields are (name, datatype) pairs. Each field is assigned a fixed
+    slot, record values store their raw field data in a tuple.
+    """
+    names = tuple(field for field, _ in fields)
+    field_types = tuple(field_type for _, field_type in fields)
+
+    def cast_record(value):
+        """Casts a value to the record type."""
+        if isinstance(value, Value):
+            if value.datatype is datatype:
+                return Value(datatype, value.data)
+            if value.datatype is NULL:
+                defaults = (field_type.cast(Value(NULL)).data for field_type in field_types)
+                return Value(datatype, row(defaults))
+        raise CastException(value, datatype)
+
+    def format_record(data):
+        """Formats the fields of a record."""
+        items = (field_type.format(item) for field_type, item in zip(field_types, data))
+        return "%s(%s)" % (name, ", ".join(items))
+
+    datatype = Datatype(name, cast_record, OBJECT, format_record)
+    datatype.fields = names
+    datatype.field_types = field_types
+    datatype.slots = {field: slot for slot, field in enumerate(names)}
+    row = type(name, (Record,), {"__slots__": (), "datatype": datatype})
+
+    def construct(context):
+        """Creates a record from the field values."""
+        data = []
+        for field, field_type in fields:
+            value = context.find("id", field)
+            if value.datatype is not field_type:
+                value = field_type.cast(value)
+            data.append(value.data)
+        return Value(datatype, row(data))
+
+    signature = Signature([Value(ANY, None, field) for field in names],
+                          FunctionBinding(construct))
+    return datatype, Function([signature], name)
+
+
+def box(data):
+    """Wraps host data into a value of the matching datatype."""
+    if isinstance(data, Value):
+        return data
+    if data is None:
+        return Value(NULL)
+    if isinstance(data, bool):
+        return Value(BOOLEAN, data)
+    if isinstance(data, int):
+        return Value(INTEGER, data)
+    if isinstance(data, float):
+        return Value(FLOAT, data)
+    if isinstance(data, (str, Rope)):
+        return Value(STRING, data)
+    if isinstance(data, PersistentVector):
+        return Value(LIST, data)
+    if isinstance(data, PersistentMap):
+        return Value(MAP, data)
+    if isinstance(data, PersistentSet):
+        return Value(SET, data)
+    if isinstance(data, Record):
+        return Value(data.datatype, data)
+    if isinstance(data, range):
+        return Value(RANGE, data)
+    if isinstance(data, Iterator):
+        return Value(ITERATOR, data)
+    return Value(OBJECT, data)
+
+
 def _add_operation():
     """The add operation."""
     def add(context):
@@ -126,7 +261,14 @@ def _add_operation():
         var_b = var_a.datatype.cast(context.find("id", "b"))
         return Value(var_a.datatype, var_a.data + var_b.data)
 
+    def append(context):
+        """Append a value to a string."""
+        var_a = context.find("id", "a")
+        var_b = STRING.cast(context.find("id", "b"))
+        return Value(STRING, concat(var_a.data, var_b.data))
+
     add_node = FunctionBinding(add)
+    append_node = FunctionBinding(append)
 
     signatures = [
         Signature([
@@ -136,7 +278,7 @@ def _add_operation():
         Signature([
             Value(STRING, None, "a"),
             Value(ANY, None, "b"),
-        ], add_node),
+        ], append_node),
     ]
     return Function(signatures, "#add")
 
@@ -194,6 +336,8 @@ def _pow_operation():
             var_b = FLOAT.cast(var_b)
             var_a = FLOAT.cast(var_a)
 
+        if var_b.datatype is INTEGER:
+            return Value(INTEGER, _power_integers(var_a.data, var_b.data))
         return Value(var_b.datatype, var_a.data**var_b.data)
 
     pow_node = FunctionBinding(pow)
@@ -292,7 +436,15 @@ def _and_operation():
     return Function(signatures, "#and")
 
 AND_FUNCTION = _and_operation()
-AND_OPERATOR = Operator(AND_FUNCTION, "&&")
+
+
+def _and_short_circuit(value):
+    """Returns false without the second operand if the first is false."""
+    if value.datatype is BOOLEAN and not value.data:
+        return Value(BOOLEAN, False)
+    return None
+
+AND_OPERATOR = Operator(AND_FUNCTION, "&&", _and_short_circuit)
 
 def _or_operation():
     def or_o(context):
@@ -311,7 +463,15 @@ def _or_operation():
     return Function(signatures, "#or")
 
 OR_FUNCTION = _or_operation()
-OR_OPERATOR = Operator(OR_FUNCTION, "||")
+
+
+def _or_short_circuit(value):
+    """Returns true without the second operand if the first is true."""
+    if value.datatype is BOOLEAN and value.data:
+        return Value(BOOLEAN, True)
+    return None
+
+OR_OPERATOR = Operator(OR_FUNCTION, "||", _or_short_circuit)
 
 def _xor_operation():
     def xor(context):
@@ -488,9 +648,89 @@ def _uninv_operation():
 UNINV_FUNCTION = _uninv_operation()
 UNINV_OPERATOR = Operator(UNINV_FUNCTION, "!")
 
+def _divide(a, b):
+    """Divides two floats."""
+    if b == 0:
+        raise RuntimeException("Can not divide by 0")
+    return a / b
+
+def _divide_integers(a, b):
+    """Divides two integers, truncating the result."""
+    if b == 0:
+        raise RuntimeException("Can not divide by 0")
+    return int(a / b)
+
+def _modulo(a, b):
+    """Returns the modulo of two integers."""
+    if b == 0:
+        raise RuntimeException("Can not divide by 0")
+    return a % b
+
+def _power_integers(a, b):
+    """Raises an integer to an integer power, truncating negative powers."""
+    return int(a ** b)
+
+def _kernels(function, result, datatypes):
+    """Maps each pair of datatypes to the function and its result type."""
+    return {(type_a, type_b): (function, result) for type_a, type_b in datatypes}
+
+SAME_NUMBERS = [(INTEGER, INTEGER), (FLOAT, FLOAT)]
+ALL_NUMBERS = SAME_NUMBERS + [(INTEGER, FLOAT), (FLOAT, INTEGER)]
+
+# kernels compute the same result as the functions for these types without dispatch
+for _operator, _function in [(PLUS_OPERATOR, operator.add), (MINUS_OPERATOR, operator.sub),
+                             (MUL_OPERATOR, operator.mul)]:
+    _operator.kernels[(INTEGER, INTEGER)] = (_function, INTEGER)
+    _operator.kernels[(FLOAT, FLOAT)] = (_function, FLOAT)
+POW_OPERATOR.kernels[(INTEGER, INTEGER)] = (_power_integers, INTEGER)
+POW_OPERATOR.kernels[(FLOAT, FLOAT)] = (operator.pow, FLOAT)
+PLUS_OPERATOR.kernels[(STRING, STRING)] = (concat, STRING)
+DIV_OPERATOR.kernels[(INTEGER, INTEGER)] = (_divide_integers, INTEGER)
+DIV_OPERATOR.kernels[(FLOAT, FLOAT)] = (_divide, FLOAT)
+MOD_OPERATOR.kernels[(INTEGER, INTEGER)] = (_modulo, INTEGER)
+for _operator, _function in [(SM_OPERATOR, operator.lt), (LG_OPERATOR, operator.gt),
+                             (SME_OPERATOR, operator.le), (LGE_OPERATOR, operator.ge)]:
+    _operator.kernels.update(_kernels(_function, BOOLEAN, ALL_NUMBERS + [(STRING, STRING)]))
+for _operator, _function in [(EQU_OPERATOR, operator.eq), (NEQ_OPERATOR, operator.ne)]:
+    _operator.kernels.update(_kernels(_function, BOOLEAN, SAME_NUMBERS + [(STRING, STRING), (BOOLEAN, BOOLEAN)]))
+AND_OPERATOR.kernels[(BOOLEAN, BOOLEAN)] = (lambda a, b: a and b, BOOLEAN)
+OR_OPERATOR.kernels[(BOOLEAN, BOOLEAN)] = (lambda a, b: a or b, BOOLEAN)
+
+
+def _range_function():
+    def range_(context):
+        """Returns the integers from start up to stop by step."""
+        var_a = context.find("id", "a")
+        var_b = context.find("id", "b")
+        var_c = context.find("id", "c")
+        if var_c.data == 0:
+            raise RuntimeException("The step of a range must not be zero")
+        return Value(RANGE, range(var_a.data, var_b.data, var_c.data))
+
+    def range_to(context):
+        """Returns the integers from zero up to stop."""
+        var_a = context.find("id", "a")
+        return Value(RANGE, range(var_a.data))
+
+    range_node = FunctionBinding(range_)
+    signatures = [
+        Signature([
+            Value(INTEGER, None, "a"),
+        ], FunctionBinding(range_to)),
+        Signature([
+            Value(INTEGER, None, "a"),
+            Value(INTEGER, None, "b"),
+            Value(INTEGER, 1, "c"),
+        ], range_node),
+    ]
+    return Function(signatures, "range")
+
+RANGE_FUNCTION = _range_function()
+
 EXPORTS = [
     # Datatypes
     INTEGER, FLOAT, BOOLEAN, STRING, LIST, SET, MAP, OBJECT, FUNCTION, ANY, NULL,
+    RANGE, ITERATOR, NUMBER,
     # Operators
     PLUS_OPERATOR, MINUS_OPERATOR, MUL_OPERATOR, DIV_OPERATOR, EQU_OPERATOR,
     AND_OPERATOR, OR_OPERATOR, XOR_OPERATOR, NEQ_OPERATOR,
@@ -501,5 +741,5 @@ EXPORTS = [
     MUL_FUNCTION, DIV_FUNCTION, EQU_FUNCTION,
     AND_FUNCTION, OR_FUNCTION, XOR_FUNCTION, NEQ_FUNCTION,
     SM_FUNCTION, LG_FUNCTION, SME_FUNCTION, LGE_FUNCTION,
-    UNINV_FUNCTION, MOD_FUNCTION, POW_FUNCTION,
+    UNINV_FUNCTION, MOD_FUNCTION, POW_FUNCTION, RANGE_FUNCTION,
 ]
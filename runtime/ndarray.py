@@ -0,0 +1,126 @@
+"""The numeric array library backed by NumPy.
+
+Importing this module registers elementwise overloads for arrays on the
+arithmetic and comparison operators of the standard runtime library.
+"""
+import numpy
+
+from runtime.env import (Datatype, Value, Function, Signature, FunctionBinding,
+                         CastException, RuntimeException, NULL, ANY)
+from runtime.lib import (NUMBER, FLOAT, LIST, SET, PLUS_OPERATOR, MINUS_OPERATOR,
+                         MUL_OPERATOR, DIV_OPERATOR, POW_OPERATOR, SM_OPERATOR,
+                         LG_OPERATOR, SME_OPERATOR, LGE_OPERATOR)
+
+
+def cast_array(value):
+    """Casts a value to an ARRAY."""
+    if isinstance(value, Value):
+        if value.datatype is ARRAY:
+            return Value(ARRAY, value.data)
+        if value.datatype.kind_of(LIST) or value.datatype is SET:
+            # typed lists store their elements unboxed as well
+            try:
+                return Value(ARRAY, numpy.array(list(value.data), dtype=float))
+            except (ValueError, TypeError):
+                raise CastException(value, ARRAY)
+        if value.datatype is NULL:
+            return Value(ARRAY, numpy.zeros(0))
+    raise CastException(value, ARRAY)
+
+ARRAY = Datatype("array", cast_array, ANY, numpy.array2string)
+
+
+def _elementwise_operation(name, ufunc):
+    """Builds an elementwise function applying the ufunc."""
+    def elementwise(context):
+        """Applies the operation to each element."""
+        var_a = context.find("id", "a")
+        var_b = context.find("id", "b")
+        return Value(ARRAY, ufunc(var_a.data, var_b.data))
+
+    elementwise_node = FunctionBinding(elementwise)
+    signatures = [
+        Signature([
+            Value(ARRAY, None, "a"),
+            Value(ARRAY, None, "b"),
+        ], elementwise_node),
+        Signature([
+            Value(ARRAY, None, "a"),
+            Value(NUMBER, None, "b"),
+        ], elementwise_node),
+        Signature([
+            Value(NUMBER, None, "a"),
+            Value(ARRAY, None, "b"),
+        ], elementwise_node),
+    ]
+    return Function(signatures, "#array_" + name)
+
+ADD_FUNCTION = _elementwise_operation("add", numpy.add)
+SUB_FUNCTION = _elementwise_operation("sub", numpy.subtract)
+MUL_FUNCTION = _elementwise_operation("mul", numpy.multiply)
+DIV_FUNCTION = _elementwise_operation("div", numpy.true_divide)
+POW_FUNCTION = _elementwise_operation("pow", numpy.power)
+SM_FUNCTION = _elementwise_operation("sm", numpy.less)
+LG_FUNCTION = _elementwise_operation("lg", numpy.greater)
+SME_FUNCTION = _elementwise_operation("sme", numpy.less_equal)
+LGE_FUNCTION = _elementwise_operation("lge", numpy.greater_equal)
+
+
+def _unmi_operation():
+    def unmi(context):
+        """Negates each element."""
+        var_a = context.find("id", "a")
+        return Value(ARRAY, numpy.negative(var_a.data))
+
+    unmi_node = FunctionBinding(unmi)
+    signatures = [
+        Signature([
+            Value(ARRAY, None, "a"),
+        ], unmi_node),
+    ]
+    return Function(signatures, "#array_unmi")
+
+UNMI_FUNCTION = _unmi_operation()
+
+PLUS_OPERATOR.add_function(ADD_FUNCTION)
+MINUS_OPERATOR.add_function(SUB_FUNCTION)
+MINUS_OPERATOR.add_function(UNMI_FUNCTION)
+MUL_OPERATOR.add_function(MUL_FUNCTION)
+DIV_OPERATOR.add_function(DIV_FUNCTION)
+POW_OPERATOR.add_function(POW_FUNCTION)
+SM_OPERATOR.add_function(SM_FUNCTION)
+LG_OPERATOR.add_function(LG_FUNCTION)
+SME_OPERATOR.add_function(SME_FUNCTION)
+LGE_OPERATOR.add_function(LGE_FUNCTION)
+
+
+def _reduction(name, reduce):
+    """Builds a function reducing an array to a float."""
+    def reduction(context):
+        """Reduces all elements to a single value."""
+        var_a = context.find("id", "a")
+        if var_a.data.size == 0:
+            raise RuntimeException("Can not reduce an empty array")
+        return Value(FLOAT, float(reduce(var_a.data)))
+
+    reduction_node = FunctionBinding(reduction)
+    signatures = [
+        Signature([
+            Value(ARRAY, None, "a"),
+        ], reduction_node),
+    ]
+    return Function(signatures, name)
+
+SUM_FUNCTION = _reduction("sum", numpy.sum)
+MIN_FUNCTION = _reduction("min", numpy.min)
+MAX_FUNCTION = _reduction("max", numpy.max)
+MEAN_FUNCTION = _reduction("mean", numpy.mean)
+
+EXPORTS = [
+    # Datatypes
+    ARRAY,
+    # Functions
+    ADD_FUNCTION, SUB_FUNCTION, UNMI_FUNCTION, MUL_FUNCTION, DIV_FUNCTION,
+    POW_FUNCTION, SM_FUNCTION, LG_FUNCTION, SME_FUNCTION, LGE_FUNCTION,
+    SUM_FUNCTION, MIN_FUNCTION, MAX_FUNCTION, MEAN_FUNCTION,
+]
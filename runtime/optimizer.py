@@ -0,0 +1,682 @@
+"""Optimize an abstract syntax tree before evaluation."""
+import copy
+
+from runtime import ast, compiler, env, flags, lib, trace
+
+
+def declares(node):
+    """Checks if evaluating the node stores names in the current namespace."""
+    if type(node) in (ast.Declaration, ast.Definition, ast.Record):
+        return True
+    if type(node) in (ast.Sequence, ast.Loop) and node.substitute:
+        return False
+    if type(node) is ast.Iteration:
+        return False
+    return any(declares(child) for child in node.children)
+
+
+def elide_scopes(root):
+    """Marks blocks that declare nothing to run in the enclosing namespace."""
+    for node in root.children:
+        elide_scopes(node)
+    if type(root) is ast.Sequence and root.substitute:
+        root.substitute = any(declares(child) for child in root.children)
+    elif type(root) in (ast.Loop, ast.Iteration) and root.substitute:
+        root.substitute = declares(root.children[1])
+
+
+def size(node):
+    """Returns the number of nodes of the tree."""
+    return 1 + sum(size(child) for child in node.children)
+
+
+def collect(node, kind, found):
+    """Collects all nodes of a type."""
+    if type(node) is kind:
+        found.append(node)
+    for child in node.children:
+        collect(child, kind, found)
+    return found
+
+
+def reads_only(node, names):
+    """Checks if the expression is pure and only reads the names."""
+    if type(node) is ast.Literal:
+        return True
+    if type(node) is ast.Identifier:
+        return node.identity in names
+    if type(node) in (ast.Operation, ast.Cast, ast.Member):
+        return all(reads_only(child, names) for child in node.children)
+    return False
+
+
+def inline_expression(definition):
+    """Returns the expression of a function that only returns an expression of its parameters."""
+    body = definition.children[0]
+    if type(body) is not ast.Sequence or len(body.children) != 1:
+        return None
+    statement = body.children[0]
+    if type(statement) is not ast.Return or len(statement.children) != 1:
+        return None
+    expression = statement.children[0]
+    params = [arg.name for arg in definition.args]
+    # a bare parameter would hand out the value of the caller
+    if type(expression) is ast.Identifier or not reads_only(expression, params):
+        return None
+    if size(expression) > flags.inline_threshold:
+        return None
+    return expression
+
+
+def instantiate(node, params, values):
+    """Copies the expression with the parameters reading from the values."""
+    if type(node) is ast.Identifier:
+        return ast.Argument(values, params.index(node.identity))
+    clone = copy.copy(node)
+    clone.children = [instantiate(child, params, values) for child in node.children]
+    return clone
+
+
+def inline_calls(root):
+    """Inlines calls of small functions returning an expression of their parameters.
+
+    The call keeps looking up the function and only uses the inlined
+    expression if it still finds the defined function and the arguments
+    match its parameter types, otherwise it calls the function.
+    """
+    definitions = {}
+    for definition in collect(root, ast.Definition, []):
+        definitions.setdefault(definition.name, []).append(definition)
+    for call in collect(root, ast.Call, []):
+        candidates = definitions.get(call.identity, [])
+        if len(candidates) != 1:
+            continue
+        definition = candidates[0]
+        expression = inline_expression(definition)
+        if expression is None or len(call.children) != len(definition.args):
+            continue
+        params = [arg.name for arg in definition.args]
+        call.inline_body = definition.children[0]
+        call.inline_expression = instantiate(expression, params, call.inline_values)
+
+
+def constant_case(conditional):
+    """Returns the identifier and literal value of an `identifier == literal` test."""
+    if type(conditional) is not ast.Conditional:
+        return None
+    condition = conditional.children[0]
+    if type(condition) is not ast.Operation or condition.symbol != "==" or len(condition.children) != 2:
+        return None
+    subject, constant = condition.children
+    if type(subject) is ast.Literal:
+        subject, constant = constant, subject
+    if type(subject) is not ast.Identifier or type(constant) is not ast.Literal:
+        return None
+    return subject.identity, constant.value
+
+
+def jump_tables(root):
+    """Compiles else-if chains comparing an identifier to constants into jump tables.
+
+    The chain is followed as long as each test compares the same identifier
+    to a distinct literal of the same type. The remaining chain is kept as
+    fallback for values without a case.
+    """
+    for node in root.children:
+        jump_tables(node)
+    if type(root) is not ast.Branch:
+        return
+    subject, case_type, table = None, None, {}
+    node, fallback = root, None
+    while type(node) is ast.Branch and len(node.children) in (1, 2):
+        case = constant_case(node.children[0])
+        if case is None:
+            fallback = node
+            break
+        name, value = case
+        if subject is None:
+            subject, case_type = name, value.datatype
+        try:
+            if name != subject or value.datatype is not case_type or value.data in table:
+                fallback = node
+                break
+        except TypeError:
+            fallback = node
+            break
+        table[value.data] = node.children[0]
+        node = node.children[-1] if len(node.children) == 2 else None
+        fallback = node
+    if len(table) > 1:
+        root.subject, root.case_type, root.table, root.fallback = subject, case_type, table, fallback
+
+
+# nodes whose evaluation may change variables outside of the loop body,
+# drawing from an iterator runs the code of its generator
+IMPURE = (ast.Call, ast.Yield, ast.Definition, ast.Record, ast.Iteration)
+
+# expressions computing a value from their children without side effects
+PURE = (ast.Operation, ast.Cast, ast.Member)
+
+
+def contains(node, types):
+    """Checks if the node or one of its descendants is of one of the types."""
+    return type(node) in types or any(contains(child, types) for child in node.children)
+
+
+# statements storing a value in the name of the node
+ASSIGNMENTS = (ast.Assignment, ast.Declaration, ast.BinaryAssignment, ast.Increment)
+
+
+def assigned_names(node):
+    """Returns the names assigned or declared in the node."""
+    names = set()
+    if type(node) in ASSIGNMENTS:
+        names.add(node.name)
+    elif type(node) is ast.Iteration:
+        names.add(node.variable)
+    for child in node.children:
+        names |= assigned_names(child)
+    return names
+
+
+def is_invariant(node, assigned):
+    """Checks if the expression has the same value while no name in assigned changes."""
+    if type(node) is ast.Literal:
+        return True
+    if type(node) is ast.Identifier:
+        return node.identity not in assigned
+    if type(node) is ast.Invariant:
+        return True
+    if type(node) in PURE:
+        return all(is_invariant(child, assigned) for child in node.children)
+    return False
+
+
+def hoist(root, assigned, invariants):
+    """Wraps the maximal invariant expressions below the node."""
+    for index, node in enumerate(root.children):
+        if type(node) in PURE and is_invariant(node, assigned):
+            invariant = ast.Invariant()
+            invariant.add(node)
+            root.children[index] = invariant
+            invariants.append(invariant)
+        elif type(node) is not ast.Invariant:
+            hoist(node, assigned, invariants)
+
+
+def hoist_invariants(root):
+    """Evaluates loop-invariant expressions once per loop activation.
+
+    Loops calling functions or drawing from iterators may change any
+    variable and are left alone. Iterations over an iterator reset their
+    invariants for every element, since the generator runs in between.
+    Instead of moving the expressions in front of the loop, they are
+    memoized on first use, so they are neither evaluated nor raise when
+    the loop body does not reach them.
+    """
+    if type(root) is ast.Loop and not contains(root, IMPURE):
+        hoist(root, assigned_names(root), root.invariants)
+    elif type(root) is ast.Iteration and not contains(root.children[1], IMPURE):
+        # the iterated value is evaluated once anyway
+        hoist(root.children[1], assigned_names(root), root.invariants)
+    for node in root.children:
+        hoist_invariants(node)
+
+
+# statements forming their own blocks, they are numbered separately
+COMPOUND = (ast.Sequence, ast.Branch, ast.Loop, ast.Iteration, ast.Definition, ast.Record)
+
+
+class ValueNumbering(object):
+    """Numbers the pure expressions of a block by the value they compute."""
+
+    def __init__(self):
+        # bumped whenever a call may have changed any variable
+        self.epoch = 0
+        # bumped whenever a name is assigned or declared
+        self.versions = {}
+        # (parent, index, key) of every pure expression in evaluation order
+        self.occurrences = []
+
+    def kill(self, name):
+        """Invalidates the expressions reading the name."""
+        self.versions[name] = self.versions.get(name, 0) + 1
+
+    def kill_all(self):
+        """Invalidates all expressions."""
+        self.epoch += 1
+
+    def key(self, node):
+        """Returns a key that is equal for expressions computing the same value."""
+        if type(node) is ast.Literal:
+            value = node.value
+            return ("literal", id(value.datatype), type(value.data), value.data)
+        if type(node) is ast.Identifier:
+            return ("identifier", node.identity, self.versions.get(node.identity, 0))
+        if type(node) is ast.Invariant:
+            return self.key(node.children[0])
+        if type(node) is ast.Operation:
+            head = ("operation", node.symbol)
+        elif type(node) is ast.Cast:
+            head = ("cast", node.target)
+        elif type(node) is ast.Member:
+            head = ("member", node.field)
+        else:
+            return None
+        keys = tuple(self.key(child) for child in node.children)
+        if any(key is None for key in keys):
+            return None
+        return head + keys
+
+    def visit(self, parent, index):
+        """Numbers the expressions of a statement in evaluation order."""
+        node = parent.children[index]
+        if type(node) is ast.Invariant:
+            return
+        if type(node) in PURE:
+            key = self.key(node)
+            if key is not None:
+                self.occurrences.append((parent, index, (self.epoch, key)))
+        for child_index in range(len(node.children)):
+            self.visit(node, child_index)
+        if type(node) is ast.Call:
+            self.kill_all()
+        elif type(node) in ASSIGNMENTS:
+            self.kill(node.name)
+
+    def number(self, block):
+        """Numbers the statements of a block, compound statements only kill."""
+        for index, statement in enumerate(block.children):
+            if type(statement) is ast.Sequence:
+                # nested blocks run straight through as part of this one
+                self.number(statement)
+            elif type(statement) in COMPOUND:
+                for name in assigned_names(statement):
+                    self.kill(name)
+                if contains(statement, (ast.Call, ast.Iteration)):
+                    # iterations may draw from a generator changing any variable
+                    self.kill_all()
+            else:
+                self.visit(block, index)
+
+
+def eliminate_common_subexpressions(root, nested=False):
+    """Shares the value of pure expressions computed more than once in a block.
+
+    Every occurrence is wrapped in a Shared node, the first one evaluated
+    stores its value in the cell of the block activation. Assignments and
+    declarations invalidate the expressions reading their name, calls and
+    iterations invalidate all of them. Blocks containing yield outside of
+    nested definitions are skipped, since a suspended activation would
+    share its cells with other activations.
+    Blocks nested directly in a numbered block are numbered with it.
+    """
+    numbered = (type(root) is ast.Sequence and not nested and
+                not ast.contains_yield(root))
+    for node in root.children:
+        inline = (numbered or nested) and type(node) is ast.Sequence
+        eliminate_common_subexpressions(node, inline)
+    if numbered:
+        share(root)
+
+
+def share(root):
+    """Wraps the expressions computed more than once in the block in Shared nodes."""
+    numbering = ValueNumbering()
+    numbering.number(root)
+    counts = {}
+    for _, _, key in numbering.occurrences:
+        counts[key] = counts.get(key, 0) + 1
+    cells = {}
+    for parent, index, key in numbering.occurrences:
+        if counts[key] < 2:
+            continue
+        if key not in cells:
+            cells[key] = [None]
+            root.cells.append(cells[key])
+        shared = ast.Shared(cells[key])
+        shared.add(parent.children[index])
+        parent.children[index] = shared
+
+
+class StaticTypeException(env.RuntimeException):
+    """Raised when an expression is proven to fail with the types of its operands."""
+
+    def __init__(self, message):
+        super().__init__(message)
+
+
+# types no other type derives from, a value of such a type has exactly this type
+EXACT_TYPES = (lib.INTEGER, lib.FLOAT, lib.STRING, lib.BOOLEAN)
+
+# operators of the library by symbol
+OPERATORS = {element.symbol: element for element in lib.EXPORTS if isinstance(element, env.Operator)}
+
+
+def applicable(operator, types):
+    """Checks if a function of the operator accepts arguments of the types."""
+    for function in operator.functions:
+        for signature in function.signatures:
+            if len(signature.expected) == len(types) and all(
+                    datatype.kind_of(expected.datatype)
+                    for datatype, expected in zip(types, signature.expected)):
+                return True
+    return False
+
+
+class TypeInference(object):
+    """Infers the datatypes of expressions from literals and declarations.
+
+    Every scope maps the names declared in it to their type or None if the
+    type is unknown. Names that are not declared in the tree have unknown
+    types, so do the free names of functions since they are resolved when
+    the function is called.
+    """
+
+    def __init__(self, types):
+        # the exact types by the name they are declared with
+        self.types = types
+        self.scopes = [{}]
+
+    def lookup(self, name):
+        """Returns the type of a name or None."""
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return None
+
+    def datatype(self, name):
+        """Returns the exact type declared by a name or None."""
+        if isinstance(name, env.Datatype):
+            return name if name in EXACT_TYPES else None
+        return self.types.get(name)
+
+    def isolated(self, node):
+        """Infers the types of a child whose declarations may not happen."""
+        self.scopes.append({})
+        self.visit(node)
+        for name in self.scopes.pop():
+            self.scopes[-1][name] = None
+
+    def visit(self, node):
+        """Infers the type of a node and selects the kernels of its operations."""
+        kind = type(node)
+        if kind is ast.Literal:
+            return node.value.datatype
+        if kind is ast.Identifier:
+            return self.lookup(node.identity)
+        if kind is ast.Sequence:
+            if node.substitute:
+                self.scopes.append({})
+            for child in node.children:
+                self.visit(child)
+            if node.substitute:
+                self.scopes.pop()
+            return None
+        if kind in (ast.Branch, ast.Conditional, ast.Loop):
+            for child in node.children:
+                self.isolated(child)
+            return None
+        if kind is ast.Iteration:
+            self.visit(node.children[0])
+            self.scopes.append({node.variable: None})
+            self.isolated(node.children[1])
+            self.scopes.pop()
+            return None
+        if kind is ast.Definition:
+            scopes = self.scopes
+            self.scopes = [{arg.name: self.datatype(arg.datatype) for arg in node.args}]
+            self.visit(node.children[0])
+            self.scopes = scopes
+            self.scopes[-1][node.name] = None
+            return None
+        if kind is ast.Record:
+            self.scopes[-1][node.name] = None
+            return None
+        if kind is ast.Declaration:
+            self.scopes[-1][node.name] = self.datatype(node.datatype)
+            return self.scopes[-1][node.name]
+        if kind is ast.Assignment:
+            return self.assign(node, self.visit(node.children[0]))
+        if kind is ast.Operation:
+            return self.operation(node, [self.visit(child) for child in node.children])
+        if kind in (ast.Invariant, ast.Shared):
+            return self.visit(node.children[0])
+        if kind is ast.Cast:
+            self.visit(node.children[0])
+            return self.datatype(node.target)
+        for child in node.children:
+            self.visit(child)
+        return None
+
+    def assign(self, node, datatype):
+        """Infers the type of a variable after an assignment."""
+        if node.ignore_type:
+            for scope in reversed(self.scopes):
+                if node.name in scope:
+                    scope[node.name] = datatype
+                    break
+            return datatype
+        variable = self.lookup(node.name)
+        if variable is not None and datatype is not None and variable is not datatype:
+            raise StaticTypeException("%s can not be assigned to %s" % (datatype, variable))
+        return datatype
+
+    def operation(self, node, types):
+        """Selects the kernel of an operation on operands of known types."""
+        operator = OPERATORS.get(node.symbol)
+        if operator is None or len(types) != 2 or None in types:
+            return None
+        kernel = operator.kernels.get(tuple(types))
+        if kernel is not None:
+            # short-circuit operators have to evaluate their operands one by one
+            if operator.short_circuit is None:
+                node.kernel = kernel
+            return kernel[1]
+        if not applicable(operator, types):
+            raise StaticTypeException("Operator %s is not applicable to %s and %s" % (
+                node.symbol, types[0], types[1]))
+        return None
+
+
+def exact_types(root):
+    """Returns the exact types by name that are not shadowed by a record of the tree."""
+    types = {datatype.name: datatype for datatype in EXACT_TYPES}
+    for record in collect(root, ast.Record, []):
+        types.pop(record.name, None)
+    return types
+
+
+def infer_types(root):
+    """Selects the kernels of operations whose operand types are proven.
+
+    Operations with a kernel skip looking up the operator and matching its
+    signatures. Operations and assignments proven to fail raise a
+    StaticTypeException before the tree is evaluated.
+    """
+    TypeInference(exact_types(root)).visit(root)
+
+
+def specialize(body, expected, types):
+    """Returns a copy of a function body with the kernels for the argument types.
+
+    Returns None if no parameter of an inexact type gets an argument of an
+    exact type or if the copy would raise a StaticTypeException, the
+    generic body is used instead.
+    """
+    if not any(value.datatype not in EXACT_TYPES and datatype in EXACT_TYPES
+               for value, datatype in zip(expected, types)):
+        return None
+    calls = collect(body, ast.Call, [])
+    # inlined bodies are compared by identity with the called function
+    memo = {id(call.inline_body): call.inline_body for call in calls if call.inline_body is not None}
+    # the calls of the copy select their own bodies
+    memo.update((id(call.cache), None) for call in calls if call.cache is not None)
+    clone = copy.deepcopy(body, memo)
+    # compiled loops of the body run the nodes of the original, the copies
+    # keep the iterations counted so far and are compiled when they are hot
+    for loop in collect(clone, ast.Loop, []) + collect(clone, ast.Iteration, []):
+        loop.compiled, loop.trace = None, None
+    inference = TypeInference(exact_types(clone))
+    inference.scopes = [{value.name: datatype if datatype in EXACT_TYPES else None
+                         for value, datatype in zip(expected, types)}]
+    try:
+        inference.visit(clone)
+    except StaticTypeException:
+        return None
+    return clone
+
+
+def specialize_functions(root):
+    """Lets functions with parameters of inexact types specialize their body per call.
+
+    Every combination of argument types gets its own copy of the body, in
+    which the operations on the parameters have their kernels selected.
+    Trees with records shadowing a type are left alone, since the types of
+    the names in the body are resolved without the enclosing scopes.
+    """
+    types = exact_types(root)
+    if len(types) != len(EXACT_TYPES):
+        return
+    for definition in collect(root, ast.Definition, []):
+        if any(arg.datatype not in types for arg in definition.args):
+            definition.specializer = specialize
+
+
+# operators updating a variable by `x = x op y`
+UPDATES = ("+", "-", "*", "/", "%", "^")
+
+# operators comparing a variable with a constant by `x op literal`
+COMPARISONS = ("<", ">", "<=", ">=", "==", "!=")
+
+
+def fuse(node):
+    """Returns a single node for a common statement shape or None."""
+    if type(node) is ast.Assignment and not node.ignore_type:
+        operation = node.children[0]
+        if (type(operation) is not ast.Operation or operation.symbol not in UPDATES
+                or len(operation.children) != 2):
+            return None
+        target, operand = operation.children
+        if type(target) is not ast.Identifier or target.identity != node.name:
+            return None
+        if type(operand) is ast.Literal and operation.symbol in ("+", "-"):
+            return ast.Increment(node.name, operation.symbol, operand.value)
+        fused = ast.BinaryAssignment(node.name, operation.symbol)
+        fused.add(operand)
+        return fused
+    if type(node) is ast.Operation and node.symbol in COMPARISONS and len(node.children) == 2:
+        subject, constant = node.children
+        if type(subject) is ast.Identifier and type(constant) is ast.Literal:
+            return ast.Compare(subject.identity, node.symbol, constant.value)
+    return None
+
+
+def fuse_nodes(root):
+    """Replaces common statement shapes by nodes resolving the variable once.
+
+    `x = x + 1` and `x += 1` become an increment, `x = x op y` a binary
+    assignment and `x < 10` a comparison with a constant. They update the
+    variable in place when a kernel of the operator keeps its type.
+    """
+    for index, node in enumerate(root.children):
+        fuse_nodes(node)
+        fused = fuse(node)
+        if fused is not None:
+            root.children[index] = fused
+
+
+# directions of the induction variable for the comparisons bounding it
+DIRECTIONS = {"<": "+", "<=": "+", ">": "-", ">=": "-"}
+
+
+def counter(loop):
+    """Returns the induction variable, increment and bound of a counted loop or None."""
+    condition, body = loop.children
+    if type(body) is not ast.Sequence or not body.children:
+        return None
+    increment = body.children[-1]
+    while type(increment) is ast.Sequence and len(increment.children) == 1 and not increment.substitute:
+        increment = increment.children[0]
+    if (type(increment) is not ast.Increment or increment.value.datatype is not lib.INTEGER
+            or increment.value.data <= 0):
+        return None
+    if type(condition) is ast.Compare:
+        name, symbol, bound = condition.name, condition.symbol, ast.Literal(condition.value)
+    elif (type(condition) is ast.Operation and len(condition.children) == 2
+          and type(condition.children[0]) is ast.Identifier):
+        name, symbol, bound = condition.children[0].identity, condition.symbol, condition.children[1]
+    else:
+        return None
+    if name != increment.name or DIRECTIONS.get(symbol) != increment.symbol:
+        return None
+    for statement in body.children[:-1]:
+        if name in assigned_names(statement):
+            return None
+    if not is_invariant(bound, assigned_names(loop)):
+        return None
+    return name, increment, bound, symbol
+
+
+def count_loops(root):
+    """Runs counted loops by iterating a Python range.
+
+    A loop is counted if its condition compares a variable with an
+    invariant bound and its body ends by stepping the variable towards the
+    bound by an integer constant. The body may neither assign the variable
+    nor call functions, which could assign it, nor continue, which skips
+    the increment. The increment is taken out of the body, so a loop whose
+    variable or bound is no integer at run time evaluates it after the body.
+    """
+    for node in root.children:
+        count_loops(node)
+    if type(root) is not ast.Loop or contains(root, IMPURE + (ast.Continue,)):
+        return
+    counted = counter(root)
+    if counted is None:
+        return
+    name, increment, root.bound, symbol = counted
+    root.children[1].children.pop()
+    root.increment, root.counter = increment, name
+    root.step = increment.value.data if increment.symbol == "+" else -increment.value.data
+    root.inclusive = symbol in ("<=", ">=")
+
+
+def tier_nodes(root):
+    """Lets function bodies and loops compile themselves into closures once they are hot.
+
+    Functions count their calls, loops their iterations, the thresholds
+    are set by the flags. Hot loops are traced as well, see runtime.trace.
+    Cold code keeps being evaluated node by node.
+    """
+    for node in root.children:
+        tier_nodes(node)
+    if type(root) is ast.Definition:
+        root.compiler = compiler.compile_body
+    elif type(root) is ast.Loop:
+        root.compiler, root.tracer = compiler.compile_loop, trace.record
+    elif type(root) is ast.Iteration:
+        root.compiler = compiler.compile_iteration
+
+
+PASSES = [
+    inline_calls,
+    elide_scopes,
+    jump_tables,
+    hoist_invariants,
+    eliminate_common_subexpressions,
+    infer_types,
+    fuse_nodes,
+    count_loops,
+    specialize_functions,
+    tier_nodes,
+]
+
+
+def run(tree):
+    """Run all optimization passes on the tree."""
+    for optimization in PASSES:
+        if flags.debug:
+            print("Running optimization", optimization.__name__)
+        optimization(tree)
+    return tree
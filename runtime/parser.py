@@ -1,6 +1,6 @@
 """Parse an tokenized expression into an AST."""
 import codecs
-from runtime import ast, lexer, env, lib, flags
+from runtime import ast, lexer, env, lib, flags, optimizer
 
 class ParseException(Exception):
     def __init__(self, msg):
@@ -112,6 +112,8 @@ def get_precedence(operator, last_token):
         return 7
     elif operator in ["!"]:
         return 7
+    elif operator in ["."]:
+        return 8
     elif operator in ["^"]:
         return 6
     elif operator in ["*", "/"]:
@@ -166,7 +168,7 @@ def generate_expression(stream):
             if '.' in token.value:
                 value = env.Value(lib.FLOAT, data=float(token.value))
             else:
-                value = env.Value(lib.INTEGER, data=float(token.value))
+                value = env.Value(lib.INTEGER, data=int(token.value))
             operand_stack.append(ast.Literal(value))
         elif token.kind == lexer.STRING:
             stripped = token.value.strip("\"")
@@ -410,6 +412,47 @@ def generate_function(stream):
 
     return defi_node, 3 + head_end_index + body_len
 
+def generate_record(stream):
+    if flags.debug:
+        print("Starting generating record definition")
+
+    head_name = stream[0]
+    if head_name.kind is not lexer.IDENTIFIER:
+        raise InvalidDefinition(head_name)
+    record_name = head_name.value
+
+    if len(stream) < 2 or stream[1].kind is not lexer.LPRT:
+        raise InvalidDefinition(stream[1] if len(stream) > 1 else "end of record")
+    head_end_index = find_matching_prt(stream, 2)
+    if head_end_index == -1:
+        raise InvalidDefinition("end of record")
+
+    fields = []
+    field_index = 2
+    while field_index < head_end_index:
+        if stream[field_index].kind is not lexer.IDENTIFIER:
+            raise InvalidDefinition(stream[field_index])
+        field_name = stream[field_index].value
+        if field_index + 2 >= head_end_index:
+            raise InvalidDefinition(stream[field_index])
+        if (stream[field_index+1].kind is not lexer.OPERATOR) or stream[field_index+1].value != ":":
+            raise InvalidDefinition(stream[field_index+1])
+        if stream[field_index+2].kind is not lexer.IDENTIFIER:
+            raise InvalidDefinition(stream[field_index+2])
+        if field_name in (name for name, _ in fields):
+            raise InvalidDefinition("duplicate field %s" % field_name)
+        fields.append((field_name, stream[field_index+2].value))
+        if field_index + 3 < head_end_index and stream[field_index+3].kind is not lexer.SEPARATOR:
+            raise InvalidDefinition(stream[field_index+3])
+        field_index += 4
+
+    if flags.debug:
+        print("Adding fields:", ', '.join("%s: %s" % field for field in fields))
+
+    # record Name ( ... )
+    #        0    1     head_end_index
+    return ast.Record(record_name, fields), 1 + head_end_index
+
 def generate_if(stream):
     if flags.debug:
         print("Starting generating if statement")
@@ -505,6 +548,10 @@ def generate_for(stream):
     if head_end_index == -1:
         raise InvalidCondition()
 
+    if (head_end_index > 4 and stream[2].kind is lexer.IDENTIFIER and
+            stream[3].kind is lexer.IDENTIFIER and stream[3].value == "in"):
+        return generate_iteration(stream, head_end_index)
+
     # find first ;
     init_end_index = cond_start
     for j in range(len(stream)):
@@ -540,6 +587,30 @@ def generate_for(stream):
     return sequ, 4 + init_len + cond_len + iter_len + body_len
 
 
+def generate_iteration(stream, head_end_index):
+    if flags.debug:
+        print("Starting generating for-in statement")
+
+    # for ( name in expr ) { body }
+    # 0   1 2    3  4    head_end_index
+    iterable, _ = generate_expression(stream[4:head_end_index])
+
+    body_start_index = head_end_index + 1
+    if body_start_index >= len(stream) or stream[body_start_index].kind is not lexer.LBLOCK:
+        raise InvalidBlock()
+    if find_matching_block(stream, body_start_index + 1) == -1:
+        raise InvalidBlock()
+
+    body, body_len = generate_sequence(stream[body_start_index+1:])
+
+    # the iteration provides the body scope itself
+    iteration = ast.Iteration(stream[2].value)
+    iteration.add(iterable)
+    iteration.add(body)
+
+    return iteration, body_start_index + 1 + body_len
+
+
 def generate_while(stream):
     if flags.debug:
         print("Starting generating while statement")
@@ -567,8 +638,8 @@ def generate_while(stream):
 
     condition, cond_len = generate_expression(stream[2:cond_end_index])
     body, offset = generate_sequence(stream[body_start_index+1:])
-    body.substitute = True
 
+    # the loop provides the body scope itself
     loop = ast.Loop()
     loop.add(condition)
     loop.add(body)
@@ -600,12 +671,22 @@ def generate_sequence(stream):
                 func, offset = generate_function(stream[i+1:])
                 sequence.add(func)
                 i += offset
+            elif token.value == "record":
+                record, offset = generate_record(stream[i+1:])
+                sequence.add(record)
+                i += offset
             elif token.value == "return":
                 expr, offset = generate_expression(stream[i+1:])
                 return_node = ast.Return()
                 return_node.add(expr)
                 sequence.add(return_node)
                 i += offset
+            elif token.value == "yield":
+                expr, offset = generate_expression(stream[i+1:])
+                yield_node = ast.Yield()
+                yield_node.add(expr)
+                sequence.add(yield_node)
+                i += offset
             elif token.value == "continue":
                 sequence.add(ast.Continue())
             elif token.value == "break":
@@ -667,6 +748,17 @@ def optimize_ast(root):
             node = ast.Cast(datatype)
             node.children = values
             root.children[i] = node
+        elif type(node) is ast.Operation and node.symbol == ".":
+            values = node.children
+            field = values.pop()
+            if type(field) is not ast.Identifier:
+                raise InvalidExpression("Expected a field name after .")
+            if flags.debug:
+                print("Replacing member access of %s" % field.identity)
+            node = ast.Member(field.identity)
+            node.children = values
+            root.children[i] = node
+            optimize_ast(node)
         else:
             optimize_ast(node)
 
@@ -680,6 +772,7 @@ def generate(tokens):
     if flags.debug:
         print("Optimizing AST ...")
     optimize_ast(sequ)
+    optimizer.run(sequ)
     if flags.debug:
         print("Final AST:", str(sequ))
     return sequ
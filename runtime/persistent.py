@@ -0,0 +1,573 @@
+"""Persistent collections with structural sharing.
+
+Updates never modify a collection, they return a new one sharing most of
+its structure with the original. This makes it safe to pass collections
+between namespaces and functions without copying them.
+"""
+from array import array
+from collections.abc import Mapping, Sequence, Set
+from itertools import islice
+
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+HASH_MASK = 0xFFFFFFFF
+
+
+class PersistentVector(Sequence):
+    """A vector stored in a 32-way trie with a separate tail chunk."""
+
+    __slots__ = ("_count", "_shift", "_root", "_tail")
+
+    def __init__(self, items=()):
+        items = list(items)
+        count = len(items)
+        tailoff = _tailoff(count)
+        nodes = [items[i:i + WIDTH] for i in range(0, tailoff, WIDTH)]
+        shift = BITS
+        while len(nodes) > WIDTH:
+            nodes = [nodes[i:i + WIDTH] for i in range(0, len(nodes), WIDTH)]
+            shift += BITS
+        self._count = count
+        self._shift = shift
+        self._root = nodes
+        self._tail = items[tailoff:]
+
+    @classmethod
+    def _make(cls, count, shift, root, tail):
+        vector = cls.__new__(cls)
+        vector._count = count
+        vector._shift = shift
+        vector._root = root
+        vector._tail = tail
+        return vector
+
+    def _leaf_for(self, index):
+        """Returns the chunk containing the index."""
+        if index >= _tailoff(self._count):
+            return self._tail
+        node = self._root
+        level = self._shift
+        while level > 0:
+            node = node[(index >> level) & MASK]
+            level -= BITS
+        return node
+
+    def _push_tail(self, level, parent, tail):
+        """Returns a copy of the parent node with the tail inserted."""
+        index = ((self._count - 1) >> level) & MASK
+        node = list(parent)
+        if level == BITS:
+            inserted = tail
+        elif index < len(parent):
+            inserted = self._push_tail(level - BITS, parent[index], tail)
+        else:
+            inserted = _new_path(level - BITS, tail)
+        if index < len(node):
+            node[index] = inserted
+        else:
+            node.append(inserted)
+        return node
+
+    def append(self, item):
+        """Returns a new vector with the item appended."""
+        count = self._count
+        if count - _tailoff(count) < WIDTH:
+            return self._make(count + 1, self._shift, self._root, self._tail + [item])
+        shift = self._shift
+        if (count >> BITS) > (1 << shift):
+            root = [self._root, _new_path(shift, self._tail)]
+            shift += BITS
+        else:
+            root = self._push_tail(shift, self._root, self._tail)
+        return self._make(count + 1, shift, root, [item])
+
+    def extend(self, items):
+        """Returns a new vector with all items appended."""
+        vector = self
+        for item in items:
+            vector = vector.append(item)
+        return vector
+
+    def set(self, index, item):
+        """Returns a new vector with the item at the index replaced."""
+        index = self._index(index)
+        if index >= _tailoff(self._count):
+            tail = list(self._tail)
+            tail[index & MASK] = item
+            return self._make(self._count, self._shift, self._root, tail)
+        return self._make(self._count, self._shift,
+                          _assoc_path(self._shift, self._root, index, item), self._tail)
+
+    def _index(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("vector index out of range")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PersistentVector(self[i] for i in range(*index.indices(self._count)))
+        index = self._index(index)
+        return self._leaf_for(index)[index & MASK]
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for start in range(0, _tailoff(self._count), WIDTH):
+            for item in self._leaf_for(start):
+                yield item
+        for item in self._tail:
+            yield item
+
+    def __eq__(self, other):
+        if not isinstance(other, (PersistentVector, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return "PersistentVector(%r)" % list(self)
+
+
+class PersistentArray(Sequence):
+    """An array of unboxed items sharing its buffer with the arrays it was appended to.
+
+    An array only reads the first count items of its buffer. Appending to
+    the array holding the whole buffer extends the buffer in place, so the
+    older arrays still see their items and appending runs in amortized
+    constant time. Appending to an older array copies its items first.
+    """
+
+    __slots__ = ("_count", "_buffer")
+
+    def __init__(self, typecode, items=()):
+        self._buffer = array(typecode, items)
+        self._count = len(self._buffer)
+
+    @classmethod
+    def _make(cls, count, buffer):
+        result = cls.__new__(cls)
+        result._count = count
+        result._buffer = buffer
+        return result
+
+    @property
+    def typecode(self):
+        """The typecode of the items."""
+        return self._buffer.typecode
+
+    def _owned(self):
+        """Returns a buffer holding exactly the items, which may be extended in place."""
+        if len(self._buffer) == self._count:
+            return self._buffer
+        return self._buffer[:self._count]
+
+    def append(self, item):
+        """Returns a new array with the item appended."""
+        buffer = self._owned()
+        buffer.append(item)
+        return self._make(self._count + 1, buffer)
+
+    def extend(self, items):
+        """Returns a new array with all items appended."""
+        buffer = self._owned()
+        buffer.extend(items)
+        return self._make(len(buffer), buffer)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            buffer = self._buffer[:self._count][index]
+            return self._make(len(buffer), buffer)
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("array index out of range")
+        return self._buffer[index]
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        # newer arrays may extend the buffer while it is iterated
+        return islice(self._buffer, self._count)
+
+    def __contains__(self, item):
+        return item in self._owned()
+
+    def __eq__(self, other):
+        if not isinstance(other, (PersistentArray, array, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return "PersistentArray(%r, %r)" % (self.typecode, list(self))
+
+
+def _tailoff(count):
+    if count < WIDTH:
+        return 0
+    return ((count - 1) >> BITS) << BITS
+
+
+def _new_path(level, node):
+    while level > 0:
+        node = [node]
+        level -= BITS
+    return node
+
+
+def _assoc_path(level, node, index, item):
+    node = list(node)
+    if level == 0:
+        node[index & MASK] = item
+    else:
+        sub = (index >> level) & MASK
+        node[sub] = _assoc_path(level - BITS, node[sub], index, item)
+    return node
+
+
+def _popcount(bits):
+    return bin(bits).count("1")
+
+
+class _BitmapNode(object):
+    """A hash array mapped trie node. Entries are leaves or sub nodes."""
+
+    __slots__ = ("bitmap", "entries")
+
+    def __init__(self, bitmap, entries):
+        self.bitmap = bitmap
+        self.entries = entries
+
+
+class _CollisionNode(object):
+    """A node holding all leaves with the same hash."""
+
+    __slots__ = ("hash", "entries")
+
+    def __init__(self, key_hash, entries):
+        self.hash = key_hash
+        self.entries = entries
+
+
+# leaves are (hash, key, value) tuples
+EMPTY_NODE = _BitmapNode(0, [])
+
+
+def _hash_of(entry):
+    if isinstance(entry, tuple):
+        return entry[0]
+    return entry.hash
+
+
+def _merge(shift, first, second):
+    """Creates a node containing two entries with different keys."""
+    first_hash, second_hash = _hash_of(first), _hash_of(second)
+    if first_hash == second_hash:
+        if isinstance(first, tuple):
+            return _CollisionNode(first_hash, [first, second])
+        return _CollisionNode(first_hash, first.entries + [second])
+    first_bit = (first_hash >> shift) & MASK
+    second_bit = (second_hash >> shift) & MASK
+    if first_bit == second_bit:
+        return _BitmapNode(1 << first_bit, [_merge(shift + BITS, first, second)])
+    if first_bit < second_bit:
+        entries = [first, second]
+    else:
+        entries = [second, first]
+    return _BitmapNode((1 << first_bit) | (1 << second_bit), entries)
+
+
+def _assoc(node, shift, leaf):
+    """Returns the node with the leaf inserted and whether a key was added."""
+    key_hash, key = leaf[0], leaf[1]
+    if isinstance(node, _CollisionNode):
+        if node.hash != key_hash:
+            return _merge(shift, node, leaf), True
+        for i, entry in enumerate(node.entries):
+            if entry[1] == key:
+                entries = list(node.entries)
+                entries[i] = leaf
+                return _CollisionNode(key_hash, entries), False
+        return _CollisionNode(key_hash, node.entries + [leaf]), True
+
+    bit = 1 << ((key_hash >> shift) & MASK)
+    index = _popcount(node.bitmap & (bit - 1))
+    if not node.bitmap & bit:
+        entries = node.entries[:index] + [leaf] + node.entries[index:]
+        return _BitmapNode(node.bitmap | bit, entries), True
+
+    entry = node.entries[index]
+    if isinstance(entry, tuple):
+        if entry[0] == key_hash and entry[1] == key:
+            replaced, added = leaf, False
+        else:
+            replaced, added = _merge(shift + BITS, entry, leaf), True
+    else:
+        replaced, added = _assoc(entry, shift + BITS, leaf)
+    entries = list(node.entries)
+    entries[index] = replaced
+    return _BitmapNode(node.bitmap, entries), added
+
+
+def _without(node, shift, key_hash, key):
+    """Returns the node without the key, None if it became empty."""
+    if isinstance(node, _CollisionNode):
+        entries = [entry for entry in node.entries if entry[1] != key]
+        if len(entries) == len(node.entries):
+            return node
+        if len(entries) == 1:
+            return entries[0]
+        return _CollisionNode(node.hash, entries)
+
+    bit = 1 << ((key_hash >> shift) & MASK)
+    if not node.bitmap & bit:
+        return node
+    index = _popcount(node.bitmap & (bit - 1))
+    entry = node.entries[index]
+    if isinstance(entry, tuple):
+        if entry[0] != key_hash or entry[1] != key:
+            return node
+        replaced = None
+    else:
+        replaced = _without(entry, shift + BITS, key_hash, key)
+        if replaced is entry:
+            return node
+
+    if replaced is None:
+        bitmap = node.bitmap & ~bit
+        if not bitmap:
+            return None
+        entries = node.entries[:index] + node.entries[index + 1:]
+        if shift > 0 and len(entries) == 1 and isinstance(entries[0], tuple):
+            return entries[0]
+        return _BitmapNode(bitmap, entries)
+    entries = list(node.entries)
+    entries[index] = replaced
+    return _BitmapNode(node.bitmap, entries)
+
+
+def _iterate(node):
+    for entry in node.entries:
+        if isinstance(entry, tuple):
+            yield entry
+        else:
+            for leaf in _iterate(entry):
+                yield leaf
+
+
+class PersistentMap(Mapping):
+    """A hash array mapped trie."""
+
+    __slots__ = ("_count", "_root")
+
+    def __init__(self, items=()):
+        self._count = 0
+        self._root = EMPTY_NODE
+        if isinstance(items, Mapping):
+            items = items.items()
+        for key, value in items:
+            self._root, added = _assoc(self._root, 0, (hash(key) & HASH_MASK, key, value))
+            if added:
+                self._count += 1
+
+    @classmethod
+    def _make(cls, count, root):
+        mapping = cls.__new__(cls)
+        mapping._count = count
+        mapping._root = root
+        return mapping
+
+    def set(self, key, value):
+        """Returns a new map with the key set to the value."""
+        root, added = _assoc(self._root, 0, (hash(key) & HASH_MASK, key, value))
+        return self._make(self._count + (1 if added else 0), root)
+
+    def remove(self, key):
+        """Returns a new map without the key."""
+        root = _without(self._root, 0, hash(key) & HASH_MASK, key)
+        if root is self._root:
+            return self
+        if root is None:
+            root = EMPTY_NODE
+        return self._make(self._count - 1, root)
+
+    def __getitem__(self, key):
+        key_hash = hash(key) & HASH_MASK
+        node = self._root
+        shift = 0
+        while True:
+            if isinstance(node, _CollisionNode):
+                for entry in node.entries:
+                    if entry[1] == key:
+                        return entry[2]
+                raise KeyError(key)
+            bit = 1 << ((key_hash >> shift) & MASK)
+            if not node.bitmap & bit:
+                raise KeyError(key)
+            node = node.entries[_popcount(node.bitmap & (bit - 1))]
+            if isinstance(node, tuple):
+                if node[0] == key_hash and node[1] == key:
+                    return node[2]
+                raise KeyError(key)
+            shift += BITS
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for leaf in _iterate(self._root):
+            yield leaf[1]
+
+    def __hash__(self):
+        return hash(frozenset(self.items()))
+
+    def __repr__(self):
+        return "PersistentMap(%r)" % dict(self.items())
+
+
+class PersistentSet(Set):
+    """A set backed by a persistent map."""
+
+    __slots__ = ("_map",)
+
+    def __init__(self, items=()):
+        self._map = PersistentMap((item, True) for item in items)
+
+    @classmethod
+    def _make(cls, mapping):
+        result = cls.__new__(cls)
+        result._map = mapping
+        return result
+
+    def add(self, item):
+        """Returns a new set containing the item."""
+        return self._make(self._map.set(item, True))
+
+    def remove(self, item):
+        """Returns a new set without the item."""
+        return self._make(self._map.remove(item))
+
+    def __contains__(self, item):
+        return item in self._map
+
+    def __len__(self):
+        return len(self._map)
+
+    def __iter__(self):
+        return iter(self._map)
+
+    def __hash__(self):
+        return self._hash()
+
+    def __repr__(self):
+        return "PersistentSet(%r)" % set(self)
+
+
+# strings up to this length are concatenated eagerly
+ROPE_THRESHOLD = 64
+
+
+class Rope(object):
+    """A string built from lazily concatenated parts.
+
+    The parts are joined once when the string is first needed and the
+    result is kept, so repeated concatenation costs linear time overall.
+    """
+
+    __slots__ = ("_left", "_right", "_length", "_flat")
+
+    def __init__(self, left, right):
+        self._left = left
+        self._right = right
+        self._length = len(left) + len(right)
+        self._flat = None
+
+    def __str__(self):
+        if self._flat is None:
+            parts = []
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                if not isinstance(node, Rope):
+                    parts.append(node)
+                elif node._flat is not None:
+                    parts.append(node._flat)
+                else:
+                    stack.append(node._right)
+                    stack.append(node._left)
+            self._flat = "".join(parts)
+            self._left = self._right = None
+        return self._flat
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return iter(str(self))
+
+    def __add__(self, other):
+        return concat(self, other)
+
+    def __radd__(self, other):
+        return concat(other, self)
+
+    def __eq__(self, other):
+        if not isinstance(other, (str, Rope)):
+            return NotImplemented
+        return len(self) == len(other) and str(self) == str(other)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __lt__(self, other):
+        return str(self) < str(other)
+
+    def __le__(self, other):
+        return str(self) <= str(other)
+
+    def __gt__(self, other):
+        return str(self) > str(other)
+
+    def __ge__(self, other):
+        return str(self) >= str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __repr__(self):
+        return "Rope(%r)" % str(self)
+
+
+def concat(left, right):
+    """Concatenates two strings, building a rope for long results."""
+    if not right:
+        return left
+    if not left:
+        return right
+    if (isinstance(left, str) and isinstance(right, str)
+            and len(left) + len(right) <= ROPE_THRESHOLD):
+        return left + right
+    return Rope(left, right)
+
+
+EMPTY_VECTOR = PersistentVector()
+EMPTY_MAP = PersistentMap()
+EMPTY_SET = PersistentSet()
@@ -0,0 +1,161 @@
+"""Persist the type feedback of a script across runs.
+
+The profile of a script is stored in flags.profile_dir under the hash of
+its source. It records how often each function was called, the argument
+types its body was specialized for and how many iterations each loop ran.
+A later run of the same source specializes the functions for the recorded
+types when they are defined and compiles the functions and loops that
+were hot on their first call and iteration.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+from runtime import ast, env, flags, optimizer
+
+
+class Profile(object):
+    """The recorded and observed feedback of the functions and loops of a tree."""
+
+    def __init__(self, path, tree):
+        self.path = path
+        # functions and loops are identified by their position in the tree
+        self.definitions = optimizer.collect(tree, ast.Definition, [])
+        self.loops = loops(tree)
+        self.indices = {id(loop): index for index, loop in enumerate(self.loops)}
+        self.calls = [0] * len(self.definitions)
+        self.types = [[] for _ in self.definitions]
+        self.iterations = [0] * len(self.loops)
+        # the last signature created by each definition
+        self.signatures = [None] * len(self.definitions)
+
+    def read(self):
+        """Loads the recorded feedback, a missing, malformed or stale profile is ignored."""
+        try:
+            with open(self.path, "r") as profile_file:
+                data = json.load(profile_file)
+        except (OSError, ValueError):
+            return
+        if not well_formed(data):
+            return
+        functions, iterations = data["functions"], data["loops"]
+        if len(functions) != len(self.definitions) or len(iterations) != len(self.loops):
+            return
+        self.calls = [function["calls"] for function in functions]
+        self.types = [function["types"] for function in functions]
+        self.iterations = iterations
+
+    def apply(self):
+        """Lets the definitions and loops of the tree use the recorded feedback."""
+        for index, definition in enumerate(self.definitions):
+            definition.profile = self.observer(index)
+        for index, loop in enumerate(self.loops):
+            if self.iterations[index] >= flags.loop_threshold:
+                # the loop is compiled after its first iteration
+                loop.iterations = max(loop.iterations, flags.loop_threshold - 1)
+
+    def observer(self, index):
+        """Returns the function a definition hands its new signatures to."""
+        def observe(signature, context):
+            self.gather(index)
+            self.signatures[index] = signature
+            if signature.specializer is not None:
+                for names in self.types[index]:
+                    try:
+                        types = [context.find("ty", name) for name in names]
+                    except env.NamespaceException:
+                        continue
+                    signature.specialized([env.Value(datatype) for datatype in types])
+            if self.calls[index] >= flags.call_threshold:
+                signature.threshold = 1
+        return observe
+
+    def gather(self, index):
+        """Adds the feedback of the last signature of a definition."""
+        signature = self.signatures[index]
+        if signature is None:
+            return
+        self.calls[index] = max(self.calls[index], sum(signature.calls.values()))
+        for types, body in signature.clones.items():
+            names = [datatype.name for datatype in types]
+            if names not in self.types[index] and len(self.types[index]) < env.Signature.clone_limit:
+                self.types[index].append(names)
+            if body is not signature.function:
+                # the loops of a specialized body count for the loops they were copied from
+                for original, loop in zip(loops(signature.function), loops(body)):
+                    self.count(original, loop.iterations)
+        self.signatures[index] = None
+
+    def count(self, loop, iterations):
+        """Adds the iterations a loop of the tree ran."""
+        index = self.indices.get(id(loop))
+        if index is not None:
+            self.iterations[index] = max(self.iterations[index], iterations)
+
+    def write(self):
+        """Stores the recorded and observed feedback."""
+        for index in range(len(self.definitions)):
+            self.gather(index)
+        for loop in self.loops:
+            self.count(loop, loop.iterations)
+        data = {
+            "functions": [{"calls": calls, "types": types} for calls, types in zip(self.calls, self.types)],
+            "loops": self.iterations,
+        }
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # concurrent runs of the script replace the profile as a whole
+            handle, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(handle, "w") as profile_file:
+                json.dump(data, profile_file, separators=(",", ":"))
+            os.replace(temporary, self.path)
+        except OSError:
+            pass
+
+
+def is_count(value):
+    """Checks if a value read from a profile is a count."""
+    return type(value) is int and value >= 0
+
+
+def well_formed(data):
+    """Checks if data read from a profile has the shape written by Profile.write."""
+    if type(data) is not dict or type(data.get("functions")) is not list or type(data.get("loops")) is not list:
+        return False
+    for function in data["functions"]:
+        if type(function) is not dict or not is_count(function.get("calls")):
+            return False
+        types = function.get("types")
+        if type(types) is not list:
+            return False
+        for names in types:
+            if type(names) is not list or any(type(name) is not str for name in names):
+                return False
+    return all(is_count(iterations) for iterations in data["loops"])
+
+
+def loops(root):
+    """Returns the loops of a tree in a fixed order."""
+    return optimizer.collect(root, ast.Loop, []) + optimizer.collect(root, ast.Iteration, [])
+
+
+def path(source):
+    """Returns the path of the profile of a source."""
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()
+    return os.path.join(flags.profile_dir, digest + ".json")
+
+
+def load(tree, source):
+    """Applies the profile of the source to its tree.
+
+    Returns the Profile, which is written back by its write method, or
+    None if profiles are disabled.
+    """
+    if flags.profile_dir is None:
+        return None
+    profile = Profile(path(source), tree)
+    profile.read()
+    profile.apply()
+    return profile
@@ -24,17 +24,6 @@ class SumNode(ast.Node):
         return env.Value(lib.INTEGER, value)
 
 
-class AccessNode(ast.Node):
-    """A access node."""
-    def __init__(self):
-        super().__init__()
-
-    @classmethod
-    def eval(cls, context):
-        """Stores a string in the current namespace."""
-        context.store(STRING_LITERAL.value)
-        return STRING_LITERAL.eval(context)
-
 class TestAst(unittest.TestCase):
     """The abstract syntax tree test cases."""
 
@@ -124,6 +113,113 @@ class TestAst(unittest.TestCase):
         self.assertEqual(context.behaviour, ast.RETURN_BEHAVIOUR)
 #        self.assertEqual(return_loop.__str__(), "<Node (loop)>")
 
+        # check frame reuse, the body declares the same name every iteration
+        context = env.empty_context()
+        context.load(lib)
+        context.store(env.Value(lib.INTEGER, 0, "i"))
+        increment = ast.Operation("+")
+        increment.children = [ast.Identifier("i"), ast.Literal(env.Value(lib.INTEGER, 1))]
+        assignment = ast.Assignment("i")
+        assignment.children = [increment]
+        body = ast.Sequence()
+        body.children = [ast.Declaration("x", "int"), assignment]
+        condition = ast.Operation("<")
+        condition.children = [ast.Identifier("i"), ast.Literal(env.Value(lib.INTEGER, 3))]
+        count_loop = ast.Loop()
+        count_loop.children = [condition, body]
+        namespace = context.namespace
+        self.assertEqual(count_loop.eval(context), NULL_LITERAL.value)
+        self.assertEqual(context.find("id", "i").data, 3)
+        self.assertIs(context.namespace, namespace)
+        self.assertRaises(env.NamespaceException, context.find, "id", "x")
+
+    def test_iteration_node(self):
+        """Test the iteration node."""
+        context = env.empty_context()
+        context.load(lib)
+        context.store(env.Value(lib.INTEGER, 0, "sum"))
+        addition = ast.Operation("+")
+        addition.children = [ast.Identifier("sum"), ast.Identifier("x")]
+        assignment = ast.Assignment("sum")
+        assignment.children = [addition]
+        body = ast.Sequence()
+        body.children = [ast.Declaration("y", "int"), assignment]
+
+        # ranges and lists
+        for items in (range(4), lib.LIST.cast(env.Value(lib.LIST, [0, 1, 2, 3]))):
+            context.find("id", "sum").data = 0
+            iteration = ast.Iteration("x")
+            iteration.children = [ast.Literal(lib.box(items)), body]
+            namespace = context.namespace
+            self.assertEqual(iteration.eval(context), NULL_LITERAL.value)
+            self.assertEqual(context.find("id", "sum").data, 6)
+            self.assertIs(context.namespace, namespace)
+            self.assertRaises(env.NamespaceException, context.find, "id", "x")
+
+        # iterators are consumed lazily
+        items = iter([1, 2, 3])
+        break_iteration = ast.Iteration("x")
+        break_iteration.children = [ast.Literal(lib.box(items)), ast.Break()]
+        self.assertEqual(break_iteration.eval(context), NULL_LITERAL.value)
+        self.assertEqual(context.behaviour, ast.DEFAULT_BEHAVIOUR)
+        self.assertEqual(list(items), [2, 3])
+
+        # check for return
+        return_node = ast.Return()
+        return_node.children = [ast.Identifier("x")]
+        return_iteration = ast.Iteration("x")
+        return_iteration.children = [ast.Literal(lib.box(range(5, 10))), return_node]
+        self.assertEqual(return_iteration.eval(context), env.Value(lib.INTEGER, 5))
+        self.assertEqual(context.behaviour, ast.RETURN_BEHAVIOUR)
+
+        # values without iterator are rejected
+        bad_iteration = ast.Iteration("x")
+        bad_iteration.children = [INT_LITERAL, ast.Sequence()]
+        self.assertRaises(env.RuntimeException, bad_iteration.eval, context)
+
+    def test_generator_node(self):
+        """Test generator functions."""
+        context = env.empty_context()
+        context.load(lib)
+        # func count() { var i = 0; while (i < 3) { yield i; i += 1; } }
+        increment = ast.Operation("+")
+        increment.children = [ast.Identifier("i"), ast.Literal(env.Value(lib.INTEGER, 1))]
+        assignment = ast.Assignment("i")
+        assignment.children = [increment]
+        yield_node = ast.Yield()
+        yield_node.children = [ast.Identifier("i")]
+        body = ast.Sequence()
+        body.children = [yield_node, assignment]
+        condition = ast.Operation("<")
+        condition.children = [ast.Identifier("i"), ast.Literal(env.Value(lib.INTEGER, 3))]
+        loop = ast.Loop()
+        loop.children = [condition, body]
+        declaration = ast.Assignment("i", True)
+        declaration.children = [INT_LITERAL]
+        function_body = ast.Sequence()
+        function_body.children = [ast.Declaration("i", "int"), declaration, loop]
+        definition = ast.Definition("count", [])
+        definition.add(function_body)
+        self.assertTrue(ast.contains_yield(definition.children[0]))
+        self.assertFalse(ast.contains_yield(definition))
+
+        function = definition.eval(context)
+        self.assertIs(type(function.signatures[0].function), ast.Generator)
+        namespace = context.namespace
+        iterator = function.eval([], context)
+        self.assertIs(iterator.datatype, lib.ITERATOR)
+        self.assertIs(context.namespace, namespace)
+
+        # the body only runs while the iterator is consumed
+        values = env.iterate(iterator)
+        self.assertEqual(next(values), env.Value(lib.INTEGER, 0))
+        self.assertIs(context.namespace, namespace)
+        self.assertEqual(context.behaviour, ast.DEFAULT_BEHAVIOUR)
+        self.assertEqual([value.data for value in values], [1, 2])
+
+        # yield is rejected outside of generators
+        self.assertRaises(env.RuntimeException, yield_node.eval, context)
+
     def test_return_node(self):
         """Test the return node."""
         # test empty return node
@@ -224,6 +320,28 @@ class TestAst(unittest.TestCase):
         bad_node = ast.Operation("?")
         self.assertRaises(Exception, bad_node.eval, context)
 
+        # a selected kernel is applied without looking up the operator
+        bad_node.children = [arg1, arg2]
+        bad_node.kernel = (lambda a, b: a * b, lib.INTEGER)
+        self.assertEqual(bad_node.eval(context), env.Value(lib.INTEGER, 21))
+
+    def test_short_circuit(self):
+        """Test short-circuit evaluation of operations."""
+        context = env.empty_context()
+        context.load(lib)
+        missing = ast.Identifier("missing")
+        and_node = ast.Operation("&&")
+        and_node.children = [FALSE_LITERAL, missing]
+        self.assertEqual(and_node.eval(context), FALSE_LITERAL.value)
+        or_node = ast.Operation("||")
+        or_node.children = [TRUE_LITERAL, missing]
+        self.assertEqual(or_node.eval(context), TRUE_LITERAL.value)
+        # the second operand is evaluated if the first does not decide
+        and_node.children = [TRUE_LITERAL, FALSE_LITERAL]
+        self.assertEqual(and_node.eval(context), FALSE_LITERAL.value)
+        or_node.children = [FALSE_LITERAL, missing]
+        self.assertRaises(Exception, or_node.eval, context)
+
     def test_cast_node(self):
         """Test the cast node."""
         context = env.empty_context()
@@ -234,6 +352,47 @@ class TestAst(unittest.TestCase):
         bad_node = ast.Cast("missing")
         self.assertRaises(Exception, bad_node.eval, context)
 
+    def test_record_node(self):
+        """Test the record node."""
+        context = env.empty_context()
+        context.store(lib.FLOAT)
+        context.store(lib.OBJECT)
+        record_node = ast.Record("Point", [("x", "float"), ("y", "float")])
+        constructor = record_node.eval(context)
+        self.assertIs(context.find("id", "Point"), constructor)
+        datatype = context.find("ty", "Point")
+        self.assertEqual(datatype.slots, {"x": 0, "y": 1})
+        self.assertTrue(datatype.kind_of(lib.OBJECT))
+        self.assertRaises(env.RuntimeException, record_node.eval, context)
+
+        # Fields need concrete types
+        context.store(lib.NUMBER)
+        abstract_node = ast.Record("Vector", [("x", lib.NUMBER.name)])
+        self.assertRaises(env.RuntimeException, abstract_node.eval, context)
+
+    def test_member_node(self):
+        """Test the member node."""
+        point, _ = lib.record("Point", [("x", lib.FLOAT), ("y", lib.INTEGER)])
+        other, _ = lib.record("Other", [("y", lib.FLOAT)])
+        context = env.empty_context()
+        context.store(env.Value(point, (1.0, 2), "p"))
+        context.store(env.Value(other, (3.0,), "o"))
+        member_node = ast.Member("y")
+        member_node.add(ast.Identifier("p"))
+        self.assertEqual(member_node.eval(context), env.Value(lib.INTEGER, 2))
+        self.assertIs(member_node.cached_type, point)
+
+        # The cache follows the record type
+        member_node.children = [ast.Identifier("o")]
+        self.assertEqual(member_node.eval(context), env.Value(lib.FLOAT, 3.0))
+        self.assertIs(member_node.cached_type, other)
+
+        bad_node = ast.Member("z")
+        bad_node.add(ast.Identifier("p"))
+        self.assertRaises(env.RuntimeException, bad_node.eval, context)
+        bad_node.children = [INT_LITERAL]
+        self.assertRaises(env.RuntimeException, bad_node.eval, context)
+
     def test_identifier_node(self):
         """Test the identifier node."""
         context = env.empty_context()
@@ -266,6 +425,9 @@ class TestAst(unittest.TestCase):
         self.assertEqual(decl_node.eval(context), NULL_LITERAL.value)
         self.assertEqual(context.find("id", "val"), NULL_LITERAL.value)
         self.assertRaises(env.RuntimeException, decl_node.eval, context)
+        context.store(lib.NUMBER)
+        abstract_node = ast.Declaration("number", lib.NUMBER.name)
+        self.assertRaises(env.RuntimeException, abstract_node.eval, context)
 
     def test_assignment_node(self):
         """Test the assignment node."""
@@ -284,17 +446,58 @@ class TestAst(unittest.TestCase):
         self.assertEqual(asgn_node.eval(context), INT_LITERAL.value)
         self.assertEqual(context.find("id", "value"), INT_LITERAL.value)
 
+    def test_binary_assignment_node(self):
+        """Test the binary assignment node."""
+        context = env.empty_context()
+        context.load(lib)
+        context.store(env.Value(lib.INTEGER, 3, "value"))
+        variable = context.find("id", "value")
+        asgn_node = ast.BinaryAssignment("value", "*")
+        asgn_node.add(ast.Literal(env.Value(lib.INTEGER, 2)))
+        self.assertEqual(asgn_node.eval(context), env.Value(lib.INTEGER, 6))
+        self.assertIs(context.find("id", "value"), variable)
+        self.assertEqual(variable, env.Value(lib.INTEGER, 6))
+
+        # without a kernel the operator decides, the type may not change
+        asgn_node = ast.BinaryAssignment("value", "*")
+        asgn_node.add(ast.Literal(env.Value(lib.FLOAT, 0.5)))
+        self.assertEqual(asgn_node.eval(context), env.Value(lib.INTEGER, 0))
+        asgn_node = ast.BinaryAssignment("value", "<")
+        asgn_node.add(INT_LITERAL)
+        self.assertRaises(env.AssignmentException, asgn_node.eval, context)
+        missing_node = ast.BinaryAssignment("missing", "+")
+        missing_node.add(INT_LITERAL)
+        self.assertRaises(env.NamespaceException, missing_node.eval, context)
+
+    def test_increment_node(self):
+        """Test the increment node."""
+        context = env.empty_context()
+        context.load(lib)
+        context.store(env.Value(lib.FLOAT, 1.0, "value"))
+        increment_node = ast.Increment("value", "-", env.Value(lib.FLOAT, 0.5))
+        increment_node.eval(context)
+        self.assertEqual(context.find("id", "value"), env.Value(lib.FLOAT, 0.5))
+        increment_node = ast.Increment("value", "+", env.Value(lib.INTEGER, 2))
+        increment_node.eval(context)
+        self.assertEqual(context.find("id", "value"), env.Value(lib.FLOAT, 2.5))
+        context.store(env.Value(lib.STRING, "a", "text"))
+        increment_node = ast.Increment("text", "-", env.Value(lib.INTEGER, 2))
+        self.assertRaises(env.OperatorException, increment_node.eval, context)
+
+    def test_compare_node(self):
+        """Test the compare node."""
+        context = env.empty_context()
+        context.load(lib)
+        context.store(env.Value(lib.INTEGER, 3, "value"))
+        compare_node = ast.Compare("value", "<", env.Value(lib.FLOAT, 3.5))
+        self.assertEqual(compare_node.eval(context), TRUE_LITERAL.value)
+        compare_node = ast.Compare("value", "==", env.Value(lib.INTEGER, 4))
+        self.assertEqual(compare_node.eval(context), FALSE_LITERAL.value)
+        compare_node = ast.Compare("value", "==", env.Value(lib.FLOAT, 3.0))
+        self.assertRaises(env.RuntimeException, compare_node.eval, context)
+
     def test_syntax_tree(self):
         """Test the syntax_tree method."""
         syntax_tree = ast.syntax_tree()
         self.assertTrue(syntax_tree is not None)
         self.assertEqual(syntax_tree.name, ast.Sequence.name)
-
-    def test_run_in_substitution(self):
-        """Test the run_in_substitution method."""
-        context = env.empty_context()
-        access_node = AccessNode()
-        result = ast.run_in_substitution(access_node, context)
-        self.assertEqual(result, STRING_LITERAL.value)
-        self.assertRaises(Exception, context.find, "id",
-                          STRING_LITERAL.value.name)
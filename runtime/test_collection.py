@@ -0,0 +1,135 @@
+"""The unit test for the runtime.collection module."""
+import unittest
+
+from runtime import env, lib, collection
+
+INT_VALUE = env.Value(lib.INTEGER, 1)
+INT2_VALUE = env.Value(lib.INTEGER, 2)
+STRING_VALUE = env.Value(lib.STRING, "Hello")
+LIST_VALUE = lib.LIST.cast(env.Value(lib.LIST, [3, 1, 2]))
+MAP_VALUE = lib.MAP.cast(env.Value(lib.MAP, {"a": 1}))
+SET_VALUE = lib.SET.cast(env.Value(lib.SET, {1, 2}))
+OTHER_SET_VALUE = lib.SET.cast(env.Value(lib.SET, {2, 3}))
+
+
+class TestCollection(unittest.TestCase):
+    """Test cases for the collection library."""
+
+    def test_length(self):
+        """Test the length function."""
+        length = collection.LENGTH_FUNCTION
+        context = env.empty_context()
+        self.assertEqual(length.eval([LIST_VALUE], context), env.Value(lib.INTEGER, 3))
+        self.assertEqual(length.eval([MAP_VALUE], context), INT_VALUE)
+        self.assertEqual(length.eval([STRING_VALUE], context), env.Value(lib.INTEGER, 5))
+        self.assertRaises(env.FunctionException, length.eval, [INT_VALUE], context)
+
+    def test_get(self):
+        """Test the get function."""
+        get = collection.GET_FUNCTION
+        context = env.empty_context()
+        self.assertEqual(get.eval([LIST_VALUE, INT_VALUE], context), INT_VALUE)
+        self.assertEqual(get.eval([MAP_VALUE, env.Value(lib.STRING, "a")], context), INT_VALUE)
+        self.assertRaises(env.RuntimeException, get.eval,
+                          [LIST_VALUE, env.Value(lib.INTEGER, 5)], context)
+        self.assertRaises(env.RuntimeException, get.eval, [MAP_VALUE, STRING_VALUE], context)
+
+    def test_append(self):
+        """Test the append function."""
+        append = collection.APPEND_FUNCTION
+        context = env.empty_context()
+        result = append.eval([LIST_VALUE, STRING_VALUE], context)
+        self.assertEqual(result, env.Value(lib.LIST, [3, 1, 2, "Hello"]))
+        self.assertEqual(LIST_VALUE, env.Value(lib.LIST, [3, 1, 2]))
+
+    def test_slice(self):
+        """Test the slice function."""
+        slice_function = collection.SLICE_FUNCTION
+        context = env.empty_context()
+        result = slice_function.eval([LIST_VALUE, INT_VALUE, env.Value(lib.INTEGER, 3)], context)
+        self.assertEqual(result, env.Value(lib.LIST, [1, 2]))
+
+    def test_contains(self):
+        """Test the contains function."""
+        contains = collection.CONTAINS_FUNCTION
+        context = env.empty_context()
+        self.assertTrue(contains.eval([LIST_VALUE, INT_VALUE], context).data)
+        self.assertTrue(contains.eval([SET_VALUE, INT2_VALUE], context).data)
+        self.assertFalse(contains.eval([MAP_VALUE, STRING_VALUE], context).data)
+
+    def test_map_functions(self):
+        """Test the keys, put and remove functions."""
+        context = env.empty_context()
+        key = env.Value(lib.STRING, "b")
+        result = collection.PUT_FUNCTION.eval([MAP_VALUE, key, INT2_VALUE], context)
+        self.assertEqual(result, env.Value(lib.MAP, {"a": 1, "b": 2}))
+        keys = collection.KEYS_FUNCTION.eval([result], context)
+        self.assertEqual(sorted(keys.data), ["a", "b"])
+        result = collection.REMOVE_FUNCTION.eval([result, key], context)
+        self.assertEqual(result, MAP_VALUE)
+
+    def test_set_functions(self):
+        """Test the union and intersection functions."""
+        context = env.empty_context()
+        union = collection.UNION_FUNCTION.eval([SET_VALUE, OTHER_SET_VALUE], context)
+        self.assertEqual(union, env.Value(lib.SET, {1, 2, 3}))
+        intersection = collection.INTERSECTION_FUNCTION.eval([SET_VALUE, OTHER_SET_VALUE], context)
+        self.assertEqual(intersection, env.Value(lib.SET, {2}))
+
+    def test_sort_join(self):
+        """Test the sort and join functions."""
+        context = env.empty_context()
+        result = collection.SORT_FUNCTION.eval([LIST_VALUE], context)
+        self.assertEqual(result, env.Value(lib.LIST, [1, 2, 3]))
+        joined = collection.JOIN_FUNCTION.eval([result, env.Value(lib.STRING, ", ")], context)
+        self.assertEqual(joined, env.Value(lib.STRING, "1, 2, 3"))
+        mixed = collection.APPEND_FUNCTION.eval([LIST_VALUE, STRING_VALUE], context)
+        self.assertRaises(env.RuntimeException, collection.SORT_FUNCTION.eval, [mixed], context)
+
+    def test_typed_lists(self):
+        """Test the typed list types and functions."""
+        context = env.empty_context()
+        ints = collection.INT_LIST.cast(LIST_VALUE)
+        self.assertEqual(ints.data.typecode, "q")
+        self.assertTrue(ints.datatype.kind_of(lib.LIST))
+        self.assertIs(collection.INT_LIST.cast(ints).data, ints.data)
+        self.assertRaises(env.CastException, collection.INT_LIST.cast,
+                          lib.LIST.cast(env.Value(lib.LIST, ["a"])))
+
+        # updates copy the list, the original is unchanged
+        pushed = collection.PUSH_FUNCTION.eval([ints, env.Value(lib.INTEGER, 7)], context)
+        self.assertEqual(list(pushed.data), [3, 1, 2, 7])
+        self.assertEqual(list(ints.data), [3, 1, 2])
+        other = collection.PUSH_FUNCTION.eval([ints, env.Value(lib.INTEGER, 8)], context)
+        self.assertEqual(list(other.data), [3, 1, 2, 8])
+        self.assertEqual(list(pushed.data), [3, 1, 2, 7])
+        ints = pushed
+        self.assertRaises(env.FunctionException, collection.PUSH_FUNCTION.eval,
+                          [ints, STRING_VALUE], context)
+        floats = collection.FLOAT_LIST.cast(env.Value(env.NULL))
+        extended = collection.EXTEND_FUNCTION.eval([floats, ints], context)
+        self.assertEqual(list(extended.data), [3.0, 1.0, 2.0, 7.0])
+        self.assertEqual(list(floats.data), [])
+        floats = extended
+
+        # generic list functions keep the element types
+        get = collection.GET_FUNCTION
+        self.assertEqual(get.eval([floats, INT_VALUE], context), env.Value(lib.FLOAT, 1.0))
+        bools = collection.BOOL_LIST.cast(env.Value(env.NULL))
+        bools = collection.PUSH_FUNCTION.eval([bools, env.Value(lib.BOOLEAN, True)], context)
+        self.assertEqual(get.eval([bools, env.Value(lib.INTEGER, 0)], context),
+                         env.Value(lib.BOOLEAN, True))
+        self.assertEqual(collection.LENGTH_FUNCTION.eval([ints], context),
+                         env.Value(lib.INTEGER, 4))
+        self.assertEqual(list(env.iterate(bools)), [env.Value(lib.BOOLEAN, True)])
+        self.assertEqual(list(env.iterate(floats))[0], env.Value(lib.FLOAT, 3.0))
+        sorted_ints = collection.SORT_FUNCTION.eval([ints], context)
+        self.assertIs(sorted_ints.datatype, collection.INT_LIST)
+        self.assertEqual(list(sorted_ints.data), [1, 2, 3, 7])
+        appended = collection.APPEND_FUNCTION.eval([ints, INT_VALUE], context)
+        self.assertEqual(list(appended.data), [3, 1, 2, 7, 1])
+        self.assertEqual(len(ints.data), 4)
+        self.assertRaises(env.RuntimeException, collection.APPEND_FUNCTION.eval,
+                          [ints, STRING_VALUE], context)
+        joined = collection.JOIN_FUNCTION.eval([bools, env.Value(lib.STRING, ",")], context)
+        self.assertEqual(joined.data, "true")
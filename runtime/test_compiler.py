@@ -0,0 +1,94 @@
+"""Test the runtime.compiler module."""
+import unittest
+
+from runtime import ast, compiler, env, flags, lexer, lib, parser
+
+
+def evaluate(expr):
+    context = env.empty_context()
+    context.load(lib)
+    return parser.generate(lexer.run(expr)).eval(context)
+
+
+PROGRAMS = [
+    ("func f(n: int) { if (n < 2) { return n; } return f(n - 1) + f(n - 2); } f(12);",
+     env.Value(lib.INTEGER, 144)),
+    ("func f(a: number) { var b = a * 2; return b - 1; } f(2):float + f(0.25);",
+     env.Value(lib.FLOAT, 2.5)),
+    ("var t = 0; var i = 0; while (i < 40) { if (i % 3 == 0) { t = t + i; } else if (i % 3 == 1) { t = t - 1; } i += 1; } t;",
+     env.Value(lib.INTEGER, 260)),
+    ("var t = 0; for (x in range(30)) { var y = x * x; t = t + y; if (t > 1000) { break; } } t;",
+     env.Value(lib.INTEGER, 1015)),
+    ("func g(x: int) { return x * 2; } var t = 0; for (var i = 0; i < 30; i += 1) { t = t + g(i) + g(i); } t;",
+     env.Value(lib.INTEGER, 1740)),
+    ("var s = \"\"; var i = 0; while (i < 12) { s = s + \"ab\"; i += 1; } s == \"abababababababababababab\";",
+     env.Value(lib.BOOLEAN, True)),
+    ("func h(n: int) { var i = 0; while (true) { if (i == n) { return i * 10; } i += 1; } } h(7) + h(3);",
+     env.Value(lib.INTEGER, 100)),
+    ("var p = 0.0; var sign = 4.0; for (var k = 0; k < 40; k += 1) { p = p + sign / (2.0 * (k: float) + 1.0); sign = -sign; } p > 3.1 && p < 3.2;",
+     env.Value(lib.BOOLEAN, True)),
+    ("var t = 0; for (var i = 0; i <= 30; i += 2) { t += i; if (t > 100) { break; } } t;",
+     env.Value(lib.INTEGER, 110)),
+    ("var t = 0; var i = 0; while (i < 20) { i += 1; if (i % 2 == 0) { continue; } t += i; } t;",
+     env.Value(lib.INTEGER, 100)),
+    ("var i = 10; var f = true; while (i > 0 && f) { i -= 1; f = i != 3; } i;",
+     env.Value(lib.INTEGER, 3)),
+    ("var t = 0; for (var i = 0; i < 10; i += 1) { for (var j = 0; j < i; j += 1) { t += j; } } t;",
+     env.Value(lib.INTEGER, 120)),
+    ("func f(n: int) { var t = 0; for (var i = 0; i < n; i += 1) { t = t + i / 2; } return t; } f(20) + f(10);",
+     env.Value(lib.INTEGER, 110)),
+    ("func outer(a: int) { if (true) { func gen(n: int) { var i = 0; while (i < n) { yield a + i; i += 1; } } return gen(3); } } "
+     "var it = outer(10); var t = 0; for (v in it) { t = t + v; } t;",
+     env.Value(lib.INTEGER, 33)),
+]
+
+
+class TestCompiler(unittest.TestCase):
+    """Test the closure compiler."""
+
+    def setUp(self):
+        self.flags = flags.call_threshold, flags.loop_threshold, flags.trace_loops
+
+    def tearDown(self):
+        flags.call_threshold, flags.loop_threshold, flags.trace_loops = self.flags
+
+    def test_compiled_programs(self):
+        """Compiled and traced code computes the same values as evaluated code."""
+        for trace_loops in [False, True]:
+            for thresholds in [(10**9, 10**9), (1, 1), (3, 5)]:
+                flags.call_threshold, flags.loop_threshold = thresholds
+                flags.trace_loops = trace_loops
+                for source, expected in PROGRAMS:
+                    self.assertEqual(evaluate(source), expected, (trace_loops, thresholds, source))
+
+    def test_compile_node(self):
+        """Test the compilation of single nodes."""
+        context = env.empty_context()
+        context.load(lib)
+        context.store(env.Value(lib.INTEGER, 3, "a"))
+        operation = ast.Operation("*")
+        operation.children = [ast.Identifier("a"), ast.Literal(env.Value(lib.FLOAT, 0.5))]
+        self.assertEqual(compiler.compile_node(operation)(context), env.Value(lib.INTEGER, 0))
+        assignment = ast.Assignment("a")
+        assignment.add(ast.Literal(env.Value(lib.STRING, "a")))
+        self.assertRaises(env.AssignmentException, compiler.compile_node(assignment), context)
+        # nodes without a compiler are evaluated
+        record = ast.Record("Point", [])
+        self.assertEqual(compiler.compile_node(record), record.eval)
+
+    def test_hot_code(self):
+        """Functions and loops are compiled once they cross the thresholds."""
+        flags.call_threshold, flags.loop_threshold = 3, 5
+        context = env.empty_context()
+        context.load(lib)
+        tree = parser.generate(lexer.run(
+            "func f(n: int) { var t = 0; while (t < n) { t += 1; } return t; } f(2); f(2);"))
+        tree.eval(context)
+        signature = context.find("id", "f").signatures[0]
+        loop = tree.children[0].children[0].children[1]
+        self.assertEqual(signature.compiled, {})
+        self.assertIsNone(loop.compiled)
+        parser.generate(lexer.run("f(2);")).eval(context)
+        self.assertEqual(len(signature.compiled), 1)
+        self.assertIsNotNone(loop.compiled)
+        self.assertEqual(parser.generate(lexer.run("f(9);")).eval(context), env.Value(lib.INTEGER, 9))
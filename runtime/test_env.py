@@ -46,12 +46,61 @@ class TestEnv(unittest.TestCase):
                           "id", MISSING_INT_VALUE.name)
         self.assertRaises(env.NamespaceException, namespace.find, "op",
                           ANOTHER_USELESS_OPERATOR.symbol)
+        # clear local search spaces
+        sub.clear()
+        self.assertRaises(env.NamespaceException, sub.find, "id", MISSING_INT_VALUE.name)
+        self.assertEqual(sub.find("id", STRING_VALUE.name), STRING_VALUE)
+
+    def test_namespace_pool(self):
+        """Test acquiring and releasing pooled namespaces."""
+        parent = env.Namespace(None)
+        frame = env.Namespace.acquire(parent)
+        self.assertIs(frame.parent, parent)
+        frame.store(INT_VALUE)
+        frame.release()
+        reused = env.Namespace.acquire(parent)
+        self.assertIs(reused, frame)
+        self.assertRaises(env.NamespaceException, reused.find, "id", INT_VALUE.name)
+        # captured namespaces are not reused
+        reused.captured = True
+        reused.release()
+        self.assertIsNot(env.Namespace.acquire(parent), reused)
+        # capturing a namespace captures the namespaces it is nested in
+        block = env.Namespace.acquire(parent).child()
+        block.capture()
+        self.assertTrue(block.captured and block.parent.captured and parent.captured)
 
     def test_datatype(self):
         """Test the Datatype class."""
         self.assertTrue(lib.INTEGER.kind_of(lib.NUMBER))
         self.assertTrue(lib.FLOAT.kind_of(lib.NUMBER))
         self.assertTrue(lib.INTEGER.kind_of(env.ANY))
+        self.assertFalse(lib.INTEGER.kind_of(lib.FLOAT))
+        self.assertFalse(env.ANY.kind_of(lib.NUMBER))
+        # defining types keeps the precomputed hierarchy
+        generation = env.Datatype.generation
+        parent = env.Datatype("parent", None, env.ANY)
+        child = env.Datatype("child", None, env.ANY)
+        env.Namespace(None).store(child)
+        lib.record("point", [("x", lib.INTEGER)])
+        self.assertEqual(env.Datatype.generation, generation)
+        self.assertFalse(child.kind_of(parent))
+        # moving a type invalidates it and the types below it
+        grandchild = env.Datatype("grandchild", None, child)
+        self.assertFalse(grandchild.kind_of(parent))
+        child.parent = parent
+        self.assertTrue(child.kind_of(parent))
+        self.assertTrue(grandchild.kind_of(parent))
+
+    def test_iterate(self):
+        """Test the iterator protocol."""
+        vector = lib.LIST.cast(env.Value(lib.LIST, [1, "a"]))
+        self.assertEqual(list(env.iterate(vector)),
+                         [env.Value(lib.INTEGER, 1), env.Value(lib.STRING, "a")])
+        # the hook is inherited from parent types
+        child = env.Datatype("child", None, lib.LIST)
+        self.assertEqual(len(list(env.iterate(env.Value(child, [1, 2])))), 2)
+        self.assertRaises(env.RuntimeException, env.iterate, env.Value(lib.INTEGER, 1))
 
     def test_context(self):
         """Test the Context class."""
@@ -121,6 +170,37 @@ class TestEnv(unittest.TestCase):
         self.assertEqual(sign.match(fourth_case),
                          (fourth_case_result, "works!"))
 
+        # Case 5: containers are passed by reference
+        list_sign = env.Signature([env.Value(env.ANY, None, "l")], "works!")
+        values, _ = list_sign.match([LIST_VALUE])
+        self.assertIs(values[0].data, LIST_VALUE.data)
+        self.assertIsNot(values[0], LIST_VALUE)
+        self.assertEqual(values[0].name, "l")
+
+    def test_specialized(self):
+        """Test the specialized bodies of a signature."""
+        bodies = []
+        def specializer(body, expected, types):
+            bodies.append(types)
+            return None if types[0] is lib.STRING else types
+        sign = env.Signature([env.Value(env.ANY, None, "a")], "generic")
+        sign.specializer = specializer
+        self.assertEqual(sign.specialized([INT_VALUE]), (lib.INTEGER,))
+        self.assertEqual(sign.specialized([INT_VALUE]), (lib.INTEGER,))
+        self.assertEqual(sign.specialized([STRING_VALUE]), "generic")
+        self.assertEqual(bodies, [(lib.INTEGER,), (lib.STRING,)])
+        # beyond the limit the generic body is used
+        sign.clones = {(index,): "clone" for index in range(env.Signature.clone_limit)}
+        self.assertEqual(sign.specialized([FLOAT_VALUE]), "generic")
+
+    def test_tier(self):
+        """Test the compilation of hot bodies."""
+        sign = env.Signature([], None)
+        sign.compiler, sign.threshold = lambda body: "compiled " + body, 3
+        self.assertEqual([sign.tier("body") for _ in range(4)],
+                         ["body", "body", "compiled body", "compiled body"])
+        self.assertEqual(sign.tier("other"), "other")
+
     def test_function(self):
         """Test the function class."""
         context = env.empty_context()
@@ -174,6 +254,23 @@ class TestEnv(unittest.TestCase):
         ])
         self.assertRaises(Exception, context.find, "id", "x")
 
+        # Check namespace restore after failing body
+        class FailingNode(ast.Node):
+            """A node raising a runtime exception."""
+            name = "failing"
+
+            @classmethod
+            def eval(cls, context):
+                """Raises a RuntimeException."""
+                raise env.RuntimeException("failed")
+
+        func = env.Function([
+            env.Signature([], FailingNode()),
+        ])
+        namespace = context.namespace
+        self.assertRaises(env.RuntimeException, func.eval, [], context)
+        self.assertIs(context.namespace, namespace)
+
     def test_operator(self):
         """Test the operator class."""
         context = env.empty_context()
@@ -1,7 +1,7 @@
 """The unit test for the runtime.lib module."""
 import unittest
 
-from runtime import env, lib
+from runtime import env, lib, persistent
 
 INT_VALUE = env.Value(lib.INTEGER, 1)
 INT2_VALUE = env.Value(lib.INTEGER, 2)
@@ -67,6 +67,9 @@ class TestLib(unittest.TestCase):
     def test_list(self):
         """Test the LIST type."""
         self.assertEqual(lib.LIST.cast(LIST_VALUE), LIST_VALUE)
+        vector = lib.LIST.cast(LIST_VALUE)
+        self.assertIsInstance(vector.data, persistent.PersistentVector)
+        self.assertIs(lib.LIST.cast(vector).data, vector.data)
         self.assertEqual(lib.LIST.cast(STRING_VALUE), LIST_VALUE)
         self.assertRaises(env.CastException, lib.LIST.cast, TRUE_VALUE)
 
@@ -76,12 +79,62 @@ class TestLib(unittest.TestCase):
         self.assertEqual(lib.SET.cast(LIST_VALUE), SET_VALUE)
         self.assertRaises(env.CastException, lib.SET.cast, TRUE_VALUE)
 
+    def test_box(self):
+        """Test boxing host data."""
+        self.assertEqual(lib.box(1), INT_VALUE)
+        self.assertEqual(lib.box(1.0), FLOAT_VALUE)
+        self.assertEqual(lib.box(True), TRUE_VALUE)
+        self.assertEqual(lib.box(None), NULL_VALUE)
+        self.assertEqual(lib.box("Hello"), STRING_VALUE)
+        self.assertIs(lib.box(STRING_VALUE), STRING_VALUE)
+        self.assertIs(lib.box(persistent.PersistentVector()).datatype, lib.LIST)
+
     def test_object(self):
         """Test the OBJECT type."""
         self.assertEqual(lib.OBJECT.cast(OBJECT_VALUE), OBJECT_VALUE)
         self.assertRaises(env.CastException, lib.OBJECT.cast,
                           ANOTHER_USELESS_OPERATOR)
 
+    def test_range(self):
+        """Test the range function and the RANGE type."""
+        context = env.empty_context()
+        range_function = lib.RANGE_FUNCTION
+        self.assertEqual(range_function.eval([INT_VALUE], context), env.Value(lib.RANGE, range(1)))
+        bounds = [INT_VALUE, env.Value(lib.INTEGER, 7)]
+        self.assertEqual(range_function.eval(bounds, context), env.Value(lib.RANGE, range(1, 7)))
+        steps = bounds + [env.Value(lib.INTEGER, 3)]
+        value = range_function.eval(steps, context)
+        self.assertEqual(value.format(), "range(1, 7, 3)")
+        self.assertEqual(list(lib.LIST.cast(value).data), [1, 4])
+        self.assertRaises(env.RuntimeException, range_function.eval,
+                          bounds + [env.Value(lib.INTEGER, 0)], context)
+        self.assertRaises(env.FunctionException, range_function.eval, [FLOAT_VALUE], context)
+
+    def test_iterator(self):
+        """Test the ITERATOR type."""
+        iterator = lib.box(iter([1, "a"]))
+        self.assertIs(iterator.datatype, lib.ITERATOR)
+        self.assertEqual(list(lib.LIST.cast(iterator).data), [1, "a"])
+        vector = lib.LIST.cast(env.Value(lib.LIST, [1, 2]))
+        self.assertEqual(list(env.iterate(lib.ITERATOR.cast(vector))),
+                         [INT_VALUE, env.Value(lib.INTEGER, 2)])
+        self.assertEqual(list(env.iterate(lib.ITERATOR.cast(NULL_VALUE))), [])
+
+    def test_record(self):
+        """Test record types."""
+        point, constructor = lib.record("Point", [("x", lib.FLOAT), ("y", lib.FLOAT)])
+        context = env.empty_context()
+        value = constructor.eval([INT_VALUE, FLOAT_VALUE], context)
+        self.assertIs(value.datatype, point)
+        self.assertEqual(value.data, (1.0, 1.0))
+        self.assertIsInstance(value.data, lib.Record)
+        self.assertEqual(value.format(), "Point(1.000000, 1.000000)")
+        self.assertEqual(point.cast(NULL_VALUE), env.Value(point, (0.0, 0.0)))
+        self.assertEqual(point.cast(value), value)
+        self.assertIs(lib.box(value.data).datatype, point)
+        self.assertRaises(env.CastException, constructor.eval, [STRING_VALUE, INT_VALUE], context)
+        self.assertRaises(env.CastException, point.cast, INT_VALUE)
+
     def test_add_operation(self):
         """Test the add operator / function."""
         add_op = lib.PLUS_OPERATOR
@@ -103,6 +156,13 @@ class TestLib(unittest.TestCase):
         args = [STRING_VALUE, INT_VALUE]
         self.assertEqual(add_op.eval(args, context), STRING1_VALUE)
 
+        # Case 5: long strings are concatenated lazily
+        long_value = env.Value(lib.STRING, "x" * 100)
+        result = add_op.eval([long_value, STRING_VALUE], context)
+        self.assertIsInstance(result.data, persistent.Rope)
+        self.assertEqual(result, env.Value(lib.STRING, "x" * 100 + "Hello"))
+        self.assertEqual(result.format(), "\"%s\"" % ("x" * 100 + "Hello"))
+
     def test_sub_operation(self):
         """Test the sub operator / function."""
         sub_op = lib.MINUS_OPERATOR
@@ -183,6 +243,10 @@ class TestLib(unittest.TestCase):
         # Case 3: One true, one false
         args = [TRUE_VALUE, FALSE_VALUE]
         self.assertEqual(and_op.eval(args, context), FALSE_VALUE)
+        # Case 4: False decides alone
+        self.assertEqual(and_op.short_circuit(FALSE_VALUE), FALSE_VALUE)
+        self.assertIsNone(and_op.short_circuit(TRUE_VALUE))
+        self.assertIsNone(and_op.short_circuit(INT_VALUE))
 
     def test_or_operation(self):
         """Test the or operator / function."""
@@ -198,6 +262,9 @@ class TestLib(unittest.TestCase):
         # Case 3: One false, one true
         args = [TRUE_VALUE, FALSE_VALUE]
         self.assertEqual(or_op.eval(args, context), TRUE_VALUE)
+        # Case 4: True decides alone
+        self.assertEqual(or_op.short_circuit(TRUE_VALUE), TRUE_VALUE)
+        self.assertIsNone(or_op.short_circuit(FALSE_VALUE))
 
     def test_xor_operation(self):
         """Test the xor operator / function."""
@@ -500,6 +567,28 @@ class TestLib(unittest.TestCase):
         args = [INT_VALUE, INT0_VALUE]
         self.assertRaises(env.RuntimeException, mod_op.eval, args, context)
 
+    def test_kernels(self):
+        """The kernels compute the same values as the operator functions."""
+        context = env.empty_context()
+        samples = {
+            lib.INTEGER: [7, -7, 2, 0],
+            lib.FLOAT: [7.5, -2.0, 0.0],
+            lib.STRING: ["a", "b"],
+            lib.BOOLEAN: [True, False],
+        }
+        operators = [element for element in lib.EXPORTS if isinstance(element, env.Operator)]
+        for operator in operators:
+            for (type_a, type_b), (function, result) in operator.kernels.items():
+                for data_a in samples[type_a]:
+                    for data_b in samples[type_b]:
+                        args = [env.Value(type_a, data_a), env.Value(type_b, data_b)]
+                        try:
+                            expected = operator.eval(args, context)
+                        except Exception as error:
+                            self.assertRaises(type(error), function, data_a, data_b)
+                            continue
+                        self.assertEqual(env.Value(result, function(data_a, data_b)), expected)
+
     def test_pow_operation(self):
         pow_op = lib.POW_OPERATOR
         context = env.empty_context()
@@ -522,3 +611,12 @@ class TestLib(unittest.TestCase):
         args = [FLOAT_VALUE, FLOAT_VALUE]
         self.assertEqual(pow_op.eval(args, context), FLOAT_VALUE)
 
+        # negative powers of integers are truncated to integers
+        args = [env.Value(lib.INTEGER, 2), env.Value(lib.INTEGER, -1)]
+        result = pow_op.eval(args, context)
+        self.assertEqual(result, env.Value(lib.INTEGER, 0))
+        self.assertIs(type(result.data), int)
+        function, datatype = pow_op.kernels[(lib.INTEGER, lib.INTEGER)]
+        self.assertIs(type(function(2, -1)), int)
+        self.assertIs(datatype, lib.INTEGER)
+
@@ -0,0 +1,61 @@
+"""The unit test for the runtime.ndarray module."""
+import unittest
+
+from runtime import collection, env, lib
+
+try:
+    from runtime import ndarray
+except ImportError:
+    ndarray = None
+
+INT_VALUE = env.Value(lib.INTEGER, 2)
+LIST_VALUE = lib.LIST.cast(env.Value(lib.LIST, [1.0, 2.0, 3.0]))
+
+
+@unittest.skipIf(ndarray is None, "NumPy is not installed")
+class TestNdarray(unittest.TestCase):
+    """Test cases for the numeric array library."""
+
+    def test_array(self):
+        """Test the ARRAY type."""
+        array = ndarray.ARRAY.cast(LIST_VALUE)
+        self.assertEqual(array.data.tolist(), [1.0, 2.0, 3.0])
+        self.assertIs(ndarray.ARRAY.cast(array).data, array.data)
+        self.assertEqual(ndarray.ARRAY.cast(env.Value(env.NULL)).data.size, 0)
+        self.assertRaises(env.CastException, ndarray.ARRAY.cast, INT_VALUE)
+        self.assertRaises(env.CastException, ndarray.ARRAY.cast,
+                          lib.LIST.cast(env.Value(lib.LIST, ["a"])))
+        self.assertRaises(env.CastException, ndarray.ARRAY.cast,
+                          lib.LIST.cast(env.Value(lib.LIST, [{}])))
+        ints = collection.INT_LIST.cast(LIST_VALUE)
+        self.assertEqual(ndarray.ARRAY.cast(ints).data.tolist(), [1.0, 2.0, 3.0])
+        bools = collection.BOOL_LIST.cast(lib.LIST.cast(env.Value(lib.LIST, [True, False])))
+        self.assertEqual(ndarray.ARRAY.cast(bools).data.tolist(), [1.0, 0.0])
+
+    def test_elementwise(self):
+        """Test the elementwise operator overloads."""
+        context = env.empty_context()
+        array = ndarray.ARRAY.cast(LIST_VALUE)
+        result = lib.PLUS_OPERATOR.eval([array, array], context)
+        self.assertIs(result.datatype, ndarray.ARRAY)
+        self.assertEqual(result.data.tolist(), [2.0, 4.0, 6.0])
+        result = lib.MUL_OPERATOR.eval([INT_VALUE, array], context)
+        self.assertEqual(result.data.tolist(), [2.0, 4.0, 6.0])
+        result = lib.MINUS_OPERATOR.eval([array], context)
+        self.assertEqual(result.data.tolist(), [-1.0, -2.0, -3.0])
+        result = lib.SM_OPERATOR.eval([array, INT_VALUE], context)
+        self.assertEqual(result.data.tolist(), [True, False, False])
+        # numbers still use the scalar functions
+        self.assertEqual(lib.PLUS_OPERATOR.eval([INT_VALUE, INT_VALUE], context),
+                         env.Value(lib.INTEGER, 4))
+
+    def test_reductions(self):
+        """Test the array reductions."""
+        context = env.empty_context()
+        array = ndarray.ARRAY.cast(LIST_VALUE)
+        self.assertEqual(ndarray.SUM_FUNCTION.eval([array], context), env.Value(lib.FLOAT, 6.0))
+        self.assertEqual(ndarray.MIN_FUNCTION.eval([array], context), env.Value(lib.FLOAT, 1.0))
+        self.assertEqual(ndarray.MAX_FUNCTION.eval([array], context), env.Value(lib.FLOAT, 3.0))
+        self.assertEqual(ndarray.MEAN_FUNCTION.eval([array], context), env.Value(lib.FLOAT, 2.0))
+        empty = ndarray.ARRAY.cast(env.Value(env.NULL))
+        self.assertRaises(env.RuntimeException, ndarray.SUM_FUNCTION.eval, [empty], context)
@@ -0,0 +1,358 @@
+"""Test the runtime.optimizer module."""
+import unittest
+
+from runtime import ast, env, lexer, lib, optimizer, parser
+
+
+def generate(expr):
+    return parser.generate(lexer.run(expr))
+
+
+def evaluate(expr):
+    context = env.empty_context()
+    context.load(lib)
+    return generate(expr).eval(context), context
+
+
+class TestOptimizer(unittest.TestCase):
+    """Test the AST optimizations."""
+
+    def test_declares(self):
+        """Test the declaration analysis."""
+        self.assertTrue(optimizer.declares(ast.Declaration("a", "int")))
+        self.assertTrue(optimizer.declares(ast.Definition("f", [])))
+        self.assertFalse(optimizer.declares(ast.Identifier("a")))
+        # declarations in own scopes do not leak
+        scoped = ast.Sequence(True)
+        scoped.add(ast.Declaration("a", "int"))
+        self.assertFalse(optimizer.declares(scoped))
+        unscoped = ast.Sequence()
+        unscoped.add(scoped)
+        unscoped.add(ast.Declaration("b", "int"))
+        self.assertTrue(optimizer.declares(unscoped))
+
+    def test_elide_scopes(self):
+        """Test the scope elision pass."""
+        tree = generate("var a = 0; if (a == 0) { a = 1; } else { var b = 2; }")
+        branch = tree.children[1]
+        self.assertFalse(branch.children[0].children[1].substitute)
+        self.assertTrue(branch.children[1].substitute)
+
+        tree = generate("var a = 0; while (a < 3) { a += 1; }")
+        self.assertFalse(tree.children[1].substitute)
+        tree = generate("var a = 0; while (a < 3) { var b = a; a += 1; }")
+        self.assertTrue(tree.children[1].substitute)
+
+        # for loops keep the scope of their induction variable
+        tree = generate("for (var i = 0; i < 3; i += 1) { i; }")
+        self.assertTrue(tree.children[0].substitute)
+        self.assertFalse(tree.children[0].children[1].substitute)
+
+        # iterations only clear their frame when the body declares names
+        tree = generate("for (x in range(3)) { x; }")
+        self.assertFalse(tree.children[0].substitute)
+        tree = generate("for (x in range(3)) { var y = x; }")
+        self.assertTrue(tree.children[0].substitute)
+        self.assertFalse(optimizer.declares(tree.children[0]))
+
+    def test_elided_evaluation(self):
+        """Test evaluation of elided and kept scopes."""
+        value, context = evaluate("var a = 0; while (a < 3) { if (a == 1) { a += 5; } a += 1; } a;")
+        self.assertEqual(value, env.Value(lib.INTEGER, 7))
+        value, context = evaluate("var a = 0; if (a == 0) { var b = 2; a = b; } a;")
+        self.assertEqual(value, env.Value(lib.INTEGER, 2))
+        self.assertRaises(env.NamespaceException, context.find, "id", "b")
+
+    def test_jump_tables(self):
+        """Test the jump table pass."""
+        source = "var n = %d; var r = 0; if (n == 0) { r = 10; } else if (1 == n) { r = 11; } else if (n == 2) { r = 12; } else { r = 13; } r;"
+        branch = generate(source % 0).children[2]
+        self.assertEqual(branch.subject, "n")
+        self.assertIs(branch.case_type, lib.INTEGER)
+        self.assertEqual(sorted(branch.table), [0, 1, 2])
+        self.assertIs(type(branch.fallback), ast.Sequence)
+        for n in range(4):
+            value, _ = evaluate(source % n)
+            self.assertEqual(value, env.Value(lib.INTEGER, 10 + n))
+
+        # values of other types use the sequential tests
+        value, _ = evaluate("var n = true; var r = 0; if (n == true) { r = 1; } else if (n == false) { r = 2; } r;")
+        self.assertEqual(value, env.Value(lib.INTEGER, 1))
+        self.assertRaises(env.RuntimeException, evaluate,
+                          "var n = 1.0; if (n == 0) { n; } else if (n == 1) { n; }")
+
+        # the chain stops at the first test that is no constant case
+        tree = generate("var n = 0; if (n == 0) { n; } else if (n == 1) { n; } else if (n < 5) { n; }")
+        branch = tree.children[1]
+        self.assertEqual(sorted(branch.table), [0, 1])
+        self.assertIs(type(branch.fallback), ast.Branch)
+        value, _ = evaluate("var n = 3; var r = 0; if (n == 0) { r = 1; } else if (n == 1) { r = 2; } else if (n < 5) { r = 3; } r;")
+        self.assertEqual(value, env.Value(lib.INTEGER, 3))
+        value, _ = evaluate("var n = 7; var r = 0; if (n == 0) { r = 1; } else if (n == 1) { r = 2; } r;")
+        self.assertEqual(value, env.Value(lib.INTEGER, 0))
+
+        # chains over different identifiers or duplicate constants are not compiled
+        self.assertIsNone(generate("var n = 0; if (n == 0) { n; } else if (m == 1) { n; }").children[1].table)
+        self.assertIsNone(generate("var n = 0; if (n == 0) { n; } else if (n == 0) { n; }").children[1].table)
+
+    def test_hoist_invariants(self):
+        """Test the loop-invariant code motion pass."""
+        tree = generate("var a = 2; var s = 0; while (s < 10) { s = s + a * 3 + s * 2; }")
+        loop = tree.children[2]
+        self.assertEqual(len(loop.invariants), 1)
+        invariant = loop.invariants[0]
+        self.assertEqual(invariant.children[0].symbol, "*")
+        self.assertEqual(invariant.children[0].children[0], ast.Identifier("a"))
+
+        # assigned, declared and iterated names are not invariant
+        tree = generate("var a = 2; while (a < 10) { a = a * 2; var b = 1; b * 2; }")
+        self.assertEqual(tree.children[1].invariants, [])
+        tree = generate("var a = 2; for (x in range(3)) { a + x; (a: float); }")
+        self.assertEqual(len(tree.children[1].invariants), 1)
+        self.assertIs(type(tree.children[1].invariants[0].children[0]), ast.Cast)
+
+        # loops calling functions are left alone
+        tree = generate("var a = 2; while (a < 10) { a = f(a * 2); }")
+        self.assertEqual(tree.children[1].invariants, [])
+
+        # invariants are reevaluated on every loop activation
+        value, _ = evaluate("var t = 0; var a = 0; for (x in range(3)) { a = x; var i = 0; while (i < 2) { t = t + a * 10; i += 1; } } t;")
+        self.assertEqual(value, env.Value(lib.INTEGER, 60))
+        # and only evaluated when reached
+        value, _ = evaluate("var a = 0; var i = 0; while (i < 3) { if (a != 0) { i = 1 / a; } i += 1; } i;")
+        self.assertEqual(value, env.Value(lib.INTEGER, 3))
+        # generators may assign variables between the elements of an iterator
+        value, _ = evaluate("var n = 1; func gen() { var i = 0; while (i < 3) { n = n + 1; yield i; i += 1; } } "
+                            "var t = 0; for (v in gen()) { t = t + n * 10; } t;")
+        self.assertEqual(value, env.Value(lib.INTEGER, 90))
+        tree = generate("var a = 2; var b = 3; while (a < 10) { for (x in it) { } a = a + b * 2; }")
+        self.assertEqual(tree.children[2].invariants, [])
+
+    def test_eliminate_common_subexpressions(self):
+        """Test the common subexpression elimination pass."""
+        tree = generate("var a = 1; var b = 2; var c = (a + b) * (a + b) - b;")
+        self.assertEqual(len(tree.cells), 1)
+        expression = tree.children[2].children[1].children[0]
+        self.assertIs(type(expression.children[0].children[0]), ast.Shared)
+        self.assertIs(expression.children[0].children[0].cell,
+                      expression.children[0].children[1].cell)
+
+        # assignments invalidate the expressions reading their name
+        tree = generate("var a = 1; var b = a + 1; a = a + 1; var c = a + 1;")
+        self.assertEqual(len(tree.cells), 1)
+        self.assertIs(type(tree.children[2].children[0]), ast.Shared)
+        self.assertIs(type(tree.children[3].children[1].children[0]), ast.Operation)
+        value, _ = evaluate("var a = 1; var b = a + 1; a = a + 1; var c = a + 1; b * 10 + c;")
+        self.assertEqual(value, env.Value(lib.INTEGER, 23))
+
+        # calls invalidate all expressions
+        tree = generate("var a = 1; var b = a + 1; f(); var c = a + 1;")
+        self.assertEqual(tree.cells, [])
+        tree = generate("var a = 1; var b = a + 1; if (a == 1) { a = 2; } var c = a + 1;")
+        self.assertEqual(tree.cells, [])
+
+        # blocks with yield are skipped
+        tree = generate("func f(a: int) { yield a + 1; yield a + 1; }")
+        self.assertEqual(tree.children[0].children[0].cells, [])
+        # but not the blocks defining generators
+        tree = generate("var a = 1; var b = a + 1; func f() { yield 0; } var c = a + 1;")
+        self.assertEqual(len(tree.cells), 1)
+
+        # iterations may draw from a generator changing any variable
+        value, _ = evaluate("var n = 1; func gen() { n = n + 1; yield 0; } "
+                            "func f(it: iterator) { var a = n * 2; for (v in it) { } var b = n * 2; return b; } f(gen());")
+        self.assertEqual(value, env.Value(lib.INTEGER, 4))
+
+        # every block activation computes its own values
+        value, _ = evaluate("func f(n: int) { if (n == 0) { return 0; } return (n * 2) + f(n - 1) + (n * 2); } f(3);")
+        self.assertEqual(value, env.Value(lib.INTEGER, 24))
+        value, _ = evaluate("var t = 0; for (x in range(4)) { t = t + (x * x) + (x * x); } t;")
+        self.assertEqual(value, env.Value(lib.INTEGER, 28))
+
+    def test_inline_calls(self):
+        """Test the inliner."""
+        tree = generate("func add(a: int, b: int) { return a + b * 2; } add(1, 2);")
+        call = tree.children[1]
+        self.assertIs(call.inline_body, tree.children[0].children[0])
+        self.assertIs(type(call.inline_expression.children[0]), ast.Argument)
+        self.assertEqual(call.inline_expression.children[1].children[0].index, 1)
+
+        value, context = evaluate("func add(a: int, b: int) { return a + b * 2; } add(1, 2);")
+        self.assertEqual(value, env.Value(lib.INTEGER, 5))
+        self.assertEqual(context.behaviour, ast.DEFAULT_BEHAVIOUR)
+        # arguments not matching the parameter types take the call
+        self.assertRaises(env.FunctionException, evaluate,
+                          "func add(a: int, b: int) { return a + b; } add(1.0, 2);")
+
+        # only functions returning a small expression of their parameters are inlined
+        sources = [
+            "func f(a: int) { return a; } f(1);",
+            "func f(a: int) { return a + b; } f(1);",
+            "func f(a: int) { return f(a) + 1; } f(1);",
+            "func f(a: int) { var b = a; return b; } f(1);",
+            "func f(a: int) { return a + 1; } func f(a: float) { return a; } f(1);",
+            "func f(a: int) { return a + 1 + 1 + 1 + 1 + 1 + 1 + 1 + 1; } f(1);",
+        ]
+        for source in sources:
+            call = generate(source).children[-1]
+            self.assertIsNone(call.inline_body, source)
+
+    def test_fuse_nodes(self):
+        """Test the peephole fusion of statements."""
+        tree = generate("var i = 0; i += 1; i = i - 2.5; i = i * (i + 1); i = 2 * i; i < 10; 10 < i;")
+        self.assertEqual(tree.children[1], ast.Increment("i", "+", env.Value(lib.INTEGER, 1)))
+        self.assertEqual(tree.children[2], ast.Increment("i", "-", env.Value(lib.FLOAT, 2.5)))
+        self.assertIs(type(tree.children[3]), ast.BinaryAssignment)
+        self.assertIs(type(tree.children[4]), ast.Assignment)
+        self.assertEqual(tree.children[5], ast.Compare("i", "<", env.Value(lib.INTEGER, 10)))
+        self.assertIs(type(tree.children[6]), ast.Operation)
+        # declarations may change the type of the variable
+        self.assertIs(type(tree.children[0].children[1]), ast.Assignment)
+
+        value, _ = evaluate("var i = 0; var t = 0.0; while (i < 10) { t = t + 0.5; i += 1; } t;")
+        self.assertEqual(value, env.Value(lib.FLOAT, 5.0))
+        value, _ = evaluate("var n = 7; n = n / 2; n = n % 2; n;")
+        self.assertEqual(value, env.Value(lib.INTEGER, 1))
+        self.assertRaises(env.RuntimeException, evaluate, "var n = 7; n = n / 0;")
+        self.assertRaises(env.RuntimeException, evaluate, "var n = 7; n = n == 7;")
+
+    def test_count_loops(self):
+        """Test the counted loop recognition."""
+        tree = generate("var n = 3; for (var i = 0; i < n; i += 1) { n; }")
+        loop = tree.children[1].children[1]
+        self.assertEqual(loop.counter, "i")
+        self.assertEqual(loop.step, 1)
+        self.assertIs(type(loop.increment), ast.Increment)
+        self.assertEqual(len(loop.children[1].children), 1)
+        loop = generate("var i = 9; while (i >= 0) { i -= 3; }").children[1]
+        self.assertEqual((loop.counter, loop.step, loop.inclusive), ("i", -3, True))
+
+        sources = [
+            "var n = 3; for (var i = 0; i < n; i += 1) { i = 2; }",
+            "var n = 3; for (var i = 0; i < n; i += 1) { n = n + 1; }",
+            "var n = 3; for (var i = 0; i < n; i += 1) { print(i); }",
+            "var n = 3; for (var i = 0; i < n; i += 1) { continue; }",
+            "var n = 3; for (var i = 0; i < n; i -= 1) { }",
+            "var n = 3; for (var i = 0; i < n; i += 0) { }",
+            "var n = 3; for (var i = 0; n > i; i += 1) { }",
+        ]
+        for source in sources:
+            loop = generate(source).children[1].children[1]
+            self.assertIsNone(loop.counter, source)
+
+        # the induction variable ends where the condition fails or the loop breaks
+        cases = [
+            ("var t = 0; var i = 0; for (i = 0; i < 10; i += 3) { t = t + i; } t * 100 + i;", 1812),
+            ("var t = 0; var i = 0; for (i = 0; i <= 9; i += 3) { t = t + i; } t * 100 + i;", 1812),
+            ("var t = 0; var i = 10; while (i > 0) { t = t + i; i -= 4; } t * 100 + i;", 1798),
+            ("var t = 0; var i = 0; while (i < 10) { if (i == 4) { break; } i += 1; } i;", 4),
+            ("var i = 20; while (i < 10) { i += 1; } i;", 20),
+            ("func f() { var i = 0; while (i < 10) { if (i == 7) { return i * 2; } i += 1; } return 0; } f();", 14),
+            # drawing from the iterator runs a generator assigning the counter
+            ("var i = 0; func gen() { i = i + 5; yield 0; } "
+             "func f(it: iterator) { var c = 0; while (i < 10) { for (v in it) { } c += 1; i += 1; } return c * 100 + i; } "
+             "f(gen());", 510),
+        ]
+        for source, expected in cases:
+            value, _ = evaluate(source)
+            self.assertEqual(value, env.Value(lib.INTEGER, expected), source)
+        # variables or bounds that are no integers run the loop
+        value, _ = evaluate("var t = 0; var i = 0.5; while (i < 3) { t = t + 1; i += 1; } t;")
+        self.assertEqual(value, env.Value(lib.INTEGER, 3))
+        value, _ = evaluate("var t = 0; var i = 0; while (i < 2.5) { t = t + 1; i += 1; } t;")
+        self.assertEqual(value, env.Value(lib.INTEGER, 3))
+        # as do int variables holding other data
+        context = env.empty_context()
+        context.load(lib)
+        context.store(env.Value(lib.INTEGER, 0.5, "q"))
+        value = generate("var t = 0; for (var i = q; i < 3; i += 1) { t = t + 1; } t;").eval(context)
+        self.assertEqual(value, env.Value(lib.INTEGER, 3))
+
+    def test_infer_types(self):
+        """Test the type inference pass."""
+        tree = generate("var a = 1; var b: float = 2.0; a * 2; b / 2.0; a + b; a + c;")
+        self.assertIs(tree.children[2].kernel, lib.MUL_OPERATOR.kernels[(lib.INTEGER, lib.INTEGER)])
+        self.assertIs(tree.children[3].kernel, lib.DIV_OPERATOR.kernels[(lib.FLOAT, lib.FLOAT)])
+        self.assertIsNone(tree.children[4].kernel)
+        self.assertIsNone(tree.children[5].kernel)
+
+        # result types propagate, short-circuit operators keep evaluating lazily
+        tree = generate("var a = 1 < 2; var b = a && true; b || false;")
+        self.assertIsNone(tree.children[1].children[1].children[0].kernel)
+        self.assertIsNone(tree.children[2].kernel)
+        tree = generate("var a = (1 + 2) * 3; a - 1;")
+        self.assertIsNotNone(tree.children[1].kernel)
+
+        # parameters have their declared types, free names are unknown
+        tree = generate("var c = 1; func f(a: int, b: number) { return a * 2 + b * 2 + c * 2; }")
+        expression = tree.children[1].children[0].children[0].children[0]
+        self.assertIsNotNone(expression.children[0].children[0].kernel)
+        self.assertIsNone(expression.children[0].children[1].kernel)
+        self.assertIsNone(expression.children[1].kernel)
+
+        # declarations that may not happen leave the type unknown
+        tree = generate("var a = 1; if (a == 1) { var a = 1.0; } a * 2;")
+        self.assertIsNotNone(tree.children[2].kernel)
+        tree = generate("var a = 1; for (x in range(2)) { a * 2; x * 2; }")
+        body = tree.children[1].children[1]
+        self.assertIsNotNone(optimizer.collect(body, ast.Operation, [])[0].kernel)
+        self.assertIsNone(optimizer.collect(body, ast.Operation, [])[1].kernel)
+        tree = generate("func f() { record int(a: float); var b: int = f(); b * 2; }")
+        self.assertIsNone(optimizer.collect(tree, ast.Operation, [])[0].kernel)
+
+        # expressions proven to fail are reported before evaluation
+        sources = [
+            "var a = \"a\"; a - 1;",
+            "var a = true; if (false) { a * 2; }",
+            "var a: int = 1; a = 2.0;",
+            "func f(a: string) { return a / 2; }",
+        ]
+        for source in sources:
+            self.assertRaises(optimizer.StaticTypeException, generate, source)
+        value, _ = evaluate("var a = 7; var b = 2.0; a / 2 + (b * 2.0):int;")
+        self.assertEqual(value, env.Value(lib.INTEGER, 7))
+
+    def test_specialize_functions(self):
+        """Test the specialization of functions per argument types."""
+        tree = generate("func f(a: number, b: int) { return a * b + a * 2; } func g(a: int) { return a; }")
+        self.assertIs(tree.children[0].specializer, optimizer.specialize)
+        self.assertIsNone(tree.children[1].specializer)
+        tree = generate("func f(a: number) { record int(x: float); return a; }")
+        self.assertIsNone(tree.children[0].specializer)
+
+        definition = generate("func f(a: number, b: int) { var c = a * b; return c * 2; }").children[0]
+        args = [env.Value(lib.NUMBER, None, "a"), env.Value(lib.INTEGER, None, "b")]
+        body = definition.children[0]
+        clone = optimizer.specialize(body, args, (lib.INTEGER, lib.INTEGER))
+        operations = optimizer.collect(clone, ast.Operation, [])
+        self.assertTrue(all(operation.kernel is not None for operation in operations))
+        self.assertTrue(all(operation.kernel is None for operation in optimizer.collect(body, ast.Operation, [])))
+        self.assertIsNone(optimizer.specialize(body, args, (lib.NUMBER, lib.INTEGER)))
+        self.assertIsNone(optimizer.specialize(body, args[1:], (lib.INTEGER,)))
+
+        # every combination of argument types gets its own body
+        value, context = evaluate("func f(a: number) { var b = a * 3; return b - a; } f(2); f(1.5); f(4):float + f(0.5);")
+        self.assertEqual(value, env.Value(lib.FLOAT, 9.0))
+        signature = context.find("id", "f").signatures[0]
+        self.assertEqual(set(signature.clones), {(lib.INTEGER,), (lib.FLOAT,)})
+        # bodies proven to fail for the types fall back to the generic one
+        value, _ = evaluate("func f(a: number, b: bool) { if (b) { return a; } return a && b; } f(1, true);")
+        self.assertEqual(value, env.Value(lib.INTEGER, 1))
+
+        # every call site keeps the body it selected for its argument types
+        tree = generate("func f(a: number) { var b = a * 2; return b; } var t = 0.0; "
+                        "for (x in range(3)) { t = t + f(x) + f(0.5); } f(t); t;")
+        context = env.empty_context()
+        context.load(lib)
+        self.assertEqual(tree.eval(context), env.Value(lib.FLOAT, 9.0))
+        signature = context.find("id", "f").signatures[0]
+        _, ints, floats, last = optimizer.collect(tree, ast.Call, [])
+        self.assertEqual(ints.cache[1:], ((lib.INTEGER,), signature, signature.clones[(lib.INTEGER,)]))
+        self.assertEqual(floats.cache[1:], ((lib.FLOAT,), signature, signature.clones[(lib.FLOAT,)]))
+        self.assertIs(last.cache[3], floats.cache[3])
+        # the copies of a body do not share the caches of its calls
+        body = generate("func f(a: number) { return g(a) + a; }").children[0].children[0]
+        call = optimizer.collect(body, ast.Call, [])[0]
+        call.cache = (signature.function,)
+        clone = optimizer.specialize(body, [env.Value(lib.NUMBER, None, "a")], (lib.INTEGER,))
+        self.assertIsNone(optimizer.collect(clone, ast.Call, [])[0].cache)
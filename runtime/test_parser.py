@@ -490,7 +490,19 @@ class TestParser(unittest.TestCase):
             self.assertEqual(output, tc[1], "%s is not equal to %s" % (output, tc[1]))
             self.assertEqual(offset, tc[2], "%s offset %d is not equal to %d" % (output, offset, tc[2]))
 
+        # case 4: for (x in range(3)) {;}
+        case4 = ast.Iteration("x")
+        case4_iterable, _ = generate_expression(clean_lex("range(3)"))
+        case4.add(case4_iterable)
+        case4.add(ast.Sequence())
+
+        output, offset = generate_for(clean_lex("for (x in range(3)) {;}"))
+        self.assertEqual(output, case4, "%s is not equal to %s" % (output, case4))
+        self.assertEqual(offset, 11)
+
         error_cases = [
+            ("for (x in ) {;}", ParseException),
+            ("for (x in l) ;", ParseException),
             ("for ; true; a < 100; {;}", ParseException),
             ("for (true) {;}", ParseException),
             ("true;", ParseException),
@@ -529,6 +541,57 @@ class TestParser(unittest.TestCase):
         for tc in error_cases:
             self.assertRaises(tc[1], generate_while, clean_lex(tc[0]))
 
+    def test_record(self):
+        cases = [
+            ("Point(x: float, y: float);", ast.Record("Point", [("x", "float"), ("y", "float")]), 10),
+            ("Empty();", ast.Record("Empty", []), 3),
+        ]
+
+        for tc in cases:
+            output, offset = generate_record(clean_lex(tc[0]))
+            self.assertEqual(output, tc[1], "%s is not equal to %s" % (output, tc[1]))
+            self.assertEqual(offset, tc[2], "%s offset %d is not equal to %d" % (output, offset, tc[2]))
+
+        error_cases = [
+            ("(x: float);", ParseException),
+            ("Point x: float;", ParseException),
+            ("Point(x float);", ParseException),
+            ("Point(x: float y: float);", ParseException),
+            ("Point(x: float, x: int);", ParseException),
+        ]
+
+        for tc in error_cases:
+            self.assertRaises(tc[1], generate_record, clean_lex(tc[0]))
+
+    def test_member(self):
+        case1 = ast.Member("y")
+        case1.add(ast.Member("x"))
+        case1.children[0].add(ast.Identifier("a"))
+        case2 = ast.Operation("+")
+        case2.add(ast.Member("x"))
+        case2.add(ast.Literal(env.Value(lib.INTEGER, 1)))
+        case2.children[0].add(ast.Identifier("a"))
+
+        cases = [
+            ("a.x.y;", case1),
+            ("a.x + 1;", case2),
+        ]
+
+        for tc in cases:
+            output = generate(lexer.run(tc[0])).children[0]
+            self.assertEqual(output, tc[1], "%s is not equal to %s" % (output, tc[1]))
+
+        self.assertRaises(ParseException, generate, lexer.run("a.1;"))
+
+    def test_yield(self):
+        case1 = ast.Sequence()
+        case1.add(ast.Yield())
+        case1.children[0].add(ast.Identifier("a"))
+        case1.add(ast.Identifier("b"))
+
+        output, offset = generate_sequence(clean_lex("yield a; b;"))
+        self.assertEqual(output, case1, "%s is not equal to %s" % (output, case1))
+
     def test_sequence(self):
         pass
 
@@ -0,0 +1,123 @@
+"""Test the runtime.persistent module."""
+import unittest
+
+from runtime.persistent import PersistentArray, PersistentVector, PersistentMap, PersistentSet, Rope, concat
+
+
+class CollidingKey(object):
+    """A key with a small hash range to force collisions."""
+
+    def __init__(self, key):
+        self.key = key
+
+    def __hash__(self):
+        return self.key % 3
+
+    def __eq__(self, other):
+        return isinstance(other, CollidingKey) and self.key == other.key
+
+
+class TestPersistent(unittest.TestCase):
+    """Test the persistent collections."""
+
+    def test_vector(self):
+        """Test the PersistentVector class."""
+        for size in [0, 1, 32, 33, 1056, 1057, 40000]:
+            items = list(range(size))
+            built = PersistentVector(items)
+            appended = PersistentVector()
+            for item in items:
+                appended = appended.append(item)
+            self.assertEqual(len(built), size)
+            self.assertEqual(list(built), items)
+            self.assertEqual(list(appended), items)
+            if size > 0:
+                self.assertEqual(built[size - 1], size - 1)
+                self.assertEqual(appended[-1], size - 1)
+
+        vector = PersistentVector(range(100))
+        changed = vector.set(10, "x").set(99, "y")
+        self.assertEqual(changed[10], "x")
+        self.assertEqual(changed[99], "y")
+        self.assertEqual(vector[10], 10)
+        self.assertEqual(vector[5:8], [5, 6, 7])
+        self.assertEqual(vector.extend([100, 101])[101], 101)
+        self.assertRaises(IndexError, vector.__getitem__, 100)
+        self.assertEqual(PersistentVector("abc"), ["a", "b", "c"])
+        self.assertNotEqual(PersistentVector("abc"), ["a", "b"])
+
+    def test_array(self):
+        """Test the PersistentArray class."""
+        array = PersistentArray("q", [1, 2])
+        self.assertEqual(array.typecode, "q")
+        pushed = array.append(3)
+        # the newest array extends the shared buffer in place
+        self.assertIs(pushed.append(4)._buffer, array._buffer)
+        self.assertEqual(list(array), [1, 2])
+        self.assertEqual(list(pushed), [1, 2, 3])
+        # older arrays copy their items before appending
+        other = array.append(5)
+        self.assertIsNot(other._buffer, array._buffer)
+        self.assertEqual(list(other), [1, 2, 5])
+        self.assertEqual(list(pushed.extend([6, 7])), [1, 2, 3, 6, 7])
+        self.assertEqual(pushed, [1, 2, 3])
+        self.assertEqual(pushed[-1], 3)
+        self.assertEqual(list(pushed[1:]), [2, 3])
+        self.assertRaises(IndexError, pushed.__getitem__, 3)
+        self.assertNotIn(4, pushed)
+        self.assertIn(4, pushed.append(4))
+
+        appended = PersistentArray("d")
+        for item in range(1000):
+            appended = appended.append(item)
+        self.assertEqual(list(appended), list(range(1000)))
+
+    def test_map(self):
+        """Test the PersistentMap class."""
+        for key in [lambda x: x, str, CollidingKey]:
+            mapping = PersistentMap()
+            expected = {}
+            for i in range(300):
+                mapping = mapping.set(key(i % 120), i)
+                expected[key(i % 120)] = i
+                if i % 4 == 0:
+                    mapping = mapping.remove(key(i % 50))
+                    expected.pop(key(i % 50), None)
+            self.assertEqual(len(mapping), len(expected))
+            self.assertEqual(dict(mapping.items()), expected)
+
+        first = PersistentMap({"a": 1})
+        second = first.set("b", 2)
+        self.assertEqual(first, {"a": 1})
+        self.assertEqual(second, {"a": 1, "b": 2})
+        self.assertIs(first.remove("missing"), first)
+        self.assertRaises(KeyError, second.__getitem__, "c")
+
+    def test_set(self):
+        """Test the PersistentSet class."""
+        numbers = PersistentSet([1, 2, 3])
+        self.assertEqual(numbers, {1, 2, 3})
+        self.assertEqual(numbers.add(4), {1, 2, 3, 4})
+        self.assertEqual(numbers.remove(1), {2, 3})
+        self.assertEqual(numbers, {1, 2, 3})
+        self.assertEqual(numbers | {5}, {1, 2, 3, 5})
+        self.assertEqual(numbers & {2, 5}, {2})
+        self.assertIn(2, numbers)
+
+    def test_rope(self):
+        """Test the Rope class."""
+        self.assertEqual(concat("a", "b"), "ab")
+        self.assertEqual(concat("", "b"), "b")
+        rope = ""
+        for i in range(1000):
+            rope = concat(rope, "%d," % i)
+        self.assertIsInstance(rope, Rope)
+        expected = ",".join(str(i) for i in range(1000)) + ","
+        self.assertEqual(len(rope), len(expected))
+        self.assertEqual(rope, expected)
+        self.assertEqual(expected, rope)
+        self.assertEqual(str(rope), expected)
+        self.assertEqual(hash(rope), hash(expected))
+        self.assertTrue(rope < "1")
+        self.assertEqual(list(Rope("ab", "c")), ["a", "b", "c"])
+        self.assertEqual("x" + Rope("ab", "c"), "xabc")
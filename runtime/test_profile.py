@@ -0,0 +1,103 @@
+"""Test the runtime.profile module."""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from runtime import env, flags, lexer, lib, parser, profile
+
+SOURCE = """
+func scale(x: number, k: int) {
+    var t = x;
+    for (var i = 0; i < k; i += 1) { t = t * 2; }
+    return t;
+}
+var s = 0;
+for (var j = 0; j < 60; j += 1) { s = s + scale(1, 10); }
+s = s + scale(0.5, 2):int;
+var n = 0;
+while (n < 3) { n += 1; }
+"""
+
+
+class TestProfile(unittest.TestCase):
+    """Test the persisted type feedback."""
+
+    def setUp(self):
+        self.flags = flags.profile_dir, flags.call_threshold, flags.loop_threshold
+        flags.profile_dir = tempfile.mkdtemp()
+        flags.call_threshold, flags.loop_threshold = 50, 500
+
+    def tearDown(self):
+        shutil.rmtree(flags.profile_dir)
+        flags.profile_dir, flags.call_threshold, flags.loop_threshold = self.flags
+
+    def run_source(self, source=SOURCE):
+        context = env.empty_context()
+        context.load(lib)
+        tree = parser.generate(lexer.run(source))
+        feedback = profile.load(tree, source)
+        tree.eval(context)
+        feedback.write()
+        self.assertEqual(context.find("id", "s"), env.Value(lib.INTEGER, 60 * 1024 + 2))
+        return tree, feedback
+
+    def test_write(self):
+        """The feedback of a run is written to a file named by the source hash."""
+        self.run_source()
+        with open(profile.path(SOURCE)) as profile_file:
+            data = json.load(profile_file)
+        # each specialized body counts its calls until it is compiled
+        self.assertEqual(data["functions"], [{"calls": 51, "types": [["int", "int"], ["float", "int"]]}])
+        # the loop of the function body counts the iterations of its specialized copies
+        self.assertEqual(data["loops"], [500, 60, 3])
+        self.assertEqual(os.listdir(flags.profile_dir), [os.path.basename(profile.path(SOURCE))])
+
+    def test_load(self):
+        """A profiled run specializes and compiles the hot code up front."""
+        self.run_source()
+        context = env.empty_context()
+        context.load(lib)
+        tree = parser.generate(lexer.run(SOURCE))
+        profile.load(tree, SOURCE)
+        # hot loops are compiled after their first iteration
+        self.assertEqual([loop.iterations for loop in profile.loops(tree)], [flags.loop_threshold - 1, 0, 0])
+        tree.children[0].eval(context)
+        signature = context.find("id", "scale").signatures[0]
+        self.assertEqual(signature.threshold, 1)
+        self.assertEqual(list(signature.clones), [(lib.INTEGER, lib.INTEGER), (lib.FLOAT, lib.INTEGER)])
+
+    def test_stale(self):
+        """Missing, broken or stale profiles are ignored."""
+        with open(profile.path(SOURCE), "w") as profile_file:
+            profile_file.write("{")
+        self.run_source()
+        with open(profile.path(SOURCE), "w") as profile_file:
+            json.dump({"functions": [], "loops": [10**6]}, profile_file)
+        tree, feedback = self.run_source()
+        self.assertEqual(feedback.calls, [51])
+        malformed = [
+            [],
+            {"functions": [{"types": []}], "loops": [0, 0, 0]},
+            {"functions": [3], "loops": [0, 0, 0]},
+            {"functions": [{"calls": "51", "types": []}], "loops": [0, 0, 0]},
+            {"functions": [{"calls": -1, "types": []}], "loops": [0, 0, 0]},
+            {"functions": [{"calls": 51, "types": ["int"]}], "loops": [0, 0, 0]},
+            {"functions": [{"calls": 51, "types": [[1]]}], "loops": [0, 0, 0]},
+            {"functions": [{"calls": 51, "types": []}], "loops": [0, 0.5, 0]},
+            {"functions": [{"calls": 51, "types": []}], "loops": {}},
+        ]
+        for data in malformed:
+            with open(profile.path(SOURCE), "w") as profile_file:
+                json.dump(data, profile_file)
+            tree = parser.generate(lexer.run(SOURCE))
+            feedback = profile.load(tree, SOURCE)
+            self.assertEqual((feedback.calls, feedback.types, feedback.iterations), ([0], [[]], [0, 0, 0]), data)
+        flags.profile_dir, directory = None, flags.profile_dir
+        self.assertIsNone(profile.load(tree, SOURCE))
+        flags.profile_dir = directory
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""Test the runtime.trace module."""
+import unittest
+
+from runtime import ast, env, flags, lexer, lib, parser, trace
+
+
+class TestTrace(unittest.TestCase):
+    """Test the loop tracer."""
+
+    def setUp(self):
+        self.loop_threshold = flags.loop_threshold
+
+    def tearDown(self):
+        flags.loop_threshold = self.loop_threshold
+
+    def test_errors(self):
+        """Traces raise the errors of the interpreter and keep the state."""
+        flags.loop_threshold = 1
+        context = env.empty_context()
+        context.load(lib)
+        tree = parser.generate(lexer.run("var t = 0; var i = 5; while (true) { i -= 1; t = t + 10 / i; }"))
+        self.assertRaises(env.RuntimeException, tree.eval, context)
+        self.assertEqual(context.find("id", "i").data, 0)
+        self.assertEqual(context.find("id", "t").data, 2 + 3 + 5 + 10)
+        self.assertIsNotNone(tree.children[-1].trace)
+
+    def test_record(self):
+        """Test the recording of loops."""
+        context = env.empty_context()
+        context.load(lib)
+        tree = parser.generate(lexer.run("var t = 0; var i = 0; while (i < 10) { t = t + i; i += 1; }"))
+        loop = tree.children[-1]
+        tree.children.pop()
+        tree.eval(context)
+        recorded = trace.record(loop, context)
+        self.assertEqual(recorded.names, ["i", "t"])
+        self.assertEqual(recorded.types, [lib.INTEGER, lib.INTEGER])
+        self.assertTrue(recorded.run(context))
+        self.assertEqual(context.find("id", "t"), env.Value(lib.INTEGER, 45))
+        # counted traces need a stop and the other way round
+        self.assertFalse(recorded.run(context, 10))
+        # the guards fail if a variable changed its type
+        context.find("id", "t").datatype = lib.FLOAT
+        self.assertFalse(recorded.run(context))
+        del context.namespace.search_spaces["id"]["t"]
+        self.assertFalse(recorded.run(context))
+
+        # counted traces run a range, which only accepts int data
+        tree = parser.generate(lexer.run("var u = 0; var k = 0; while (k < 10) { u += k; k += 1; }"))
+        loop = tree.children.pop()
+        tree.eval(context)
+        recorded = trace.record(loop, context, True)
+        context.find("id", "k").data = 0.5
+        self.assertFalse(recorded.run(context, 10))
+        self.assertFalse(recorded.run(context, 10.0))
+        context.find("id", "k").data = 0
+        self.assertTrue(recorded.run(context, 10))
+        self.assertEqual(context.find("id", "u"), env.Value(lib.INTEGER, 45))
+
+    def test_untraceable(self):
+        """Loops with calls, declarations or untyped operators are not traced."""
+        context = env.empty_context()
+        context.load(lib)
+        context.store(env.Value(lib.INTEGER, 0, "i"))
+        context.store(env.Value(lib.FLOAT, 0.0, "f"))
+        context.store(env.Value(lib.STRING, "", "s"))
+        sources = [
+            "while (i < 10) { i = abs(i); }",
+            "while (i < 10) { var j = i; i += 1; }",
+            "while (i < 10) { f = f + i; }",
+            "while (i < 10) { f = i; }",
+            "while (i) { i += 1; }",
+            "while (i < 10) { s = s + i; }",
+            "while (j < 10) { i += 1; }",
+            "while (i < 10) { return i; }",
+        ]
+        for source in sources:
+            loop = parser.generate(lexer.run(source)).children[0]
+            self.assertIsNone(trace.record(loop, context), source)
+        loop = ast.Loop(substitute=True)
+        loop.children = [ast.Compare("i", "<", env.Value(lib.INTEGER, 10)), ast.Sequence()]
+        self.assertIsNone(trace.record(loop, context))
+
+
+if __name__ == "__main__":
+    unittest.main()
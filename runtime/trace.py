@@ -0,0 +1,272 @@
+"""Record hot loops into guarded straight-line Python functions.
+
+A loop is recorded once it is hot, using the datatypes its variables have
+at that moment. The recorded trace keeps the data of the variables in
+Python locals and applies the kernels of the operators directly, so an
+iteration runs without evaluating any node. Every run of a trace first
+guards that the variables still have the recorded types and otherwise
+leaves the loop to the interpreter. Loops using nodes without a kernel
+for the recorded types, calls or declarations are not traced.
+"""
+import operator
+
+from runtime import ast, env, lib
+
+# datatypes of the variables a trace may keep in locals
+TRACED_TYPES = (lib.INTEGER, lib.FLOAT, lib.BOOLEAN, lib.STRING)
+
+# kernels that are written as Python operators
+INFIX = {
+    operator.add: "+",
+    operator.sub: "-",
+    operator.mul: "*",
+    operator.pow: "**",
+    operator.lt: "<",
+    operator.gt: ">",
+    operator.le: "<=",
+    operator.ge: ">=",
+    operator.eq: "==",
+    operator.ne: "!=",
+}
+
+LOGICAL = {
+    "&&": "and",
+    "||": "or",
+}
+
+CASTS = {
+    lib.INTEGER: "int",
+    lib.FLOAT: "float",
+}
+
+
+class Untraceable(Exception):
+    """Raised when a node can not be recorded."""
+
+
+class Trace(object):
+    """A loop recorded as a Python function on the data of its variables."""
+
+    def __init__(self, names, types, counted, function, source):
+        self.names = names
+        self.types = types
+        # counted traces iterate a range up to the stop passed to run
+        self.counted = counted
+        self.function = function
+        self.source = source
+
+    def run(self, context, stop=None):
+        """Runs the loop if the variables still have the recorded types.
+
+        Returns False without running anything if a guard fails.
+        """
+        if self.counted != (stop is not None):
+            return False
+        namespace = context.namespace
+        values = []
+        for name, datatype in zip(self.names, self.types):
+            try:
+                value = namespace.find("id", name)
+            except env.NamespaceException:
+                return False
+            if type(value) is not env.Value or value.datatype is not datatype:
+                return False
+            values.append(value)
+        if self.counted and (type(values[0].data) is not int or type(stop) is not int):
+            # a range only accepts int data
+            return False
+        self.function(values, stop)
+        return True
+
+
+class Recorder(object):
+    """Writes the Python source of a loop for the current types of its variables."""
+
+    def __init__(self, context, counted):
+        self.context = context
+        self.counted = counted
+        self.names = []
+        self.types = []
+        self.locals = {}
+        self.assigned = set()
+        self.constants = []
+        self.lines = []
+
+    def emit(self, indent, line):
+        """Appends a line of source."""
+        self.lines.append("    " * indent + line)
+
+    def constant(self, data):
+        """Returns the source of a constant."""
+        if type(data) in (int, bool):
+            return repr(data)
+        self.constants.append(data)
+        return "c%d" % (len(self.constants) - 1)
+
+    def variable(self, name):
+        """Returns the local and the recorded type of a variable."""
+        local = self.locals.get(name)
+        if local is None:
+            try:
+                value = self.context.find("id", name)
+            except env.NamespaceException:
+                raise Untraceable(name)
+            if type(value) is not env.Value or value.datatype not in TRACED_TYPES:
+                raise Untraceable(name)
+            local = self.locals[name] = "x%d" % len(self.names)
+            self.names.append(name)
+            self.types.append(value.datatype)
+        return local, self.types[self.names.index(name)]
+
+    def apply(self, symbol, left, right):
+        """Returns the source and result type of a binary operator."""
+        kernel = self.context.find("op", symbol).kernels.get((left[1], right[1]))
+        if kernel is None:
+            raise Untraceable(symbol)
+        function, datatype = kernel
+        if symbol in LOGICAL:
+            return "(%s %s %s)" % (left[0], LOGICAL[symbol], right[0]), datatype
+        if function in INFIX:
+            return "(%s %s %s)" % (left[0], INFIX[function], right[0]), datatype
+        return "%s(%s, %s)" % (self.constant(function), left[0], right[0]), datatype
+
+    def expression(self, node):
+        """Returns the source and result type of an expression."""
+        kind = type(node)
+        if kind is ast.Literal:
+            if node.value.datatype not in TRACED_TYPES:
+                raise Untraceable(node)
+            return self.constant(node.value.data), node.value.datatype
+        if kind is ast.Identifier:
+            return self.variable(node.identity)
+        if kind in (ast.Invariant, ast.Shared):
+            # the expressions are pure, so they can be evaluated again
+            return self.expression(node.children[0])
+        if kind is ast.Compare:
+            return self.apply(node.symbol, self.variable(node.name),
+                              (self.constant(node.value.data), node.value.datatype))
+        if kind is ast.Operation:
+            operands = [self.expression(child) for child in node.children]
+            if len(operands) == 2:
+                return self.apply(node.symbol, operands[0], operands[1])
+            if (len(operands) == 1 and node.symbol == "-" and operands[0][1] in (lib.INTEGER, lib.FLOAT)
+                    and self.context.find("op", "-") is lib.MINUS_OPERATOR):
+                return "(-%s)" % operands[0][0], operands[0][1]
+        if kind is ast.Cast:
+            operand = self.expression(node.children[0])
+            target = self.context.find("ty", node.target)
+            if target in CASTS and operand[1] in CASTS:
+                return "%s(%s)" % (CASTS[target], operand[0]), target
+        raise Untraceable(node)
+
+    def condition(self, node):
+        """Returns the source of a condition."""
+        code, datatype = self.expression(node)
+        if datatype is not lib.BOOLEAN:
+            raise Untraceable(node)
+        return code
+
+    def store(self, indent, name, code, datatype):
+        """Assigns the result of an expression to a variable of the same type."""
+        local, expected = self.variable(name)
+        if datatype is not expected:
+            raise Untraceable(name)
+        self.assigned.add(local)
+        self.emit(indent, "%s = %s" % (local, code))
+
+    def block(self, node, indent):
+        """Records a block, which must not be empty in Python."""
+        length = len(self.lines)
+        self.statement(node, indent)
+        if len(self.lines) == length:
+            self.emit(indent, "pass")
+
+    def statement(self, node, indent):
+        """Records a statement."""
+        kind = type(node)
+        if kind is ast.Sequence:
+            if node.substitute:
+                raise Untraceable(node)
+            for child in node.children:
+                self.statement(child, indent)
+        elif kind is ast.Assignment:
+            code, datatype = self.expression(node.children[0])
+            self.store(indent, node.name, code, datatype)
+        elif kind is ast.Increment:
+            operand = self.constant(node.value.data), node.value.datatype
+            code, datatype = self.apply(node.symbol, self.variable(node.name), operand)
+            self.store(indent, node.name, code, datatype)
+        elif kind is ast.BinaryAssignment:
+            operand = self.expression(node.children[0])
+            code, datatype = self.apply(node.symbol, self.variable(node.name), operand)
+            self.store(indent, node.name, code, datatype)
+        elif kind is ast.Conditional:
+            self.emit(indent, "if %s:" % self.condition(node.children[0]))
+            self.block(node.children[1], indent + 1)
+        elif kind is ast.Branch:
+            keyword = "if"
+            for index, child in enumerate(node.children):
+                if type(child) is ast.Conditional:
+                    self.emit(indent, "%s %s:" % (keyword, self.condition(child.children[0])))
+                    self.block(child.children[1], indent + 1)
+                    keyword = "elif"
+                elif index == len(node.children) - 1 and index > 0:
+                    self.emit(indent, "else:")
+                    self.block(child, indent + 1)
+                else:
+                    raise Untraceable(child)
+        elif kind is ast.Break:
+            self.emit(indent, "break")
+        elif kind is ast.Continue and not self.counted:
+            self.emit(indent, "continue")
+        else:
+            raise Untraceable(node)
+
+    def loop(self, loop):
+        """Records the loop and returns the source of its function."""
+        condition, body = loop.children
+        if self.counted:
+            local = self.variable(loop.counter)[0]
+            self.assigned.add(local)
+            self.emit(2, "for index in range(%s, stop, %d):" % (local, loop.step))
+            self.emit(3, "%s = index" % local)
+            self.block(body, 3)
+            self.emit(3, "%s = index + %d" % (local, loop.step))
+        else:
+            self.emit(2, "while %s:" % self.condition(condition))
+            self.block(body, 3)
+            if loop.increment is not None:
+                self.statement(loop.increment, 3)
+        loop_lines, self.lines = self.lines, []
+        parameters = ["values", "stop"] + ["c%d=c%d" % (index, index) for index in range(len(self.constants))]
+        self.emit(0, "def trace(%s):" % ", ".join(parameters))
+        self.emit(1, "%s, = values" % ", ".join("v%d" % index for index in range(len(self.names))))
+        for index in range(len(self.names)):
+            self.emit(1, "x%d = v%d.data" % (index, index))
+        self.emit(1, "try:")
+        self.lines.extend(loop_lines)
+        self.emit(1, "finally:")
+        if not self.assigned:
+            self.emit(2, "pass")
+        for local in sorted(self.assigned):
+            self.emit(2, "v%s.data = %s" % (local[1:], local))
+        return "\n".join(self.lines)
+
+
+def record(loop, context, counted=False):
+    """Records a hot loop for the current types of its variables.
+
+    Returns a Trace or None if the loop can not be traced.
+    """
+    if loop.substitute:
+        return None
+    recorder = Recorder(context, counted)
+    try:
+        source = recorder.loop(loop)
+    except Untraceable:
+        return None
+    if not recorder.names:
+        return None
+    scope = {"c%d" % index: data for index, data in enumerate(recorder.constants)}
+    exec(compile(source, "<trace>", "exec"), scope)
+    return Trace(recorder.names, recorder.types, counted, scope["trace"], source)